@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+*Startup / Import Time Benchmark*
+===========================================
+
+.. program:: bench_import.py
+
+:Synopsis: Regression guard for the start up time of the `editfrontmatter`
+    command. Runs ``python -X importtime -m editfrontmatter --help`` and
+    fails if a heavy dependency (`jinja2`, `oyaml`/`yaml`,
+    `concurrent.futures`) is imported eagerly or if the cumulative import
+    time of the package exceeds a budget.
+
+:Platform: Unix, Windows, python >= 3.7 (`-X importtime`)
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Example:
+
+    ::
+
+        python benchmarks/bench_import.py --budget-ms 40 --runs 5
+
+Returns:
+    * 0 if within budget
+    * 1 on regression
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+LAZY_MODULES = ('jinja2', 'yaml', 'oyaml', 'concurrent.futures')
+"""Modules that must not be imported by `editfrontmatter --help`"""
+
+_line = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profile(args=('--help',)):
+    """ Run the command with `-X importtime`.
+
+    Returns:
+        * {module: cumulative microseconds} of top level imports
+        * set of every imported module
+        * wall time in seconds
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'editfrontmatter'] + list(args),
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          universal_newlines=True, env=env)
+    wall = time.perf_counter() - start
+
+    top_level = {}
+    imported = set()
+    for line in proc.stderr.splitlines():
+        match = _line.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        imported.add(name)
+        if len(indent) == 1:
+            top_level[name] = top_level.get(name, 0) + cumulative
+    return top_level, imported, wall
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--budget-ms', type=float, default=40.0,
+                        help='maximum cumulative import time of editfrontmatter (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='number of runs, the best is kept (default: %(default)s)')
+    parser.add_argument('--output', metavar='FILE', help='write the results as json')
+    args = parser.parse_args(argv)
+
+    best = None
+    for _ in range(args.runs):
+        top_level, imported, wall = import_profile()
+        package_us = sum(us for name, us in top_level.items() if name.startswith('editfrontmatter'))
+        if best is None or package_us < best['package_us']:
+            best = {'package_us': package_us, 'wall_s': wall,
+                    'eager': sorted(m for m in LAZY_MODULES if m in imported)}
+
+    print("editfrontmatter imports: {ms:.1f} ms (budget {b:.1f} ms), --help wall time: {w:.1f} ms".
+          format(ms=best['package_us'] / 1000.0, b=args.budget_ms, w=best['wall_s'] * 1000.0))
+
+    if args.output:
+        with open(args.output, 'w') as fo:
+            json.dump(best, fo, indent=2)
+
+    failed = False
+    if best['eager']:
+        print("REGRESSION: imported eagerly: {m}".format(m=', '.join(best['eager'])), file=sys.stderr)
+        failed = True
+    if best['package_us'] / 1000.0 > args.budget_ms:
+        print("REGRESSION: import time over budget", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
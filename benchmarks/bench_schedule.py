@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+*Batch Scheduling Benchmark*
+===========================================
+
+.. program:: bench_schedule.py
+
+:Synopsis: Compare the wall time (makespan) of :mod:`editfrontmatter.batch`
+    scheduling policies on a heavy-tailed corpus (see :mod:`corpus`, profile
+    `heavy-tail`): walk order, largest first (LPT) and LPT with size
+    bucketed chunks, for thread and / or process pools.
+
+    Each result is also compared to the lower bound
+    `max(busy time / jobs, slowest file)`: a ratio close to 1.0 means the
+    workers were kept busy until the end.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Example:
+
+    ::
+
+        python benchmarks/bench_schedule.py --files 5000 --jobs 8 --processes
+        python benchmarks/bench_schedule.py --output schedule.json
+
+Returns:
+    * 0 on success
+    * 1 if a run failed
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from editfrontmatter.batch import Batch, BatchTask, walk_files  # noqa: E402
+
+from corpus import CorpusSpec, PROFILES, generate  # noqa: E402
+
+POLICIES = (
+    ('walk', dict(schedule='walk')),
+    ('lpt', dict(schedule='lpt')),
+    ('lpt+chunks', dict(schedule='lpt', chunk_bytes=256 * 1024)),
+)
+
+
+def run_policy(entries, task, jobs, executor, options) -> dict:
+    """One batch run: wall time, busy time and slowest file"""
+    report_results = []
+    report = Batch(task=task, jobs=jobs, executor=executor, **options).run(
+        entries, on_result=report_results.append)
+    if report.errors:
+        raise RuntimeError("{n} files failed".format(n=report.errors))
+    busy = sum(r.elapsed for r in report_results)
+    slowest = max(r.elapsed for r in report_results)
+    bound = max(busy / jobs, slowest)
+    return {'wall': report.elapsed, 'busy': busy, 'slowest': slowest, 'bound': bound}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Batch scheduling policies on a heavy-tailed corpus")
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-body-kb', type=float, default=32768,
+                        help='largest body in KiB (default: %(default)s)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--processes', action='store_true', help='only process pools')
+    parser.add_argument('--threads', action='store_true', help='only thread pools')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', metavar='FILE', help='save results as json')
+    args = parser.parse_args(argv)
+
+    executors = ['thread', 'process']
+    if args.processes:
+        executors = ['process']
+    elif args.threads:
+        executors = ['thread']
+
+    root = tempfile.mkdtemp(prefix='efm-schedule-')
+    results = {}
+    try:
+        options = dict(PROFILES['heavy-tail'], files=args.files, seed=args.seed,
+                       max_body_kb=args.max_body_kb)
+        summary = generate(root, CorpusSpec(**options))
+        entries = list(walk_files([root]))
+        sizes = sorted((e.size for e in entries), reverse=True)
+        print("corpus: {n} files, {b:.1f} MiB, largest {l:.1f} MiB, median {m:.1f} KiB".format(
+            n=len(entries), b=summary['bytes'] / 2**20, l=sizes[0] / 2**20,
+            m=statistics.median(sizes) / 1024))
+
+        # dry run: every file is read, edited and dumped, nothing changes on disk
+        task = BatchTask(operations=[{'op': 'set', 'path': 'params.scheduled', 'value': True}],
+                         keys_toDelete=['x_key1'])
+        print("{name:<28} {wall:>9} {bound:>9} {ratio:>7}".format(
+            name='policy', wall='wall s', bound='bound s', ratio='ratio'))
+        for executor in executors:
+            baseline = None
+            for label, policy in POLICIES:
+                runs = [run_policy(entries, task, args.jobs, executor, policy) for _ in range(args.repeat)]
+                wall = statistics.median(r['wall'] for r in runs)
+                bound = statistics.median(r['bound'] for r in runs)
+                name = "{e}[jobs={j}] {l}".format(e=executor, j=args.jobs, l=label)
+                baseline = baseline or wall
+                results[name] = {'wall': wall, 'bound': bound, 'speedup': baseline / wall}
+                print("{name:<28} {wall:>9.3f} {bound:>9.3f} {ratio:>7.2f}  x{s:.2f}".format(
+                    name=name, wall=wall, bound=bound, ratio=wall / bound, s=baseline / wall))
+    except RuntimeError as e:
+        print("Error: {e}".format(e=e), file=sys.stderr)
+        return 1
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as fo:
+            json.dump({'args': vars(args), 'results': results}, fo, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
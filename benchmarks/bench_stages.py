@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+*EditFrontMatter Stage Benchmarks*
+===========================================
+
+.. program:: bench_stages.py
+
+:Synopsis: Offline benchmark suite for every stage of
+    :class:`editfrontmatter.EditFrontMatter.EditFrontMatter`
+    (:func:`readFile`, :func:`run`, :func:`dumpFrontMatter`,
+    :func:`dumpFileData`, :func:`writeFile`) over a grid of front matter and
+    body sizes, plus end to end :mod:`editfrontmatter.batch` throughput over
+    file counts and thread / process counts.
+
+    Results are saved as json and can be compared against a baseline file.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Example:
+
+    ::
+
+        # record a baseline, change code, compare
+        python benchmarks/bench_stages.py --quick --output baseline.json
+        python benchmarks/bench_stages.py --quick --output new.json --compare baseline.json
+
+        # only some benchmarks
+        python benchmarks/bench_stages.py --filter "run|batch"
+
+Returns:
+    * 0 on success
+    * 1 if `--compare` found a benchmark slower than `--threshold`
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from editfrontmatter import EditFrontMatter  # noqa: E402
+from editfrontmatter.batch import Batch, BatchTask, walk_files  # noqa: E402
+
+from corpus import CorpusSpec, generate  # noqa: E402
+
+TEMPLATE = """{% set toc = "true" %}
+
+toc: {{ toc }}
+draft: {{ false | canPublish }}
+hasMath: {{ hasMath }}
+stuff: {{ addedVariable }}
+"""
+
+VARIABLES = {'hasMath': False, 'addedVariable': ['one', 'two', 'three']}
+
+GRID = {
+    'fm_keys': (5, 50, 500),
+    'body_kb': (1, 64, 1024),
+    'files': (100, 1000),
+    'jobs': (1, 4),
+    'executor': ('thread', 'process'),
+}
+
+QUICK_GRID = {
+    'fm_keys': (5, 50),
+    'body_kb': (1, 64),
+    'files': (100,),
+    'jobs': (1, 4),
+    'executor': ('thread',),
+}
+
+
+def canPublish(val):
+    """Filter used by :data:`TEMPLATE` (module level for process pools)"""
+    return True
+
+
+def make_document(fm_keys, body_kb) -> str:
+    """A markdown document with `fm_keys` front matter keys and a body of `body_kb` KiB"""
+    lines = ['---\n', 'title: "Benchmark document"\n', 'deleteme: gone\n']
+    for i in range(fm_keys):
+        if i % 3 == 0:
+            lines.append('key{i}: [a, b, c]\n'.format(i=i))
+        elif i % 3 == 1:
+            lines.append('key{i}: {i}\n'.format(i=i))
+        else:
+            lines.append('key{i}: "value {i}"\n'.format(i=i))
+    lines.append('---\n')
+    paragraph = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit.\n'
+    lines.extend([paragraph] * max(1, (body_kb * 1024) // len(paragraph)))
+    return ''.join(lines)
+
+
+def timeit(func, setup=None, repeat=7, min_time=0.05) -> dict:
+    """ Time `func` and return per call statistics in seconds.
+
+    `setup` (if given) is called before every call and is not timed. The
+    number of calls per sample is calibrated so a sample lasts at least
+    `min_time` seconds.
+    """
+    def sample(number):
+        total = 0.0
+        for _ in range(number):
+            arg = setup() if setup else None
+            start = time.perf_counter()
+            func(arg)
+            total += time.perf_counter() - start
+        return total / number
+
+    number = 1
+    while True:
+        start = time.perf_counter()
+        sample(number)
+        if time.perf_counter() - start >= min_time or number >= 10000:
+            break
+        number *= 2
+
+    samples = [sample(number) for _ in range(repeat)]
+    return {'min': min(samples), 'median': statistics.median(samples),
+            'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            'number': number, 'repeat': repeat}
+
+
+class Suite(object):
+    """Collects benchmark results"""
+
+    def __init__(self, pattern=None, repeat=7):
+        self.pattern = re.compile(pattern) if pattern else None
+        self.repeat = repeat
+        self.results = {}
+
+    def wanted(self, name) -> bool:
+        return self.pattern is None or bool(self.pattern.search(name))
+
+    def add(self, name, stats, **extra) -> None:
+        stats.update(extra)
+        self.results[name] = stats
+        line = "{name:<58} {median:>12.6f}s".format(name=name, median=stats['median'])
+        if 'files_per_s' in stats:
+            line += "  {fps:>10.1f} files/s".format(fps=stats['files_per_s'])
+        print(line)
+
+
+def bench_stages(suite, workdir, grid) -> None:
+    """Per method benchmarks"""
+    for fm_keys in grid['fm_keys']:
+        for body_kb in grid['body_kb']:
+            label = "[fm={k},body={b}k]".format(k=fm_keys, b=body_kb)
+            path = os.path.join(workdir, "stage_{k}_{b}.md".format(k=fm_keys, b=body_kb))
+            with open(path, 'w') as fo:
+                fo.write(make_document(fm_keys, body_kb))
+
+            proc = EditFrontMatter(file_path=path, template_str=TEMPLATE, keys_toDelete=['deleteme'])
+            proc.add_JinjaFilter('canPublish', canPublish)
+
+            if suite.wanted('readFile' + label):
+                suite.add('readFile' + label,
+                          timeit(lambda _: proc.readFile(), repeat=suite.repeat))
+
+            if suite.wanted('run' + label):
+                suite.add('run' + label,
+                          timeit(lambda _: proc.run(VARIABLES), setup=proc.readFile, repeat=suite.repeat))
+
+            proc.readFile()
+            proc.run(VARIABLES)
+
+            if suite.wanted('dumpFrontMatter' + label):
+                suite.add('dumpFrontMatter' + label,
+                          timeit(lambda _: proc.dumpFrontMatter(), repeat=suite.repeat))
+
+            if suite.wanted('dumpFileData' + label):
+                suite.add('dumpFileData' + label,
+                          timeit(lambda _: proc.dumpFileData(), repeat=suite.repeat))
+
+            if suite.wanted('writeFile' + label):
+                out = path + '.out'
+                suite.add('writeFile' + label,
+                          timeit(lambda _: proc.writeFile(out), repeat=suite.repeat))
+
+
+def bench_batch(suite, workdir, grid) -> None:
+    """End to end batch throughput (read, run, dump, write) on a generated corpus"""
+    body_kb = grid['body_kb'][0]
+    fm_keys = grid['fm_keys'][-1 if len(grid['fm_keys']) < 3 else 1]
+
+    for files in grid['files']:
+        source = os.path.join(workdir, "source_{n}".format(n=files))
+        tree = os.path.join(workdir, "tree_{n}".format(n=files))
+        generate(source, CorpusSpec(files=files, seed=files, fm_extra=fm_keys, body_kb=body_kb,
+                                    body_dist='fixed'))
+
+        def fresh_tree():
+            """Untimed: every call edits an unmodified copy of the corpus"""
+            shutil.rmtree(tree, ignore_errors=True)
+            shutil.copytree(source, tree)
+            return list(walk_files([tree]))
+
+        for executor in grid['executor']:
+            for jobs in grid['jobs']:
+                if executor == 'process' and jobs == 1:
+                    continue
+                name = "batch[files={n},fm={k},body={b}k,{e},jobs={j}]".format(
+                    n=files, k=fm_keys, b=body_kb, e=executor, j=jobs)
+                if not suite.wanted(name):
+                    continue
+                task = BatchTask(template_str=TEMPLATE, extraVars_dict=VARIABLES,
+                                 keys_toDelete=['deleteme'], filters={'canPublish': canPublish},
+                                 write=True)
+
+                def run_batch(entries):
+                    report = Batch(task=task, jobs=jobs, executor=executor).run(entries)
+                    assert report.errors == 0, report.counts
+                    assert report.counts['written'] == files, report.counts
+
+                stats = timeit(run_batch, setup=fresh_tree, repeat=max(3, suite.repeat // 2), min_time=0)
+                suite.add(name, stats, files=files, files_per_s=files / stats['median'])
+        shutil.rmtree(tree, ignore_errors=True)
+        shutil.rmtree(source)
+
+
+def compare(results, baseline_path, threshold) -> bool:
+    """ Print the ratio of each median to the baseline.
+
+    Returns:
+        `True` if a benchmark regressed by more than `threshold`
+    """
+    with open(baseline_path) as fo:
+        baseline = json.load(fo)['results']
+
+    regressed = False
+    print("\n{name:<58} {ratio:>8}".format(name="comparison with " + baseline_path, ratio="ratio"))
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        ratio = results[name]['median'] / baseline[name]['median']
+        flag = ''
+        if ratio > threshold:
+            flag = '  SLOWER'
+            regressed = True
+        elif ratio < 1.0 / threshold:
+            flag = '  faster'
+        print("{name:<58} {ratio:>8.3f}{flag}".format(name=name, ratio=ratio, flag=flag))
+    return regressed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="EditFrontMatter stage and batch benchmarks")
+    parser.add_argument('--quick', action='store_true', help='small parameter grid')
+    parser.add_argument('--filter', metavar='REGEX', help='only run matching benchmarks')
+    parser.add_argument('--repeat', type=int, default=7, help='samples per benchmark (default: %(default)s)')
+    parser.add_argument('--output', metavar='FILE', help='save results as json')
+    parser.add_argument('--compare', metavar='FILE', help='baseline json to compare against')
+    parser.add_argument('--threshold', type=float, default=1.10,
+                        help='slowdown ratio reported as a regression (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    grid = QUICK_GRID if args.quick else GRID
+    suite = Suite(args.filter, args.repeat)
+
+    workdir = tempfile.mkdtemp(prefix='efm-bench-')
+    try:
+        bench_stages(suite, workdir, grid)
+        bench_batch(suite, workdir, grid)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as fo:
+            json.dump({'meta': {'python': platform.python_version(),
+                                'implementation': platform.python_implementation(),
+                                'platform': platform.platform(),
+                                'cpus': os.cpu_count(),
+                                'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                                'grid': grid},
+                       'results': suite.results}, fo, indent=2, sort_keys=True)
+
+    if args.compare and compare(suite.results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+*Synthetic Corpus Generator*
+===========================================
+
+.. program:: corpus.py
+
+:Synopsis: Generate reproducible (seeded) trees of markdown files with yaml
+    front matter for scale and performance testing. File count, directory
+    depth and fan-out, front matter size and key distribution, body size
+    distribution and the share of pathological files (no front matter,
+    missing closing delimiter, empty) are all controllable.
+
+    Every file is generated from its own seed (`seed`, index) so a corpus
+    is identical between runs and any file can be regenerated alone.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Example:
+
+    ::
+
+        # 10k files shaped like a blog
+        python benchmarks/corpus.py /tmp/corpus --profile blog --files 10000 --seed 1
+
+        # heavy tailed body sizes with 5% broken files
+        python benchmarks/corpus.py /tmp/corpus --files 100000 --body-dist pareto \\
+            --body-kb 8 --no-close 0.05
+
+    From python::
+
+        from corpus import CorpusSpec, generate
+        summary = generate('/tmp/corpus', CorpusSpec(files=1000, seed=7))
+"""
+
+import os
+import sys
+import json
+import math
+import random
+import argparse
+
+COMMON_KEYS = ('title', 'date', 'draft', 'tags', 'categories', 'author',
+               'description', 'lastmod', 'weight', 'toc', 'type', 'hasMath')
+"""Keys found in most documents, in order of decreasing frequency"""
+
+WORDS = ('python', 'yaml', 'markdown', 'jinja', 'hugo', 'front', 'matter',
+         'batch', 'docs', 'blog', 'release', 'draft', 'guide', 'notes', 'api')
+
+PARAGRAPH = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do "
+             "eiusmod tempor incididunt ut labore et dolore magna aliqua.\n\n")
+
+PROFILES = {
+    # small pages, few keys
+    'blog': dict(fm_keys=12, fm_extra=4, body_kb=4, body_dist='lognormal'),
+    # larger pages, nested params
+    'docs': dict(fm_keys=20, fm_extra=30, body_kb=16, body_dist='lognormal', depth=4, fanout=6),
+    # mostly small files and a few huge ones (scheduling)
+    'heavy-tail': dict(fm_keys=12, fm_extra=8, body_kb=8, body_dist='pareto'),
+    # big front matter (parsing / dumping)
+    'wide': dict(fm_keys=12, fm_extra=500, body_kb=2, body_dist='fixed'),
+}
+
+
+class CorpusSpec(object):
+    """Parameters of a synthetic corpus"""
+
+    def __init__(
+        self, *,
+        files=1000,
+        seed=0,
+        depth=3,
+        fanout=4,
+        fm_keys=12,
+        fm_extra=4,
+        key_skew=1.2,
+        body_kb=4,
+        body_dist='lognormal',
+        max_body_kb=65536,
+        no_fm=0.0,
+        no_close=0.0,
+        empty=0.0,
+        yaml_delim='---'
+    ):
+        """
+        Args:
+            files (int): number of files
+            seed (int): random seed
+            depth (int): directory depth (0: every file in the root)
+            fanout (int): sub directories per directory
+            fm_keys (int): number of :data:`COMMON_KEYS` used (at most 12)
+            fm_extra (int): mean number of additional, rarer keys
+            key_skew (float): Zipf exponent of the rare key distribution
+            body_kb (float): mean body size in KiB
+            body_dist (str): `'fixed'`, `'uniform'`, `'lognormal'` or `'pareto'`
+            max_body_kb (float): body size cap in KiB
+            no_fm (float): share of files without front matter
+            no_close (float): share of files missing the closing delimiter
+            empty (float): share of empty files
+            yaml_delim (str): front matter delimiter
+        """
+        if body_dist not in ('fixed', 'uniform', 'lognormal', 'pareto'):
+            raise ValueError("unknown body_dist '{d}'".format(d=body_dist))
+        if no_fm + no_close + empty > 1.0:
+            raise ValueError("pathological shares add up to more than 1")
+        self.files = files
+        self.seed = seed
+        self.depth = depth
+        self.fanout = fanout
+        self.fm_keys = min(fm_keys, len(COMMON_KEYS))
+        self.fm_extra = fm_extra
+        self.key_skew = key_skew
+        self.body_kb = body_kb
+        self.body_dist = body_dist
+        self.max_body_kb = max_body_kb
+        self.no_fm = no_fm
+        self.no_close = no_close
+        self.empty = empty
+        self.yaml_delim = yaml_delim
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+def directories(spec):
+    """All directories (relative paths) of the tree, breadth first"""
+    dirs = ['']
+    level = ['']
+    for depth in range(spec.depth):
+        level = [os.path.join(parent, "d{d}_{i}".format(d=depth, i=i))
+                 for parent in level for i in range(spec.fanout)]
+        dirs.extend(level)
+    return dirs
+
+
+def _body_size(rng, spec) -> int:
+    mean = spec.body_kb * 1024
+    if spec.body_dist == 'fixed':
+        size = mean
+    elif spec.body_dist == 'uniform':
+        size = rng.uniform(0, 2 * mean)
+    elif spec.body_dist == 'lognormal':
+        sigma = 1.0
+        size = rng.lognormvariate(math.log(mean) - sigma * sigma / 2, sigma)
+    else:
+        # pareto with alpha 1.5 (mean = 3 * xm)
+        size = (mean / 3.0) * rng.paretovariate(1.5)
+    return int(min(size, spec.max_body_kb * 1024))
+
+
+def _value(rng, i):
+    kind = i % 5
+    if kind == 0:
+        return '"{w} {n}"'.format(w=rng.choice(WORDS), n=rng.randint(0, 9999))
+    if kind == 1:
+        return str(rng.randint(0, 100000))
+    if kind == 2:
+        return '[{a}, {b}]'.format(a=rng.choice(WORDS), b=rng.choice(WORDS))
+    if kind == 3:
+        return 'true' if rng.random() < 0.5 else 'false'
+    return '2019-{m:02d}-{d:02d}T10:00:00-05:00'.format(m=rng.randint(1, 12), d=rng.randint(1, 28))
+
+
+def front_matter(rng, spec) -> str:
+    """Yaml lines of one document (without delimiters)"""
+    lines = []
+    common = {
+        'title': lambda: '"{a} {b}"'.format(a=rng.choice(WORDS).title(), b=rng.choice(WORDS)),
+        'date': lambda: _value(rng, 4),
+        'lastmod': lambda: _value(rng, 4),
+        'draft': lambda: _value(rng, 3),
+        'toc': lambda: _value(rng, 3),
+        'hasMath': lambda: _value(rng, 3),
+        'tags': lambda: '[{t}]'.format(t=', '.join(rng.sample(WORDS, rng.randint(1, 4)))),
+        'categories': lambda: '[{c}]'.format(c=rng.choice(WORDS)),
+        'author': lambda: '"Karl N. Redman"',
+        'description': lambda: '"{w}"'.format(w=' '.join(rng.choice(WORDS) for _ in range(8))),
+        'weight': lambda: str(rng.randint(1, 100)),
+        'type': lambda: rng.choice(('page', 'post', 'doc')),
+    }
+    for key in COMMON_KEYS[:spec.fm_keys]:
+        lines.append('{k}: {v}\n'.format(k=key, v=common[key]()))
+
+    # rare keys follow a Zipf like distribution over a large vocabulary
+    extra = int(rng.expovariate(1.0 / spec.fm_extra)) if spec.fm_extra else 0
+    seen = set()
+    for _ in range(extra):
+        rank = int(rng.paretovariate(spec.key_skew))
+        if rank in seen:
+            continue
+        seen.add(rank)
+        lines.append('x_key{r}: {v}\n'.format(r=rank, v=_value(rng, rank)))
+    if rng.random() < 0.2:
+        lines.append('params:\n  nested: {v}\n  list:\n    - {a}\n    - {b}\n'.format(
+            v=_value(rng, 1), a=rng.choice(WORDS), b=rng.choice(WORDS)))
+    return ''.join(lines)
+
+
+def body(rng, spec) -> str:
+    size = _body_size(rng, spec)
+    text = "# {t}\n\n".format(t=rng.choice(WORDS).title())
+    repeats = size // len(PARAGRAPH) + 1
+    return text + (PARAGRAPH * repeats)[:max(0, size - len(text))]
+
+
+def document(spec, index):
+    """ Generate document `index` of the corpus.
+
+    Returns:
+        (kind, text) where kind is `'ok'`, `'no-fm'`, `'no-close'` or `'empty'`
+    """
+    rng = random.Random(spec.seed * 1000003 + index)
+    draw = rng.random()
+    if draw < spec.empty:
+        return 'empty', ''
+    delim = spec.yaml_delim + '\n'
+    if draw < spec.empty + spec.no_fm:
+        return 'no-fm', body(rng, spec)
+    if draw < spec.empty + spec.no_fm + spec.no_close:
+        return 'no-close', delim + front_matter(rng, spec) + '\n' + body(rng, spec)
+    return 'ok', delim + front_matter(rng, spec) + delim + '\n' + body(rng, spec)
+
+
+def generate(root, spec, progress=None) -> dict:
+    """ Write the corpus below `root`.
+
+    Files are spread over the directories of the tree round robin so every
+    directory gets about the same number of files.
+
+    Args:
+        root (str): output directory (created if needed)
+        spec (CorpusSpec): corpus parameters
+        progress (callable): called with the number of files written every 10000 files
+
+    Returns:
+        summary dict: spec, counts per kind, total bytes
+    """
+    dirs = directories(spec)
+    for d in dirs:
+        os.makedirs(os.path.join(root, d), exist_ok=True)
+
+    counts = {'ok': 0, 'no-fm': 0, 'no-close': 0, 'empty': 0}
+    total = 0
+    for index in range(spec.files):
+        kind, text = document(spec, index)
+        path = os.path.join(root, dirs[index % len(dirs)], "doc{i:07d}.md".format(i=index))
+        with open(path, 'w', encoding='utf-8') as fo:
+            fo.write(text)
+        counts[kind] += 1
+        total += len(text)
+        if progress is not None and (index + 1) % 10000 == 0:
+            progress(index + 1)
+
+    summary = {'spec': spec.as_dict(), 'counts': counts, 'bytes': total, 'directories': len(dirs)}
+    with open(os.path.join(root, 'corpus.json'), 'w') as fo:
+        json.dump(summary, fo, indent=2, sort_keys=True)
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic front matter corpus")
+    parser.add_argument('root', help='output directory')
+    parser.add_argument('--profile', choices=sorted(PROFILES), help='preset shape (options override it)')
+    parser.add_argument('--files', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--depth', type=int)
+    parser.add_argument('--fanout', type=int)
+    parser.add_argument('--fm-keys', type=int)
+    parser.add_argument('--fm-extra', type=int)
+    parser.add_argument('--key-skew', type=float)
+    parser.add_argument('--body-kb', type=float)
+    parser.add_argument('--body-dist', choices=('fixed', 'uniform', 'lognormal', 'pareto'))
+    parser.add_argument('--max-body-kb', type=float)
+    parser.add_argument('--no-fm', type=float, help='share of files without front matter')
+    parser.add_argument('--no-close', type=float, help='share of files missing the closing delimiter')
+    parser.add_argument('--empty', type=float, help='share of empty files')
+    args = parser.parse_args(argv)
+
+    options = dict(PROFILES.get(args.profile, {}))
+    for name in ('files', 'seed', 'depth', 'fanout', 'fm_keys', 'fm_extra', 'key_skew', 'body_kb',
+                 'body_dist', 'max_body_kb', 'no_fm', 'no_close', 'empty'):
+        value = getattr(args, name)
+        if value is not None:
+            options[name] = value
+
+    summary = generate(args.root, CorpusSpec(**options),
+                       progress=lambda n: print("{n} files".format(n=n), file=sys.stderr))
+    print(json.dumps({'counts': summary['counts'], 'bytes': summary['bytes']}))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
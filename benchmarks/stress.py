@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+*Batch Stress Test*
+===========================================
+
+.. program:: stress.py
+
+:Synopsis: Generate a large synthetic corpus (see :mod:`corpus`) including
+    pathological files and run the batch engine over it twice with writes
+    enabled. Checks that
+
+    * every file is accounted for,
+    * empty files and files without front matter are skipped,
+    * only files with a missing closing delimiter may fail,
+    * a second run over the written tree changes nothing (idempotence).
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Example:
+
+    ::
+
+        python benchmarks/stress.py --files 10000 --jobs 8 --profile heavy-tail
+        python benchmarks/stress.py --files 1000000 --jobs 16 --processes --root /scratch/corpus
+
+Returns:
+    * 0 if all checks pass
+    * 1 otherwise
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from editfrontmatter.batch import Batch, BatchTask, walk_files  # noqa: E402
+
+from corpus import CorpusSpec, PROFILES, generate  # noqa: E402
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Batch engine stress test")
+    parser.add_argument('--files', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='blog')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--processes', action='store_true')
+    parser.add_argument('--root', help='corpus directory (default: temporary, removed afterwards)')
+    args = parser.parse_args(argv)
+
+    root = args.root or tempfile.mkdtemp(prefix='efm-stress-')
+    options = dict(PROFILES[args.profile], files=args.files, seed=args.seed,
+                   no_fm=0.02, no_close=0.02, empty=0.01)
+    try:
+        summary = generate(root, CorpusSpec(**options))
+        kinds = summary['counts']
+        print("corpus: {c}".format(c=kinds))
+
+        task = BatchTask(operations=[{'op': 'set', 'path': 'params.stress', 'value': True},
+                                     {'op': 'append', 'path': 'tags', 'value': 'stress', 'unique': True}],
+                         keys_toDelete=['x_key1'], write=True)
+        executor = 'process' if args.processes else 'thread'
+
+        first = Batch(task=task, jobs=args.jobs, executor=executor).run(walk_files([root]))
+        print("first run:  {c} in {t:.2f}s ({r:.0f} files/s)".format(
+            c=first.counts, t=first.elapsed, r=first.files / max(first.elapsed, 1e-9)))
+        second = Batch(task=task, jobs=args.jobs, executor=executor).run(walk_files([root]))
+        print("second run: {c} in {t:.2f}s".format(c=second.counts, t=second.elapsed))
+
+        checks = [
+            ('all files processed', first.files == args.files),
+            ('empty files skipped', first.counts['empty'] == kinds['empty']),
+            ('files without front matter skipped', first.counts['no-yaml'] == kinds['no-fm']),
+            ('errors only from missing delimiters', first.counts['error'] <= kinds['no-close']),
+            ('second run unchanged', second.counts['written'] == 0 and second.counts['changed'] == 0),
+        ]
+        failed = [name for name, ok in checks if not ok]
+        for name, ok in checks:
+            print("{s}: {n}".format(s='ok  ' if ok else 'FAIL', n=name))
+        return 1 if failed else 0
+    finally:
+        if not args.root:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
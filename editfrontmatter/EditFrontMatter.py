@@ -32,47 +32,219 @@ Edit Front Matter Module
 """
 
 # Imports
+import io
+import os
 import re
-import traceback
-import oyaml as yaml    # preserve yaml dict order
-import jinja2
+import locale
+import threading
+from collections import OrderedDict
+from ._lazy import LazyModule
+from .operations import compile_operations
+from .filtercache import pure_filter, drop_filter_cache
+from .instrument import clock
+
+# marks front matter that has been located but not parsed yet
+_UNPARSED = object()
+
+# heavy dependencies are imported on first use (fast startup)
+yaml = LazyModule('oyaml')      # preserve yaml dict order
+jinja2 = LazyModule('jinja2')
+
+_default_env = None
+_default_env_lock = threading.Lock()
+
+
+def _default_jinja2_env():
+    """The environment shared by instances created without `jinja2_env`"""
+    global _default_env
+    if _default_env is None:
+        with _default_env_lock:
+            if _default_env is None:
+                _default_env = jinja2.Environment(loader=None)
+    return _default_env
+
+
+TEMPLATE_CACHE_SIZE = 64
+"""Compiled templates kept per :class:`jinja2.Environment` (see :func:`compiled_template`)"""
+
+_templates_lock = threading.Lock()
+
+
+def compiled_template(env, source):
+    """ Compile `source` in `env`, or return the template compiled by an earlier call.
+
+    Compiled templates are kept in a small LRU cache stored on the
+    environment (templates reference their environment, so the cache lives
+    and dies with it), so objects sharing an environment (batches, the
+    daemon) compile each template once. Filters are looked up when
+    rendering, so filters added after compilation are used.
+
+    Args:
+        env (jinja2.Environment): environment
+        source (str): template source
+
+    Returns:
+        :class:`jinja2.Template`
+    """
+    with _templates_lock:
+        cache = getattr(env, '_editfrontmatter_templates', None)
+        if cache is None:
+            cache = env._editfrontmatter_templates = OrderedDict()
+        template = cache.get(source)
+        if template is not None:
+            cache.move_to_end(source)
+            return template
+    template = env.from_string(source)
+    with _templates_lock:
+        cache[source] = template
+        if len(cache) > TEMPLATE_CACHE_SIZE:
+            cache.popitem(last=False)
+    return template
+
+
+def _padding(size, newline="\n"):
+    """ Blank yaml comment lines filling exactly `size` characters.
+
+    Returns:
+        * the padding string
+        * `None` if `size` can not be filled with whole lines
+    """
+    if size == 0 or size == len(newline):
+        return newline[:size]
+    shortest = 1 + len(newline)
+    if size < shortest:
+        return None
+    lines = []
+    while size:
+        width = min(size, 80)
+        if 0 < size - width < shortest:
+            width = size - shortest
+        lines.append("#" + " " * (width - shortest) + newline)
+        size -= width
+    return ''.join(lines)
+
+
+def _map_file(file_path):
+    """Map `file_path` read only (empty files can not be mapped)"""
+    import mmap
+    with open(file_path, "rb") as fo:
+        if os.fstat(fo.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(fo.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _sync_dir(path):
+    """fsync the directory of `path` so a rename survives a power loss (no-op on Windows)"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _replace_file(file_path, chunks, durable=False):
+    """Write `chunks` to a temporary file and rename it over `file_path`
+
+    With `durable`, the data is synced before the rename and the directory
+    after it: the file is then either the old or the new one after a crash
+    or a power loss.
+    """
+    import shutil
+    tmp = "{path}.{pid}.tmp".format(path=file_path, pid=os.getpid())
+    try:
+        with open(tmp, "wb") as fo:
+            for chunk in chunks:
+                fo.write(chunk)
+            if durable:
+                fo.flush()
+                os.fsync(fo.fileno())
+        if os.path.exists(file_path):
+            shutil.copymode(file_path, tmp)
+        os.replace(tmp, file_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    if durable:
+        _sync_dir(file_path)
 
 
 class EditFrontMatter_Exception(Exception):
     """Custom exception handler for EditFrontMatter Project"""
-    def __init__(self, msg, exc, *args, **kwargs):
+    def __init__(self, msg, exc=None, *args, stage=None, line_offset=0, **kwargs):
         """
         :Description:
             A custom exception handler for the module. Provides a simplified output message for debugging.
 
+            The traceback of `exc` is only walked and formatted when the
+            exception is converted to a string, so raising it stays cheap
+            when errors are collected in bulk (see :mod:`editfrontmatter.errors`).
+
         Args:
             msg (str):
                 A custom messsage for the exception caught in the code
             exc (Exception):
                 Original exception object from try block
+            stage (str):
+                processing stage that failed (`'read'`, `'parse'`, `'write'`)
+            line_offset (int):
+                line of the source file where the parsed text starts (used to
+                translate yaml error marks into file positions)
+
+        Attributes:
+            self.msg (str): the custom message
+            self.exc (Exception): the original exception
+            self.stage (str): the failed stage
+            self.line_offset (int): see `line_offset`
 
         Returns:
             Exception obj
         """
-        msg += "\n    {exc}".format(exc=str(exc))
-        template = '\n    Error @ {filename}, Line {linenum} in {funcname}:\n    >>>> {source}'
+        super().__init__(msg)
+        self.msg = msg
+        self.exc = exc
+        self.stage = stage
+        self.line_offset = line_offset
+        self._formatted = None
+
+    def __str__(self):
+        if self._formatted is None:
+            self._formatted = self.format()
+        return self._formatted
+
+    def format(self) -> str:
+        """ Format the message with the original exception and its traceback.
+
+        Returns:
+            message string
+        """
+        import traceback
+
+        msg = self.msg
+        exc = self.exc
+        if exc is not None:
+            msg += "\n    {exc}".format(exc=str(exc))
+            template = '\n    Error @ {filename}, Line {linenum} in {funcname}:\n    >>>> {source}'
 
-        for tb_info in traceback.extract_tb(exc.__traceback__):
-            filename, linenum, funcname, source = tb_info
+            for tb_info in traceback.extract_tb(exc.__traceback__):
+                filename, linenum, funcname, source = tb_info
 
-            if funcname != '<module>':
-                funcname = funcname + '()'
-                msg += template.format(
-                    filename=filename,
-                    linenum=linenum,
-                    source=source,
-                    funcname=funcname)
+                if funcname != '<module>':
+                    funcname = funcname + '()'
+                    msg += template.format(
+                        filename=filename,
+                        linenum=linenum,
+                        source=source,
+                        funcname=funcname)
 
         # actual traceback
         # tbe = ''.join(traceback.TracebackException(exc.__class__, exc, exc.__traceback__).format())
-        msg = "EditFrontMatter_Exception: {msg}".format(msg=msg)
-
-        super().__init__(msg)
+        return "EditFrontMatter_Exception: {msg}".format(msg=msg)
 
 
 class EditFrontMatter(object):
@@ -80,10 +252,18 @@ class EditFrontMatter(object):
     def __init__(
         self, *,
         file_path=None,
-        jinja2_env=jinja2.Environment(loader=None),
+        jinja2_env=None,
         template_str="",
         yaml_delim='---',
         keys_toDelete=[],
+        operations=None,
+        observer=None,
+        lazy_yaml=False,
+        in_place=False,
+        header_padding=0,
+        encoding=None,
+        read_mode='text',
+        atomic=False,
         do_readFile=True
     ):
         """Main class for the module. Programmatically Adds / Updates / Deletes yaml \
@@ -106,19 +286,79 @@ class EditFrontMatter(object):
                 allow instantiation without implicit
                 :func:`readFile` call
 
+            lazy_yaml (bool):
+                [default: False]
+                Postpone parsing the front matter until :attr:`fmatter` is
+                first accessed. Delimiter detection (:attr:`yaml_start`,
+                :attr:`yaml_end`, :func:`has_source_yaml`,
+                :func:`has_source_data`) stays eager, so scan only workflows
+                never run the yaml parser. Parse errors are then raised on
+                first access instead of by :func:`readFile`.
+
+            in_place (bool):
+                [default: False]
+                Patch the front matter in place when it fits in the space of
+                the original one (see :func:`writeFile`).
+
+            atomic (bool):
+                [default: False]
+                Write whole files to a temporary file synced to disk and
+                renamed over the original, so an interrupted write (crash,
+                power loss) never leaves a truncated file (see
+                :func:`writeFile`).
+
+            header_padding (int):
+                [default: 0]
+                Characters reserved after the front matter, as blank yaml
+                comment lines, when the whole file is written. Later
+                `in_place` edits can grow into that space.
+
+            encoding (str):
+                [default: `None`, the platform default of :func:`open` in
+                `'text'` mode, UTF-8 otherwise]
+                Encoding of the source file.
+
+            read_mode (str):
+                [default: 'text']
+
+                * `'text'`: the file is decoded into :attr:`file_lines`
+                * `'bytes'`: the file is read into :attr:`file_data`; only
+                  the front matter is decoded and the body is written back
+                  untouched (see :func:`dumpHeader`). Bodies that are not
+                  valid in `encoding` survive byte for byte.
+                * `'mmap'`: like `'bytes'` with :attr:`file_data` memory
+                  mapped (read only). The delimiters are searched in the
+                  mapping, only the front matter is copied and page cache
+                  pages are shared between worker processes. Suited to
+                  large files and scan only workloads.
+
 
         Attributes:
 
             self.file_lines (list):
                 Lines from the data source file. Must be managed after creating the
-                class object if `__init__(do_readFile=False)`
+                class object if `__init__(do_readFile=False)`. In `'bytes'`
+                mode they are decoded from :attr:`file_data` on first access.
+
+            self.file_data (bytes):
+                [default: `None`]
+                The raw source file in `'bytes'` mode (a :class:`mmap.mmap`
+                in `'mmap'` mode, released with the object).
+
+            self.body_offset (int):
+                Offset of the body (after the closing delimiter) in
+                :attr:`file_data`. Set in :func:`readFile` in `'bytes'` mode.
 
             self.file_path (str):
                 Path of source data file. Superfluous if :func:`readFile` is never called
 
             self.fmatter (yaml):
                 [default: empty :class:`dict` if yaml not found]
-                Front matter as a yaml object. Set in :func:`readFile`.
+                Front matter as a yaml object. Set in :func:`readFile`
+                (parsed on first access if `lazy_yaml`).
+
+            self.yaml_text (str):
+                The raw front matter text located by :func:`readFile`.
 
             self.yaml_delim (str):
                 [default:"---"]
@@ -140,11 +380,35 @@ class EditFrontMatter(object):
                 instantiation and executing :func:`run`
 
             self.jinja2_env (jinja2.Environment):
-                This object can be specified during class instantiation if greater control is required
+                This object can be specified during class instantiation if greater control is required.
+                [default: an environment shared by all instances, created on first use]
 
             self.keys_toDelete (list):
                 keys to be deleted from :attr:`fmatter` object. Utilized at the end of the :func:`run` method
 
+            self.operations (list):
+                [default: `None`]
+                Declarative edits (see :mod:`editfrontmatter.operations`)
+                applied directly to :attr:`fmatter` by :func:`run`, after the
+                template (if any) and before :attr:`keys_toDelete`. Either
+                operation mappings or the result of
+                :func:`editfrontmatter.operations.compile_operations`.
+
+            self.observer (:class:`editfrontmatter.instrument.StageObserver`):
+                [default: `None`]
+                Receives per stage timings (see :mod:`editfrontmatter.instrument`).
+                Nothing is timed when `None`.
+
+            self.in_place (bool): see `in_place`
+
+            self.atomic (bool): see `atomic`
+
+            self.header_padding (int): see `header_padding`
+
+            self.encoding (str): see `encoding`
+
+            self.read_mode (str): see `read_mode`
+
         Throws:
             :class:`EditFrontMatter_Exception`
         """
@@ -154,6 +418,13 @@ class EditFrontMatter(object):
         self.yaml_end = None
         self.file_empty = True
 
+        if read_mode not in ('text', 'bytes', 'mmap'):
+            raise ValueError("read_mode must be 'text', 'bytes' or 'mmap'")
+        self.read_mode = read_mode
+        self._file_lines = None
+        self.file_data = None
+        self.body_offset = None
+
         # file info
         self.file_path = file_path
 
@@ -163,13 +434,103 @@ class EditFrontMatter(object):
 
         # jinja2
         self.template_str = template_str
-        self.jinja2_env = jinja2_env
+        self._jinja2_env = jinja2_env
         self.keys_toDelete = keys_toDelete
 
+        # declarative edits
+        self.operations = operations
+
+        # stage instrumentation
+        self.observer = observer
+
+        # front matter parsing
+        self.lazy_yaml = lazy_yaml
+        self.yaml_text = ""
+        self._fmatter = None
+
+        # writing
+        self.in_place = in_place
+        self.atomic = atomic
+        self.header_padding = header_padding
+        self.encoding = encoding
+        self._header_size = None
+
         # possibly postpone reading the file
         if do_readFile:
             self.readFile()
 
+    @property
+    def jinja2_env(self):
+        """:class:`jinja2.Environment` used by :func:`run` (`jinja2` is imported on first access)"""
+        if self._jinja2_env is None:
+            self._jinja2_env = _default_jinja2_env()
+        return self._jinja2_env
+
+    @jinja2_env.setter
+    def jinja2_env(self, env):
+        self._jinja2_env = env
+
+    @property
+    def file_lines(self):
+        """Lines of the source file (decoded from :attr:`file_data` on first access in `'bytes'` mode)"""
+        if self._file_lines is None and self.file_data is not None:
+            text = bytes(self.file_data).decode(self._encoding(), 'surrogateescape')
+            self._file_lines = io.StringIO(text, newline='').readlines()
+        return self._file_lines
+
+    @file_lines.setter
+    def file_lines(self, lines):
+        self._file_lines = lines
+        self.file_data = None
+
+    def _encoding(self) -> str:
+        """The effective encoding of the source file"""
+        if self.encoding:
+            return self.encoding
+        if self.read_mode == 'text' and self.file_data is None:
+            return locale.getpreferredencoding(False)
+        return 'utf-8'
+
+    @property
+    def fmatter(self):
+        """Front matter object (parsed from :attr:`yaml_text` on first access if needed)"""
+        if self._fmatter is _UNPARSED:
+            self._fmatter = self._parse_yaml()
+        return self._fmatter
+
+    @fmatter.setter
+    def fmatter(self, value):
+        self._fmatter = value
+
+    def _parse_yaml(self):
+        """ Parse :attr:`yaml_text`.
+
+        Returns:
+            front matter object (empty :class:`dict` if there is no yaml)
+
+        Throws:
+            :class:`EditFrontMatter_Exception`
+        """
+        yaml_text = self.yaml_text
+        if not yaml_text or yaml_text.isspace():
+            return {}
+
+        observer = self.observer
+        if observer is not None:
+            start = clock()
+
+        try:
+            fmatter = yaml.load(yaml_text, Loader=yaml.FullLoader) or {}
+        except Exception as e:
+            # probably a bad file (i.e. missing ending yaml delimiter
+            raise EditFrontMatter_Exception("yaml.load error -> self.file_path: {file_path}".
+                                            format(file_path=self.file_path), e, stage='parse',
+                                            line_offset=(self.yaml_start or 0) + 1) from e
+
+        if observer is not None:
+            observer.stage('parse', clock() - start, len(yaml_text))
+        return fmatter
+
     def set_yaml_delim(self, delim, *args, **kwargs) -> None:
         """ Set the yaml delimiter and compile it.
 
@@ -207,6 +568,9 @@ class EditFrontMatter(object):
             If the file source content is empty :attr:`file_empty` is set to
             `True`. This affects :func:`dumpFileData` and :func:`writeFile`
             behavior
+
+            With `lazy_yaml` the front matter is only located here and
+            parsed on the first access of :attr:`fmatter`.
         """
 
         if file_path is None:
@@ -214,25 +578,79 @@ class EditFrontMatter(object):
         else:
             self.file_path = file_path
 
+        observer = self.observer
+
         # if no file path, user is managing `file_lines` outside of the class
         if self.file_path is not None:
-            # with open(file_path, "r") as fo:
-            #     self.file_lines = fo.readlines()
+            if observer is not None:
+                start = clock()
             try:
-                with open(file_path, "r") as fo:
-                    self.file_lines = fo.readlines()
+                if self.read_mode == 'text':
+                    with open(file_path, "r", encoding=self.encoding) as fo:
+                        self.file_lines = fo.readlines()
+                    size = sum(map(len, self.file_lines))
+                elif self.read_mode == 'bytes':
+                    with open(file_path, "rb") as fo:
+                        self.file_data = fo.read()
+                    self._file_lines = None
+                    size = len(self.file_data)
+                else:
+                    self.file_data = _map_file(file_path)
+                    self._file_lines = None
+                    size = len(self.file_data)
             except IOError as e:
-                import sys
-                t, v, tb = sys.exc_info()
                 raise EditFrontMatter_Exception("self.file_path: {file_path}".
-                                                format(file_path=self.file_path), e) from e
+                                                format(file_path=self.file_path), e, stage='read') from e
+            if observer is not None:
+                observer.stage('read', clock() - start, size)
+
+        if observer is not None:
+            start = clock()
 
         # yaml data re-init / paranoia
         self.yaml_start = None
         self.yaml_end = None
         self.fmatter = None
         self.file_empty = True
+        self.body_offset = None
+
+        if self.file_data is not None:
+            self._scanData()
+        else:
+            self._scanLines()
 
+        if observer is not None:
+            observer.stage('scan', clock() - start, len(self.yaml_text))
+
+        # set fmatter obj -empty dict if yaml not found
+        self._fmatter = _UNPARSED
+        if not self.lazy_yaml:
+            self._fmatter = self._parse_yaml()
+
+    def readData(self, data, *args, **kwargs) -> None:
+        """ Load a document from memory instead of a file and locate its front
+        matter (see :func:`readFile`). The object can be reused for any
+        number of documents.
+
+        Args:
+            data (str, bytes):
+                the document. `str` is split into :attr:`file_lines`; bytes
+                like objects are used as :attr:`file_data` (the body is not
+                decoded and :func:`dumpFileData` returns bytes).
+
+        Note:
+            :attr:`file_path` is reset to `None`.
+        """
+        if isinstance(data, str):
+            self.file_lines = data.splitlines(True)
+        else:
+            self.file_data = data
+            self._file_lines = None
+        self.file_path = None
+        self.readFile()
+
+    def _scanLines(self) -> None:
+        """Locate the front matter in :attr:`file_lines`"""
         yaml_lines = []
         line_num = 0
 
@@ -257,24 +675,81 @@ class EditFrontMatter(object):
 
         # TODO: start != Note and end == None
 
-        # set fmatter obj -empty dict if yaml not found
-        try:
-            self.fmatter = yaml.load(''.join(yaml_lines), Loader=yaml.FullLoader) or {}
-        except Exception as e:
-            # probably a bad file (i.e. missing ending yaml delimiter
-            raise EditFrontMatter_Exception("yaml.load error -> self.file_path: {file_path}".
-                                            format(file_path=self.file_path), e) from e
+        self.yaml_text = ''.join(yaml_lines)
+
+    def _scanData(self) -> None:
+        """ Locate the front matter in :attr:`file_data` without decoding the body.
 
-    def writeFile(self, file_path=None, *args, **kwargs) -> bool:
+        Throws:
+            :class:`EditFrontMatter_Exception`
+        """
+        data = self.file_data
+        encoding = self._encoding()
+        pattern = re.compile(self.yaml_delim.encode(encoding))
+        yaml_from = yaml_to = None
+        line_num = 0
+        pos = 0
+        end = len(data)
+
+        # same rules as _scanLines(), on byte offsets
+        while pos < end:
+            newline = data.find(b"\n", pos)
+            following = end if newline < 0 else newline + 1
+            if pattern.match(data, pos, following):
+                if self.yaml_start is None:
+                    self.yaml_start = line_num
+                    yaml_from = following
+                elif self.yaml_end is None:
+                    self.yaml_end = line_num
+                    yaml_to = pos
+                    self.body_offset = following
+                    break
+            elif self.yaml_start is None:
+                # no yaml section found
+                self.yaml_start = 0
+                self.yaml_end = 0
+                break
+            line_num += 1
+            pos = following
+
+        self.yaml_text = ""
+        if yaml_from is not None:
+            try:
+                self.yaml_text = bytes(data[yaml_from:yaml_to]).decode(encoding)
+            except UnicodeDecodeError as e:
+                raise EditFrontMatter_Exception("front matter is not {encoding} -> self.file_path: {file_path}".
+                                                format(encoding=encoding, file_path=self.file_path),
+                                                e, stage='read') from e
+
+    def writeFile(self, file_path=None, *args, data=None, header=None, **kwargs) -> bool:
         """ Write to arg `file_path`, attr :attr:`file_path`
 
         Note:
             If the original file source data was empty after a call to
             :func:`readFile`, no attempt is maid to write to the file.
 
+            With :attr:`in_place`, when the source file is written and the new
+            front matter fits in the original one (see :func:`dumpHeader`),
+            only the front matter is written over the start of the file; the
+            body is neither read back nor rewritten. The whole file is
+            written otherwise, or if its start changed since :func:`readFile`.
+
+            In `'bytes'` mode the body is written from :attr:`file_data`
+            without being decoded or copied. In `'mmap'` mode the source file
+            is replaced (written to a temporary file and renamed) instead of
+            being truncated while it is mapped. With :attr:`atomic` every
+            whole file write is done that way.
+
         Args:
             file_path (str):
                 optional file path
+            data (str):
+                [default: `None`]
+                output of a previous :func:`dumpFileData` call (avoids
+                dumping the front matter twice)
+            header (bytes):
+                [default: `None`]
+                `'bytes'` mode: output of a previous :func:`dumpHeader` call
 
         Returns:
             * `True` if file was written
@@ -287,16 +762,68 @@ class EditFrontMatter(object):
         if not file_path:
             file_path = self.file_path
 
+        if data is None and self.file_data is not None:
+            if header is None:
+                header = self.dumpHeader()
+            chunks = (header, self._body())
+        else:
+            if data is None:
+                data = self.dumpFileData()
+            if self._header_size is not None:
+                header = data[:self._header_size]
+            chunks = (data,)
+
+        observer = self.observer
+        if observer is not None:
+            start = clock()
         try:
-            with open(file_path, "w+") as fo:
-                fo.write(self.dumpFileData())
+            size = None
+            if self.in_place and self._header_size is not None and file_path == self.file_path:
+                size = self._patchHeader(file_path, header)
+            if size is None:
+                if self.atomic or (self.read_mode == 'mmap' and file_path == self.file_path):
+                    if isinstance(chunks[0], str):
+                        chunks = (data.encode(self._encoding()),)
+                    _replace_file(file_path, chunks, durable=self.atomic)
+                elif isinstance(chunks[0], str):
+                    with open(file_path, "w+", encoding=self.encoding) as fo:
+                        fo.write(data)
+                else:
+                    with open(file_path, "wb") as fo:
+                        for chunk in chunks:
+                            fo.write(chunk)
+                size = sum(map(len, chunks))
         except IOError as e:
             raise EditFrontMatter_Exception("write to file -> self.file_path: {file_path}".
-                                            format(file_path=self.file_path), e) from e
+                                            format(file_path=self.file_path), e, stage='write') from e
+        if observer is not None:
+            observer.stage('write', clock() - start, size)
 
         return True
 
-    def add_JinjaFilter(self, name, func, *args, **kwargs) -> None:
+    def _patchHeader(self, file_path, header):
+        """ Overwrite the original front matter with `header` (same encoded size).
+
+        Returns:
+            * number of bytes written
+            * `None` if the start of the file does not match the source data
+        """
+        old = self.source_header()
+        new = header if isinstance(header, bytes) else header.encode(self._encoding())
+        if len(new) != len(old):
+            return None
+        with open(file_path, "r+b") as fo:
+            if fo.read(len(old)) != old:
+                # newline translation or the file changed since readFile
+                return None
+            if hasattr(os, 'pwrite'):
+                os.pwrite(fo.fileno(), new, 0)
+            else:
+                fo.seek(0)
+                fo.write(new)
+        return len(new)
+
+    def add_JinjaFilter(self, name, func, *args, pure=False, maxsize=128, **kwargs) -> None:
         """ Add a `Jinja filter <http://jinja.pocoo.org/docs/2.10/templates/#filters>`_
             for setting a jinja2 template variable programmatically through callback.
 
@@ -306,6 +833,21 @@ class EditFrontMatter(object):
                 Jinja template variable name
             func (object):
                 callback function that will set `name`
+            pure (bool):
+                [default: False]
+                `func` only depends on its arguments. Results are memoized in a
+                thread safe LRU cache that is shared by every instance
+                registering the same `func` (see :mod:`editfrontmatter.filtercache`)
+            maxsize (int):
+                [default: 128]
+                size of the cache when `pure` is `True` (`None` for unbounded).
+                Must be the same for every instance sharing the cache.
+
+        Hint:
+            Cache statistics are available through :func:`jinja_filter_cache_info`.
+
+        Throws:
+            ValueError (`func` is already memoized with another `maxsize`)
 
 
         :Example of implementing a filter for callback:
@@ -354,6 +896,8 @@ class EditFrontMatter(object):
                 # print the new file contents (uncomment to see dump)
                 # print(obj.dumpFileData())
                 """
+        if pure:
+            func = pure_filter(func, maxsize)
         self.jinja2_env.filters[name] = func
 
     def del_JinjaFilter(self, name, *args, **kwargs) -> bool:
@@ -363,14 +907,33 @@ class EditFrontMatter(object):
             name (str):
                 filter key
 
+        Note:
+            The shared cache of a `pure` filter is dropped along with the filter.
+
         :returns:
             * True if filter found and deleted
             * False if filter not found
         """
-        # TODO: check filter exists (assert?)
-        del self.jinja2_env.filters[name]
+        func = self.jinja2_env.filters.pop(name, None)
+        if func is None:
+            return False
+        drop_filter_cache(func)
         return True
 
+    def jinja_filter_cache_info(self, name, *args, **kwargs):
+        """ Cache statistics of a filter added with `pure=True`.
+
+        Args:
+            name (str):
+                filter key
+
+        Returns:
+            * :class:`editfrontmatter.filtercache.CacheInfo`
+            * `None` if the filter does not exist or is not memoized
+        """
+        func = self.jinja2_env.filters.get(name)
+        return func.cache_info() if hasattr(func, 'cache_info') else None
+
     def dumpFrontMatter(self, *args, **kwargs) -> str:
         """ Dump `fmatter` as a string
 
@@ -379,7 +942,89 @@ class EditFrontMatter(object):
         """
         return yaml.dump(self.fmatter, default_flow_style=False)
 
-    def dumpFileData(self, *args, **kwargs) -> str:
+    def source_header(self) -> bytes:
+        """ The original front matter, delimiters included, as encoded in the source file.
+
+        Returns:
+            bytes (empty if there is no yaml)
+        """
+        if not self.has_source_data() or not self.has_source_yaml():
+            return b""
+        if self.file_data is not None:
+            return bytes(self.file_data[:self._bodyOffset()])
+        return ''.join(self.file_lines[:self._bodyLine()]).encode(self._encoding())
+
+    def _missingEnd(self) -> EditFrontMatter_Exception:
+        return EditFrontMatter_Exception("missing closing yaml delimiter -> self.file_path: {file_path}".
+                                         format(file_path=self.file_path), stage='parse')
+
+    def _bodyOffset(self) -> int:
+        if self.body_offset is None:
+            raise self._missingEnd()
+        return self.body_offset
+
+    def _bodyLine(self) -> int:
+        """`'text'` mode: index of the first body line in :attr:`file_lines`"""
+        if self.yaml_end is None:
+            raise self._missingEnd()
+        return self.yaml_end + 1
+
+    def _body(self) -> memoryview:
+        """`'bytes'` mode: the body as a view of :attr:`file_data`"""
+        return memoryview(self.file_data)[self._bodyOffset():]
+
+    def _dumpHeader(self):
+        """ Front matter with delimiters and padding (see :func:`dumpFileData`).
+
+        Returns:
+            * str in `'text'` mode
+            * bytes in `'bytes'` mode
+        """
+        head = self.yaml_delim + "\n" + self.dumpFrontMatter()
+        tail = self.yaml_delim + "\n"
+        padding = None
+        self._header_size = None
+        if self.in_place:
+            encoding = self._encoding()
+            fill = len(self.source_header()) - len((head + tail).encode(encoding))
+            padding = _padding(fill) if fill >= 0 else None
+            if padding is not None:
+                self._header_size = len(head) + len(padding) + len(tail)
+        if padding is None:
+            padding = _padding(self.header_padding) or ""
+        header = head + padding + tail
+        if self.file_data is not None:
+            header = header.encode(self._encoding())
+            if self._header_size is not None:
+                self._header_size = len(header)
+        return header
+
+    def dumpHeader(self, *args, **kwargs):
+        """ Dump the front matter with its delimiters (the start of :func:`dumpFileData`).
+
+        Hint:
+            In `'bytes'` mode compare the result with :func:`source_header`
+            and pass it to :func:`writeFile` to edit a file without ever
+            decoding or copying its body.
+
+        Returns:
+            * str in `'text'` mode, bytes in `'bytes'` mode
+            * empty if file source content is empty *or* original yaml was *not* present.
+        """
+        observer = self.observer
+        if observer is not None:
+            start = clock()
+
+        header = b"" if self.file_data is not None else ""
+        self._header_size = None
+        if self.has_source_data() and self.has_source_yaml():
+            header = self._dumpHeader()
+
+        if observer is not None:
+            observer.stage('dump', clock() - start, len(header))
+        return header
+
+    def dumpFileData(self, *args, **kwargs):
         """ Concatenate frontmatter with original content and return as a string.
 
         Returns:
@@ -389,18 +1034,39 @@ class EditFrontMatter(object):
             * An empty string if file source content is empty *or* original \
                 yaml was *not* present.
 
+            * bytes instead of strings in `'bytes'` mode
+
         Hint:
             :attr:`fmatter` and :attr:`file_lines` are still available if needed
             beyond this method. One way of managing this data would be to
             manually prepend yaml front matter to :attr:`file_lines` and rerun
             :func:`readFile` before calling this function again.
+
+        Note:
+            With :attr:`in_place`, a front matter that is not larger than the
+            original one (in encoded bytes) is padded with blank yaml comment
+            lines to exactly the original size, so :func:`writeFile` can
+            patch it in place. Otherwise :attr:`header_padding` characters
+            are reserved.
         """
 
+        observer = self.observer
+        if observer is not None:
+            start = clock()
+
         # accomidate for empty file or accomidate for empty front matter
+        binary = self.file_data is not None
+        data = b"" if binary else ""
+        self._header_size = None
         if self.has_source_data() and self.has_source_yaml():
-            return self.yaml_delim + "\n" + self.dumpFrontMatter() + \
-                self.yaml_delim + "\n" + ''.join(self.file_lines[self.yaml_end + 1:])
-        return ""
+            if binary:
+                data = self._dumpHeader() + self._body()
+            else:
+                data = self._dumpHeader() + ''.join(self.file_lines[self._bodyLine():])
+
+        if observer is not None:
+            observer.stage('dump', clock() - start, len(data))
+        return data
 
     def has_source_yaml(self) -> bool:
         """ Checks if the yaml is empty after a call to :func:`readFile`
@@ -425,6 +1091,8 @@ class EditFrontMatter(object):
             * `True` if the source data content **is** empty
             * `False`  if the source data is **not** empty
         """
+        if self.file_data is not None:
+            return len(self.file_data) > 0
         return True if len(self.file_lines) > 0 else False
 
     def run(self, extraVars_dict={}, *args, **kwargs) -> None:
@@ -432,6 +1100,12 @@ class EditFrontMatter(object):
 
         Variables to change yaml data are passed as a dictionary argument as `extraVars_dict`.
 
+        The order of processing is:
+
+            #. render :attr:`template_str` (skipped if empty) and update :attr:`fmatter`
+            #. apply :attr:`operations` (if any)
+            #. delete :attr:`keys_toDelete`
+
         Args:
             extraVars_dict (dict):
                 key,value pairs to be set or added in the :attr:`fmatter` object.
@@ -444,16 +1118,47 @@ class EditFrontMatter(object):
                 ...
                 proc.run({'hasMath': True, 'addedVariable': ['one', 'two', 'three']})
                 ...
+
+            Edit nested keys without a template::
+
+                proc = EditFrontMatter(file_path="example1.md", operations=[
+                    {'op': 'set', 'path': 'params.math', 'value': True},
+                    {'op': 'append', 'path': 'tags', 'value': 'python', 'unique': True}])
+                proc.run()
         """
-        # render jinja2 into yaml
-        fmatter_replacement = yaml.load(self.jinja2_env.from_string(
-            self.template_str).render(extraVars_dict), Loader=yaml.FullLoader)
+        observer = self.observer
+        fmatter_replacement = None
+
+        if self.template_str:
+            # render jinja2 into yaml
+            if observer is not None:
+                start = clock()
+            rendered = compiled_template(self.jinja2_env, self.template_str).render(extraVars_dict)
+            if observer is not None:
+                observer.stage('render', clock() - start, len(rendered))
+                start = clock()
+            fmatter_replacement = yaml.load(rendered, Loader=yaml.FullLoader)
+            if observer is not None:
+                observer.stage('reparse', clock() - start, len(rendered))
+
+        if observer is not None:
+            start = clock()
 
         # update the original front matter
         # TODO: exception if fmatter:None
-        self.fmatter.update(fmatter_replacement)
+        if fmatter_replacement:
+            self.fmatter.update(fmatter_replacement)
+
+        # apply declarative edits
+        if self.operations:
+            if not hasattr(self.operations, 'apply'):
+                self.operations = compile_operations(self.operations)
+            self.operations.apply(self.fmatter)
 
         # remove unwanted keys (preserved order from oyaml"
         for key in self.keys_toDelete:
             if key in self.fmatter:
                 del self.fmatter[key]
+
+        if observer is not None:
+            observer.stage('update', clock() - start, len(self.fmatter))
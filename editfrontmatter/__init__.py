@@ -1 +1,2 @@
 from .EditFrontMatter import EditFrontMatter,EditFrontMatter_Exception # noqa
+from .operations import compile_operations, Operation_Exception # noqa
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Lazy module imports
+==============================
+
+.. module:: editfrontmatter._lazy
+
+:Synopsis: Defer importing heavy dependencies (`jinja2`, `oyaml`,
+    `concurrent.futures`) until they are first used so that command line
+    startup and template free runs stay fast.
+"""
+
+# Imports
+import importlib
+
+
+class LazyModule(object):
+    """A module proxy that imports `name` on first attribute access"""
+
+    def __init__(self, name):
+        self.__dict__['_lazy_name'] = name
+
+    def __getattr__(self, attr):
+        # only called for attributes not yet cached in the proxy
+        value = getattr(importlib.import_module(self._lazy_name), attr)
+        self.__dict__[attr] = value
+        return value
+
+    def __repr__(self):
+        return "<lazy module '{name}'>".format(name=self._lazy_name)
@@ -0,0 +1,905 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Batch Processing
+==============================
+
+.. module:: editfrontmatter.batch
+
+:Synopsis: Walk directory trees and edit every matching file with
+    :class:`editfrontmatter.EditFrontMatter.EditFrontMatter` on a thread or
+    process pool. This is the library version of the example3 directory
+    walker and the engine behind the `editfrontmatter` command.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+
+:Example:
+
+    ::
+
+        task = BatchTask(template_str=template_str,
+                         extraVars_dict={'hasMath': False},
+                         keys_toDelete=['deleteme'],
+                         filters={'canPublish': canPublish_func},
+                         write=False)
+        batch = Batch(task=task, jobs=4)
+        report = batch.run(walk_files(['content/']))
+        print(report.counts)
+"""
+
+# Imports
+import os
+import re
+import time
+import uuid
+import fnmatch
+import threading
+from collections import namedtuple, OrderedDict
+
+from .EditFrontMatter import EditFrontMatter
+from .operations import compile_operations
+from .instrument import StageTimings
+from .errors import error_record
+from ._lazy import LazyModule
+
+# the pools are only needed for parallel runs
+futures = LazyModule('concurrent.futures')
+
+FileEntry = namedtuple('FileEntry', ['path', 'size'])
+"""A file to process and its size in bytes (from the directory walk)"""
+
+STATUSES = ('written', 'changed', 'unchanged', 'extracted', 'empty', 'no-yaml', 'error')
+"""Possible :attr:`FileResult.status` values"""
+
+SCHEDULES = ('walk', 'lpt')
+"""File ordering policies of :class:`Batch`:
+
+    * walk: walk order, streamed (bounded memory)
+    * lpt: largest files first (longest processing time first). The walk is
+      collected before processing starts so the few huge files of a skewed
+      tree do not end up last, leaving the other workers idle.
+"""
+
+CHUNK_FILES = 64
+"""Maximum number of files per chunk (see :func:`chunked`)"""
+
+
+def _compile_globs(patterns):
+    """Compile glob patterns into one regex (`None` if no patterns)"""
+    if not patterns:
+        return None
+    return re.compile('|'.join('(?:{p})'.format(p=fnmatch.translate(p)) for p in patterns))
+
+
+def walk_files(paths, include=('*.md',), exclude=()):
+    """ Recursively collect files to process.
+
+    Directories are visited in sorted order so runs are reproducible.
+    Symbolic links to directories are not followed (as with :func:`os.walk`),
+    so link cycles can not make the walk endless.
+
+    Args:
+        paths (list):
+            files and/or directories. Files given explicitly are not
+            filtered by `include`.
+        include (list):
+            [default: ('*.md',)] glob patterns matched against file names
+        exclude (list):
+            glob patterns matched against the name, the path relative to
+            the walked directory and the full path of files and
+            directories. Excluded directories are not descended into.
+
+    Yields:
+        :class:`FileEntry`
+    """
+    include_re = _compile_globs(include)
+    exclude_re = _compile_globs(exclude)
+
+    def excluded(name, path, top):
+        if exclude_re is None:
+            return False
+        rel = os.path.relpath(path, top).replace(os.sep, '/')
+        return bool(exclude_re.match(name) or exclude_re.match(rel) or exclude_re.match(path))
+
+    for top in paths:
+        if not os.path.isdir(top):
+            if not excluded(os.path.basename(top), top, os.path.dirname(top) or '.'):
+                try:
+                    size = os.stat(top).st_size
+                except OSError:
+                    size = 0    # reported by process_file()
+                yield FileEntry(top, size)
+            continue
+
+        stack = [top]
+        while stack:
+            try:
+                entries = sorted(os.scandir(stack.pop()), key=lambda e: e.name)
+            except OSError:
+                continue
+            subdirs = []
+            for entry in entries:
+                if excluded(entry.name, entry.path, top):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file() and (include_re is None or include_re.match(entry.name)):
+                    yield FileEntry(entry.path, entry.stat().st_size)
+            stack.extend(reversed(subdirs))
+
+
+def schedule_entries(entries, schedule='walk'):
+    """ Order `entries` according to a :data:`SCHEDULES` policy.
+
+    Args:
+        entries (iterable): :class:`FileEntry` objects (or paths, size 0)
+        schedule (str): one of :data:`SCHEDULES`
+
+    Returns:
+        iterable of entries
+    """
+    if schedule == 'walk':
+        return entries
+    if schedule == 'lpt':
+        # stable: equal sizes stay in walk order
+        return sorted(entries, key=lambda e: -getattr(e, 'size', 0))
+    raise ValueError("schedule must be one of {s}".format(s=', '.join(SCHEDULES)))
+
+
+def chunked(entries, jobs, chunk_bytes, chunk_files=CHUNK_FILES, total_bytes=None):
+    """ Group entries of similar size into chunks processed by one task
+    submission (amortizes process pool round trips on small files).
+
+    Files are bucketed by size class (powers of two) and a bucket is
+    emitted once it holds `chunk_bytes` or `chunk_files`; a file larger
+    than `chunk_bytes` is a chunk on its own. When `total_bytes` is known
+    (collected walk) the chunk budget shrinks with the remaining work
+    (guided self-scheduling) so the last chunks are small and idle workers
+    pick up the tail instead of waiting on one big chunk.
+
+    Args:
+        entries (iterable): :class:`FileEntry` objects (or paths, size 0)
+        jobs (int): number of workers
+        chunk_bytes (int): target bytes per chunk
+        chunk_files (int): maximum files per chunk
+        total_bytes (int): sum of the entry sizes, if known
+
+    Yields:
+        tuples of paths
+    """
+    remaining = total_bytes
+
+    def budget():
+        if remaining is None:
+            return chunk_bytes
+        return max(1, min(chunk_bytes, remaining // (jobs * 2)))
+
+    buckets = {}
+    limit = budget()
+    for entry in entries:
+        path = getattr(entry, 'path', entry)
+        size = getattr(entry, 'size', 0)
+        bucket = buckets.setdefault(size.bit_length(), [[], 0])
+        bucket[0].append(path)
+        bucket[1] += size
+        if bucket[1] >= limit or len(bucket[0]) >= chunk_files:
+            yield tuple(bucket[0])
+            if remaining is not None:
+                remaining -= bucket[1]
+            bucket[0] = []
+            bucket[1] = 0
+            limit = budget()
+    for key in sorted(buckets, reverse=True):
+        if buckets[key][0]:
+            yield tuple(buckets[key][0])
+
+
+class FileResult(object):
+    """The outcome of processing one file"""
+    __slots__ = ('path', 'status', 'size', 'elapsed', 'error', 'error_class', 'timings', 'memory',
+                 'output', 'digest')
+
+    def __init__(self, path, status, size=0, elapsed=0.0, error=None, error_class=None, timings=None,
+                 memory=None, output=None, digest=None):
+        """
+        Attributes:
+            self.path (str): processed file
+            self.status (str): one of :data:`STATUSES`
+            self.size (int): bytes read
+            self.elapsed (float): processing time in seconds
+            self.error (ErrorRecord): structured error if `status` is `'error'`
+                (see :mod:`editfrontmatter.errors`)
+            self.error_class (str): original exception class name if `status` is `'error'`
+            self.timings (dict): per stage timings if the task is instrumented,
+                see :func:`editfrontmatter.instrument.StageTimings.as_dict`
+            self.memory (dict): peak and retained memory (bytes) if the file
+                was sampled, see :mod:`editfrontmatter.memprofile`
+            self.output (str, bytes): the edited document (or the original
+                one if it was not changed) for :func:`process_document`
+            self.digest (str): hex digest of the output document if the task
+                asks for it (:attr:`BatchTask.digest`)
+        """
+        self.path = path
+        self.status = status
+        self.size = size
+        self.elapsed = elapsed
+        self.error = error
+        self.error_class = error_class
+        self.timings = timings
+        self.memory = memory
+        self.digest = digest
+        self.output = output
+
+    def __repr__(self):
+        return "FileResult({path!r}, {status!r})".format(path=self.path, status=self.status)
+
+
+ENVIRONMENT_CACHE_SIZE = 16
+"""Jinja2 environments kept per process (see :func:`BatchTask.environment`)"""
+
+# per process warm state: {filters key: jinja2.Environment}, least recently used first
+_environments = OrderedDict()
+_environments_lock = threading.Lock()
+
+# per thread reusable processor of process_document(): (BatchTask.token, EditFrontMatter)
+_local = threading.local()
+
+
+class BatchTask(object):
+    """The edit applied to every file of a batch. Instances are picklable so
+    they can be shipped to process pool workers."""
+
+    processor_class = EditFrontMatter
+    """Class of the objects created by :func:`processor`"""
+
+    def __init__(
+        self, *,
+        template_str="",
+        extraVars_dict=None,
+        keys_toDelete=(),
+        operations=None,
+        filters=None,
+        pure_filters=(),
+        yaml_delim='---',
+        write=False,
+        in_place=False,
+        header_padding=0,
+        read_mode='text',
+        encoding=None,
+        atomic=False,
+        digest=False,
+        drop_cache=False,
+        instrument=False,
+        memory_sample=0.0,
+        tracebacks=False
+    ):
+        """
+        Args:
+            template_str (str):
+                Jinja2 template (may be empty if `operations` are used)
+            extraVars_dict (dict):
+                template variables, see :func:`EditFrontMatter.run`
+            keys_toDelete (list):
+                keys to delete from the front matter
+            operations (list):
+                declarative edits, see :mod:`editfrontmatter.operations`
+            filters (dict):
+                {name: callable} Jinja2 filters. Must be module level
+                functions when used with a process pool.
+            pure_filters (list):
+                names of `filters` to memoize, see
+                :func:`EditFrontMatter.add_JinjaFilter`
+            yaml_delim (str):
+                front matter delimiter
+            write (bool):
+                [default: False] write changed files back
+            in_place (bool):
+                [default: False] patch the front matter in place when it fits
+                (see :func:`EditFrontMatter.writeFile`)
+            header_padding (int):
+                [default: 0] characters reserved after the front matter of
+                fully rewritten files for later in place edits
+            read_mode (str):
+                [default: 'text'] `'bytes'` and `'mmap'` only decode the
+                front matter and write bodies back untouched (see
+                :class:`EditFrontMatter`)
+            encoding (str):
+                [default: `None`] encoding of the files
+            atomic (bool):
+                [default: False] replace written files atomically (see
+                :class:`EditFrontMatter`)
+            digest (bool):
+                [default: False] record a digest of each output document in
+                :attr:`FileResult.digest` (see :mod:`editfrontmatter.journal`)
+            drop_cache (bool):
+                [default: False] drop the pages of each processed file from
+                the page cache (see :func:`editfrontmatter.prefetch.drop_cache`)
+            instrument (bool):
+                [default: False] collect per stage timings
+                (see :mod:`editfrontmatter.instrument`)
+            memory_sample (float):
+                [default: 0.0] share of files whose peak and retained memory
+                is measured (see :mod:`editfrontmatter.memprofile`)
+            tracebacks (bool):
+                [default: False] format the traceback of failed files into
+                their :class:`editfrontmatter.errors.ErrorRecord`
+        """
+        # identifies the warm environment in each worker process
+        self.token = uuid.uuid4().hex
+
+        self.template_str = template_str
+        self.extraVars_dict = extraVars_dict or {}
+        self.keys_toDelete = list(keys_toDelete)
+        self.operations = compile_operations(operations) if operations else None
+        self.filters = dict(filters or {})
+        self.pure_filters = frozenset(pure_filters)
+        self.yaml_delim = yaml_delim
+        self.write = write
+        self.in_place = in_place
+        self.header_padding = header_padding
+        self.read_mode = read_mode
+        self.encoding = encoding
+        self.atomic = atomic
+        self.digest = digest
+        self.drop_cache = drop_cache
+        self.instrument = instrument
+        self.memory_sample = memory_sample
+        self.tracebacks = tracebacks
+
+    def environment(self):
+        """ The Jinja2 environment of this task, created once per process and
+        kept warm for every following file. Tasks with the same filters
+        share an environment; the :data:`ENVIRONMENT_CACHE_SIZE` most
+        recently used environments are kept, so short lived tasks do not
+        accumulate.
+
+        Returns:
+            * :class:`jinja2.Environment`
+            * `None` if the task has no template
+        """
+        if not self.template_str:
+            return None
+        return self._environment()
+
+    def _environment_key(self):
+        """What the environment depends on: the filters"""
+        key = tuple(sorted(((name, func, name in self.pure_filters) for name, func in self.filters.items()),
+                           key=lambda item: item[0]))
+        try:
+            hash(key)
+        except TypeError:
+            # unhashable filter callables: not shared with other tasks
+            key = self.token
+        return key
+
+    def _environment(self):
+        """Create (once per process) or return the environment of this task"""
+        key = self._environment_key()
+        with _environments_lock:
+            env = _environments.get(key)
+            if env is not None:
+                _environments.move_to_end(key)
+                return env
+            import jinja2
+            env = jinja2.Environment(loader=None)
+            proc = EditFrontMatter(jinja2_env=env, do_readFile=False)
+            for name, func in self.filters.items():
+                proc.add_JinjaFilter(name, func, pure=name in self.pure_filters)
+            _environments[key] = env
+            if len(_environments) > ENVIRONMENT_CACHE_SIZE:
+                _environments.popitem(last=False)
+        return env
+
+    def variables(self, path) -> dict:
+        """ Template variables for the file `path` (subclasses may add per
+        file variables).
+
+        Returns:
+            dict
+        """
+        return self.extraVars_dict
+
+    def processor(self, file_path=None, do_readFile=True, observer=None) -> EditFrontMatter:
+        """ Create an :class:`EditFrontMatter` object configured for this task.
+
+        Args:
+            file_path (str): file to read
+            do_readFile (bool): read the file during creation
+            observer (StageObserver): stage instrumentation
+        """
+        return self.processor_class(
+            file_path=file_path,
+            jinja2_env=self.environment(),
+            template_str=self.template_str,
+            yaml_delim=self.yaml_delim,
+            keys_toDelete=self.keys_toDelete,
+            operations=self.operations,
+            observer=observer,
+            lazy_yaml=True,     # skipped files are never parsed
+            in_place=self.in_place,
+            header_padding=self.header_padding,
+            encoding=self.encoding,
+            read_mode=self.read_mode,
+            atomic=self.atomic,
+            do_readFile=do_readFile)
+
+
+def _digest(proc, data) -> str:
+    """Digest of the output document (`data`: dumped document, or header in bytes modes)"""
+    import hashlib
+    digest = hashlib.sha256()
+    if isinstance(data, str):
+        digest.update(data.encode('utf-8', 'surrogateescape'))
+    else:
+        digest.update(data)
+        digest.update(proc._body())
+    return digest.hexdigest()[:32]
+
+
+def process_file(path, task) -> FileResult:
+    """ Read, edit and (optionally) write a single file.
+
+    Exceptions are never raised; they are reported in the returned
+    :class:`FileResult`.
+
+    Args:
+        path (str): file to process
+        task (BatchTask): edit to apply
+
+    Returns:
+        :class:`FileResult`
+    """
+    start = time.monotonic()
+    size = 0
+    timings = StageTimings() if task.instrument else None
+    error = None
+    stage = 'read'
+    proc = data = footprint = None
+
+    tracer = None
+    if task.memory_sample:
+        from . import memprofile
+        if memprofile.sampled(path, task.memory_sample):
+            tracer = memprofile.PeakTracer().__enter__()
+    try:
+        proc = task.processor(path, observer=timings)
+        binary = proc.file_data is not None
+        if binary:
+            # only the front matter is compared and written, the body is kept as is
+            size = len(proc.file_data)
+        else:
+            original = ''.join(proc.file_lines)
+            size = _file_size(path, original)
+
+        if not proc.has_source_data():
+            status = 'empty'
+        elif not proc.has_source_yaml():
+            status = 'no-yaml'
+        else:
+            stage = 'run'
+            proc.run(task.variables(path))
+            stage = 'dump'
+            if binary:
+                data = proc.dumpHeader()
+                unchanged = data == proc.source_header()
+            else:
+                data = proc.dumpFileData()
+                unchanged = data == original
+            if unchanged:
+                status = 'unchanged'
+            elif task.write:
+                stage = 'write'
+                if binary:
+                    proc.writeFile(header=data)
+                else:
+                    proc.writeFile(data=data)
+                status = 'written'
+            else:
+                status = 'changed'
+        if tracer is not None:
+            footprint = memprofile.footprint(proc, data)
+    except Exception as e:
+        status = 'error'
+        error = e
+    finally:
+        if tracer is not None:
+            tracer.__exit__(None, None, None)
+
+    if task.drop_cache and status != 'error':
+        from .prefetch import drop_cache
+        drop_cache(path, written=status == 'written')
+
+    result = FileResult(path, status, size, time.monotonic() - start,
+                        timings=timings and timings.as_dict())
+    if task.digest and data is not None and error is None:
+        result.digest = _digest(proc, data)
+    if error is not None:
+        result.error = error_record(path, error, stage, task.tracebacks)
+        result.error_class = result.error.exc_type
+    if tracer is not None:
+        result.memory = dict(footprint or {}, peak=tracer.peak)
+    return result
+
+
+def _document_processor(task) -> EditFrontMatter:
+    """The processor of `task` reused by the calling thread"""
+    cached = getattr(_local, 'processor', None)
+    if cached is None or cached[0] != task.token:
+        cached = _local.processor = (task.token, task.processor(do_readFile=False))
+    return cached[1]
+
+
+def _file_size(path, text) -> int:
+    """Bytes of a file read in text mode (`text`: its str or lines, counted in
+    characters if the file can no longer be stat'ed)"""
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return len(text) if isinstance(text, str) else sum(len(line) for line in text)
+
+
+def process_document(data, task, path=None) -> FileResult:
+    """ Edit an in-memory document. Exceptions are never raised.
+
+    One :class:`EditFrontMatter` object per thread is reused for every
+    document, so nothing is created per document but the result.
+
+    Args:
+        data (str, bytes): the document (bytes are edited without decoding the body)
+        task (BatchTask): edit to apply (`write` is ignored)
+        path (str): name reported in the result and errors, and given to
+            :func:`BatchTask.variables`
+
+    Returns:
+        :class:`FileResult` with the edited document in :attr:`FileResult.output`
+    """
+    start = time.monotonic()
+    timings = StageTimings() if task.instrument else None
+    error = None
+    stage = 'read'
+    output = data
+    try:
+        proc = _document_processor(task)
+        proc.observer = timings
+        proc.readData(data)
+        if not proc.has_source_data():
+            status = 'empty'
+        elif not proc.has_source_yaml():
+            status = 'no-yaml'
+        else:
+            stage = 'run'
+            proc.run(task.variables(path))
+            stage = 'dump'
+            edited = proc.dumpFileData()
+            if edited == data:
+                status = 'unchanged'
+            else:
+                status = 'changed'
+                output = edited
+    except Exception as e:
+        status = 'error'
+        error = e
+
+    # str documents: their utf-8 size (as sent to the daemon)
+    size = len(data) if isinstance(data, (bytes, bytearray)) else len(data.encode('utf-8', 'surrogatepass'))
+    result = FileResult(path, status, size, time.monotonic() - start,
+                        timings=timings and timings.as_dict(), output=output)
+    if error is not None:
+        result.error = error_record(path or '<document>', error, stage, task.tracebacks)
+        result.error_class = result.error.exc_type
+    return result
+
+
+def json_keys(value):
+    """ `value` with the keys of its mappings converted to strings, recursively.
+    Yaml keys may be dates, numbers or `null`; json only takes strings (other
+    values are left to the `default` of :func:`json.dumps`).
+
+    Returns:
+        a copy of the dicts and lists of `value`
+    """
+    if isinstance(value, dict):
+        return OrderedDict((str(key), json_keys(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [json_keys(item) for item in value]
+    return value
+
+
+def extract_file(path, task) -> FileResult:
+    """ Read a file and parse its front matter without editing it.
+    Exceptions are never raised.
+
+    Args:
+        path (str): file to read
+        task (BatchTask): reading options (`yaml_delim`, `read_mode`,
+            `encoding`); the edit is ignored
+
+    Returns:
+        :class:`FileResult`, status `'extracted'` with the front matter
+        object in :attr:`FileResult.output`
+    """
+    start = time.monotonic()
+    size = 0
+    error = None
+    stage = 'read'
+    output = None
+    try:
+        proc = EditFrontMatter(file_path=path, yaml_delim=task.yaml_delim, lazy_yaml=True,
+                               encoding=task.encoding, read_mode=task.read_mode)
+        if proc.file_data is not None:
+            size = len(proc.file_data)
+        else:
+            size = _file_size(path, proc.file_lines)
+        if not proc.has_source_data():
+            status = 'empty'
+        elif not proc.has_source_yaml():
+            status = 'no-yaml'
+        else:
+            stage = 'parse'
+            output = proc.fmatter
+            status = 'extracted'
+    except Exception as e:
+        status = 'error'
+        error = e
+
+    result = FileResult(path, status, size, time.monotonic() - start, output=output)
+    if error is not None:
+        result.error = error_record(path, error, stage, task.tracebacks)
+        result.error_class = result.error.exc_type
+    return result
+
+
+def extract_chunk(paths, task) -> list:
+    """ :func:`extract_file` for each of `paths` (one pool submission).
+
+    Returns:
+        list of :class:`FileResult`
+    """
+    return [extract_file(path, task) for path in paths]
+
+
+def process_chunk(paths, task) -> list:
+    """ :func:`process_file` for each of `paths` (one pool submission).
+
+    Returns:
+        list of :class:`FileResult`
+    """
+    return [process_file(path, task) for path in paths]
+
+
+class BatchReport(object):
+    """Totals of a batch run"""
+
+    def __init__(self, memory_top=10):
+        """
+        Args:
+            memory_top (int): number of heaviest files kept in :attr:`memory`
+
+        Attributes:
+            self.counts (dict): {status: number of files}
+            self.files (int): number of files processed
+            self.elapsed (float): wall time in seconds
+            self.timings (StageTimings): per stage totals of instrumented tasks
+            self.memory (MemoryReport): heaviest sampled files (`None` until
+                a file was sampled)
+        """
+        self.counts = dict.fromkeys(STATUSES, 0)
+        self.files = 0
+        self.elapsed = 0.0
+        self.timings = StageTimings()
+        self.memory = None
+        self._memory_top = memory_top
+
+    def add(self, result) -> None:
+        """Account for a :class:`FileResult`"""
+        self.counts[result.status] += 1
+        self.files += 1
+        if result.timings:
+            self.timings.merge(result.timings)
+        if result.memory:
+            if self.memory is None:
+                from .memprofile import MemoryReport
+                self.memory = MemoryReport(self._memory_top)
+            self.memory.add(result.path, result.memory)
+
+    @property
+    def errors(self) -> int:
+        """Number of files that failed"""
+        return self.counts['error']
+
+
+class Batch(object):
+    """Process many files with a :class:`BatchTask`"""
+
+    def __init__(self, *, task, jobs=1, executor='thread', metrics=None, prefetch=0,
+                 prefetch_mode='advise', schedule='walk', chunk_bytes=0, chunk_files=CHUNK_FILES,
+                 extract=False, journal=None):
+        """
+        Args:
+            task (BatchTask):
+                the edit to apply
+            jobs (int):
+                [default: 1] number of workers. `1` processes files inline
+                without starting a pool.
+            executor (str):
+                [default: 'thread'] `'thread'` or `'process'`
+            metrics (BatchMetrics):
+                [default: `None`] collector for throughput / latency metrics
+                (see :mod:`editfrontmatter.metrics`). Thread workers record
+                into their own shard.
+            prefetch (int):
+                [default: 0] number of files warmed ahead of the workers by a
+                read-ahead thread (see :mod:`editfrontmatter.prefetch`)
+            prefetch_mode (str):
+                [default: 'advise'] `'advise'` (`posix_fadvise`) or `'read'`
+            schedule (str):
+                [default: 'walk'] file ordering, one of :data:`SCHEDULES`
+            chunk_bytes (int):
+                [default: 0] submit files of similar size in chunks of about
+                `chunk_bytes` to pools (see :func:`chunked`). `0` submits
+                files one by one. Mostly useful with process pools.
+            chunk_files (int):
+                [default: :data:`CHUNK_FILES`] maximum files per chunk
+            extract (bool):
+                [default: False] only read and parse the front matter of each
+                file (:func:`extract_file`), the task edit is not applied
+            journal (editfrontmatter.journal.Journal):
+                [default: `None`] files completed by a previous run are
+                skipped and every result is recorded (see
+                :mod:`editfrontmatter.journal`)
+
+        Note:
+            Pools hand the next submission to whichever worker is idle, so
+            with small chunks at the end of the run (see :func:`chunked`)
+            workers balance the load without per worker queues.
+
+        Throws:
+            ValueError
+        """
+        if executor not in ('thread', 'process'):
+            raise ValueError("executor must be 'thread' or 'process'")
+        if schedule not in SCHEDULES:
+            raise ValueError("schedule must be one of {s}".format(s=', '.join(SCHEDULES)))
+        self.task = task
+        self.jobs = max(1, jobs)
+        self.executor = executor
+        self.metrics = metrics
+        self.prefetch = prefetch
+        self.prefetch_mode = prefetch_mode
+        self.schedule = schedule
+        self.chunk_bytes = chunk_bytes
+        self.chunk_files = chunk_files
+        self.extract = extract
+        self.journal = journal
+        self._file = extract_file if extract else process_file
+        self._chunk = extract_chunk if extract else process_chunk
+
+        # bound the number of in flight files (memory on huge trees)
+        self.window = self.jobs * 4
+
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        """Stop submitting files. Files in flight are completed."""
+        self._stop.set()
+
+    @property
+    def stopped(self) -> bool:
+        """`True` once :func:`stop` was called"""
+        return self._stop.is_set()
+
+    def _pool(self):
+        if self.executor == 'process':
+            return futures.ProcessPoolExecutor(max_workers=self.jobs)
+        return futures.ThreadPoolExecutor(max_workers=self.jobs)
+
+    def _process(self, paths, task) -> list:
+        """Process files and record their metrics in the worker thread"""
+        results = self._chunk(paths, task)
+        for result in results:
+            self.metrics.record(result)
+        return results
+
+    def results(self, entries):
+        """ Process `entries` and yield results in completion order.
+
+        Args:
+            entries (iterable): :class:`FileEntry` objects (or paths)
+
+        Yields:
+            :class:`FileResult`
+        """
+        journal = self.journal
+        if journal is not None:
+            entries = journal.pending(entries)
+        entries = schedule_entries(entries, self.schedule)
+        # a collected walk allows guided chunk sizes
+        total = sum(getattr(e, 'size', 0) for e in entries) if isinstance(entries, list) else None
+        if self.prefetch:
+            from .prefetch import prefetched
+            entries = prefetched(entries, self.prefetch, self.prefetch_mode)
+        try:
+            if self.chunk_bytes and self.jobs > 1:
+                units = chunked(entries, self.jobs, self.chunk_bytes, self.chunk_files, total)
+            else:
+                units = ((getattr(e, 'path', e),) for e in entries)
+            if journal is None:
+                yield from self._results(iter(units))
+            else:
+                for result in self._results(iter(units)):
+                    journal.record(result)
+                    yield result
+        finally:
+            if self.prefetch:
+                entries.close()
+
+    def _results(self, units):
+        """See :func:`results` (`units` is an iterator of tuples of paths)"""
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.start()
+
+        if self.jobs == 1:
+            for unit in units:
+                for path in unit:
+                    if self.stopped:
+                        return
+                    result = self._file(path, self.task)
+                    if metrics is not None:
+                        metrics.record(result)
+                    yield result
+            return
+
+        # threads record where the file is processed
+        work = self._process if metrics is not None and self.executor == 'thread' else self._chunk
+
+        with self._pool() as pool:
+            pending = set()
+            exhausted = False
+            while True:
+                while not exhausted and not self.stopped and len(pending) < self.window:
+                    unit = next(units, None)
+                    if unit is None:
+                        exhausted = True
+                        break
+                    pending.add(pool.submit(work, unit, self.task))
+                if not pending:
+                    return
+                done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    for result in future.result():
+                        if metrics is not None and work is self._chunk:
+                            # process pool: record in the calling thread
+                            metrics.record(result)
+                        yield result
+
+    def run(self, entries, on_result=None, memory_top=10) -> BatchReport:
+        """ Process `entries` and total the results.
+
+        Args:
+            entries (iterable): :class:`FileEntry` objects (or paths)
+            on_result (callable): called with each :class:`FileResult` in
+                the calling thread
+            memory_top (int): number of heaviest files reported when the
+                task samples memory
+
+        Returns:
+            :class:`BatchReport`
+        """
+        report = BatchReport(memory_top)
+        start = time.monotonic()
+        try:
+            for result in self.results(entries):
+                report.add(result)
+                if on_result is not None:
+                    on_result(result)
+        finally:
+            report.elapsed = time.monotonic() - start
+            if self.metrics is not None:
+                self.metrics.stop()
+        return report
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Bulk Document API
+==============================
+
+.. module:: editfrontmatter.bulk
+
+:Synopsis: Edit many in-memory documents (static site generator plugins,
+    build pipelines) in one call. The template is compiled and the Jinja2
+    environment with its filters set up once; each worker reuses a single
+    :class:`editfrontmatter.EditFrontMatter.EditFrontMatter` object for all
+    its documents (see :func:`editfrontmatter.batch.process_document`).
+
+    Documents are `str` or `bytes` (bytes bodies are never decoded). With
+    `jobs > 1` documents are edited in chunks on a worker pool that stays up
+    between calls of the same :class:`BulkEditor`. Yaml parsing holds the
+    GIL: use `executor='process'` to use several CPUs.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+
+:Example:
+
+    ::
+
+        from editfrontmatter.bulk import edit_documents, BulkEditor
+
+        pages = edit_documents(pages, template_str=template_str,
+                               variables={'hasMath': True}, keys_toDelete=['draft'])
+
+        # several calls sharing the compiled template and the workers
+        with BulkEditor(template_str=template_str, jobs=4, executor='process') as editor:
+            for section in sections:
+                section.pages = editor.edit(section.pages, variables={'section': section.name})
+"""
+
+# Imports
+import copy
+
+from .EditFrontMatter import EditFrontMatter_Exception
+from .batch import BatchTask, process_document
+from ._lazy import LazyModule
+
+futures = LazyModule('concurrent.futures')
+
+CHUNK_SIZE = 256
+"""Documents per pool submission"""
+
+ON_ERROR = ('raise', 'keep')
+"""`raise`: raise for the first failed document; `keep`: return it unchanged"""
+
+
+def _edit_chunk(documents, task, first) -> list:
+    """:func:`editfrontmatter.batch.process_document` for each document of a chunk"""
+    return [process_document(data, task, "<document {i}>".format(i=i))
+            for i, data in enumerate(documents, first)]
+
+
+class BulkEditor(object):
+    """Applies one edit to sequences of in-memory documents"""
+
+    def __init__(self, *, template_str="", variables=None, keys_toDelete=(), operations=None,
+                 filters=None, pure_filters=(), yaml_delim='---', encoding=None, jobs=1,
+                 executor='thread', chunk_size=CHUNK_SIZE):
+        """
+        Args:
+            template_str (str):
+                Jinja2 template (may be empty if `operations` or
+                `keys_toDelete` are used)
+            variables (dict):
+                default template variables, see :func:`EditFrontMatter.run`
+            keys_toDelete (list):
+                keys to delete from the front matter
+            operations (list):
+                declarative edits, see :mod:`editfrontmatter.operations`
+            filters (dict):
+                {name: callable} Jinja2 filters (module level functions with
+                a process pool)
+            pure_filters (list):
+                names of `filters` to memoize
+            yaml_delim (str):
+                front matter delimiter
+            encoding (str):
+                [default: utf-8] encoding of `bytes` documents
+            jobs (int):
+                [default: 1] workers (`1` edits in the calling thread)
+            executor (str):
+                [default: 'thread'] `'thread'` or `'process'`
+            chunk_size (int):
+                [default: :data:`CHUNK_SIZE`] documents per pool submission
+
+        Throws:
+            ValueError, :class:`editfrontmatter.operations.Operation_Exception`
+        """
+        if executor not in ('thread', 'process'):
+            raise ValueError("executor must be 'thread' or 'process'")
+        self.task = BatchTask(template_str=template_str, extraVars_dict=variables,
+                              keys_toDelete=keys_toDelete, operations=operations, filters=filters,
+                              pure_filters=pure_filters, yaml_delim=yaml_delim, encoding=encoding)
+        self.jobs = jobs
+        self.executor = executor
+        self.chunk_size = max(1, chunk_size)
+        self._pool = None
+
+        # compile the template up front: errors surface here, not per document
+        if template_str:
+            from .EditFrontMatter import compiled_template
+            compiled_template(self.task.environment(), template_str)
+
+    def _executor(self):
+        if self._pool is None:
+            pool_class = futures.ProcessPoolExecutor if self.executor == 'process' else futures.ThreadPoolExecutor
+            self._pool = pool_class(max_workers=self.jobs)
+        return self._pool
+
+    def results(self, documents, variables=None) -> list:
+        """ Edit `documents` and report each outcome.
+
+        Args:
+            documents (iterable): `str` and / or `bytes` documents
+            variables (dict): template variables for this call (default:
+                those given at creation)
+
+        Returns:
+            list of :class:`editfrontmatter.batch.FileResult` in input order:
+            :attr:`FileResult.output` is the edited (or original) document
+        """
+        documents = documents if isinstance(documents, (list, tuple)) else list(documents)
+        task = self.task
+        if variables is not None:
+            # same token: the environment and the worker processors stay shared
+            task = copy.copy(task)
+            task.extraVars_dict = dict(self.task.extraVars_dict, **variables)
+        if self.jobs <= 1 or len(documents) <= self.chunk_size:
+            return _edit_chunk(documents, task, 0)
+
+        pool = self._executor()
+        pending = [pool.submit(_edit_chunk, documents[i:i + self.chunk_size], task, i)
+                   for i in range(0, len(documents), self.chunk_size)]
+        results = []
+        for future in pending:
+            results.extend(future.result())
+        return results
+
+    def edit(self, documents, variables=None, on_error='raise') -> list:
+        """ Edit `documents`.
+
+        Args:
+            documents (iterable): `str` and / or `bytes` documents
+            variables (dict): template variables for this call
+            on_error (str): [default: 'raise'] one of :data:`ON_ERROR`
+
+        Returns:
+            list of edited documents, in input order (documents without
+            front matter are returned as is)
+
+        Throws:
+            :class:`editfrontmatter.EditFrontMatter.EditFrontMatter_Exception`
+            (`on_error='raise'`): the first failed document
+        """
+        if on_error not in ON_ERROR:
+            raise ValueError("on_error must be one of {o}".format(o=', '.join(ON_ERROR)))
+        results = self.results(documents, variables)
+        if on_error == 'raise':
+            for result in results:
+                if result.status == 'error':
+                    raise EditFrontMatter_Exception(str(result.error), stage=result.error.stage)
+        return [result.output for result in results]
+
+    def close(self) -> None:
+        """Shut the worker pool down"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def edit_documents(documents, template_str="", variables=None, *, on_error='raise', **options) -> list:
+    """ Edit `documents` in one call (see :class:`BulkEditor` for `options`).
+
+    Args:
+        documents (iterable): `str` and / or `bytes` documents
+        template_str (str): Jinja2 template
+        variables (dict): template variables
+        on_error (str): [default: 'raise'] one of :data:`ON_ERROR`
+
+    Returns:
+        list of edited documents, in input order
+    """
+    with BulkEditor(template_str=template_str, variables=variables, **options) as editor:
+        return editor.edit(documents, on_error=on_error)
@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Command Line Interface
+==============================
+
+.. program:: editfrontmatter
+
+:Synopsis: The `editfrontmatter` console script. Walks files and directories
+    and edits their front matter with a Jinja2 template and/or declarative
+    operations using :mod:`editfrontmatter.batch`.
+
+    `jinja2`, `oyaml` and the parallel machinery are only imported when they
+    are needed so that `--help` and small runs start quickly.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+
+:Example:
+
+    Preview, then apply, the example1 edit to a tree::
+
+        editfrontmatter -t template1.j2 --var hasMath=false \\
+            --var "addedVariable=[one, two, three]" --filter canPublish=mymod:canPublish \\
+            --delete-key deleteme --exclude "a/c/b" -j 4 content/
+        editfrontmatter ... --write content/
+"""
+
+# Imports
+import os
+import sys
+import argparse
+import functools
+
+
+def _parse_var(text):
+    """`KEY=VALUE` -> (KEY, VALUE). VALUE is parsed as yaml in :func:`build_task`"""
+    if '=' not in text:
+        raise argparse.ArgumentTypeError("expected KEY=VALUE, got '{t}'".format(t=text))
+    key, value = text.split('=', 1)
+    return key, value
+
+
+def _parse_filter(text):
+    """`NAME=module:function` -> (NAME, 'module:function')"""
+    if '=' not in text or ':' not in text.split('=', 1)[1]:
+        raise argparse.ArgumentTypeError("expected NAME=module:function, got '{t}'".format(t=text))
+    return tuple(text.split('=', 1))
+
+
+def _load_callable(spec):
+    """Import `module:function`"""
+    import importlib
+    module, attr = spec.split(':', 1)
+    obj = importlib.import_module(module)
+    for part in attr.split('.'):
+        obj = getattr(obj, part)
+    return obj
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Create the argument parser (no heavy imports)"""
+    parser = argparse.ArgumentParser(
+        prog='editfrontmatter',
+        description='Edit yaml front matter of text/markdown files with Jinja2 '
+                    'templates and/or declarative operations.')
+    parser.add_argument('paths', nargs='*', metavar='PATH',
+                        help='files and/or directories to process')
+
+    edit = parser.add_argument_group('editing')
+    edit.add_argument('-t', '--template', metavar='FILE',
+                      help='Jinja2 template rendering yaml that updates the front matter')
+    edit.add_argument('--var', action='append', default=[], type=_parse_var, metavar='KEY=VALUE',
+                      help='template variable (VALUE is parsed as yaml); repeatable')
+    edit.add_argument('--filter', action='append', default=[], type=_parse_filter,
+                      metavar='NAME=MODULE:FUNC', help='Jinja2 filter callback; repeatable')
+    edit.add_argument('--pure-filter', action='append', default=[], metavar='NAME',
+                      help='memoize the results of filter NAME; repeatable')
+    edit.add_argument('--operations', metavar='FILE',
+                      help='yaml list of declarative operations (set/delete/rename/append/merge)')
+    edit.add_argument('--delete-key', action='append', default=[], metavar='KEY',
+                      help='front matter key to delete; repeatable')
+    edit.add_argument('--rules', metavar='FILE',
+                      help='yaml rules table (glob / regex / front matter match -> template, vars, '
+                           'delete, operations) applied in one pass (see editfrontmatter.rules)')
+    edit.add_argument('--rules-root', metavar='DIR',
+                      help='directory rule paths are relative to (default: the PATH if it is '
+                           'the only one and a directory, else the current directory)')
+    edit.add_argument('--reducer', metavar='MODULE:FUNC',
+                      help='two phase run: FUNC reduces the (path, front matter) pairs of all '
+                           'files to a context, then templates see it as `corpus` and the edited '
+                           'file as `file_path` (each file is parsed once)')
+    edit.add_argument('--yaml-delim', default='---', metavar='DELIM',
+                      help='front matter delimiter (default: %(default)s)')
+    edit.add_argument('--read-mode', choices=('text', 'bytes', 'mmap'), default='text',
+                      help='bytes: only decode the front matter and keep bodies byte for byte; '
+                           'mmap: same, memory mapped (large files) (default: %(default)s)')
+    edit.add_argument('--encoding', metavar='NAME',
+                      help='file encoding (default: platform default in text mode, utf-8 in bytes mode)')
+
+    select = parser.add_argument_group('file selection')
+    select.add_argument('--include', action='append', metavar='GLOB',
+                        help='file name pattern to process; repeatable (default: *.md)')
+    select.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                        help='file or directory name / relative path pattern to skip; repeatable')
+    select.add_argument('--index', metavar='DB',
+                        help='refresh the SQLite front matter index DB for PATHs and only edit '
+                             'the files selected by --match / --where')
+    select.add_argument('--match', action='append', default=[], metavar='KEY=VALUE',
+                        help='with --index: front matter KEY equals (or is a list containing) '
+                             'VALUE (parsed as yaml); repeatable')
+    select.add_argument('--where', metavar='SQL',
+                        help='with --index: SQL condition on the files table of the index')
+
+    run = parser.add_argument_group('execution')
+    run.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                     help='number of parallel workers (default: %(default)s)')
+    run.add_argument('--processes', action='store_true',
+                     help='use worker processes instead of threads')
+    mode = run.add_mutually_exclusive_group()
+    mode.add_argument('-n', '--dry-run', dest='write', action='store_false',
+                      help='report what would change without writing (default)')
+    mode.add_argument('-w', '--write', dest='write', action='store_true',
+                      help='write changed files')
+    run.add_argument('--in-place', action='store_true',
+                     help='patch the front matter in place when it fits in the original space')
+    run.add_argument('--header-padding', type=int, default=0, metavar='CHARS',
+                     help='reserve space after rewritten front matter for later in place '
+                          'edits (default: %(default)s)')
+    run.add_argument('--schedule', choices=('walk', 'lpt'), default='walk',
+                     help='walk: stream files in walk order; lpt: largest files first '
+                          '(collects the walk, shortens skewed runs) (default: %(default)s)')
+    run.add_argument('--chunk-bytes', type=int, default=0, metavar='BYTES',
+                     help='submit small files of similar size in chunks of about BYTES '
+                          '(process pools)')
+    run.add_argument('--prefetch', type=int, default=0, metavar='N',
+                     help='warm the page cache N files ahead of the workers (NFS, HDD)')
+    run.add_argument('--prefetch-mode', choices=('advise', 'read'), default='advise',
+                     help='advise: posix_fadvise(WILLNEED); read: read file headers '
+                          '(default: %(default)s)')
+    run.add_argument('--drop-cache', action='store_true',
+                     help='drop processed files from the page cache (written files are flushed first)')
+    run.add_argument('--stream', choices=('nul', 'length', 'jsonl'), metavar='FORMAT',
+                     help='edit documents read from stdin and write them, in order, to stdout: '
+                          'nul (NUL separated), length (size line + bytes) or jsonl '
+                          '({"path", "content"} per line); no PATH')
+    run.add_argument('--watch', action='store_true',
+                     help='after the run, keep watching PATHs (Linux inotify) and edit files '
+                          'when they are saved')
+    run.add_argument('--debounce', type=float, default=0.3, metavar='SECONDS',
+                     help='watch mode: quiet time before a changed file is edited (default: %(default)s)')
+    run.add_argument('--journal', metavar='FILE',
+                     help='record completed files in FILE (files are then replaced atomically)')
+    run.add_argument('--resume', action='store_true',
+                     help='with --journal: skip the files completed by the run that wrote FILE')
+    run.add_argument('--shard', metavar='I/N',
+                     help='only process shard I of N (1 <= I <= N), assigned by a stable hash of '
+                          'the path relative to the shard root')
+    run.add_argument('--shard-balance', choices=('hash', 'size'), default='hash',
+                     help='hash: by path; size: balance bytes per shard (needs --shard-plan) '
+                          '(default: %(default)s)')
+    run.add_argument('--shard-plan', metavar='FILE',
+                     help='shard assignments made before the run (editfrontmatter-shard plan)')
+    run.add_argument('--shard-root', metavar='DIR',
+                     help='directory shard paths are relative to (default: the PATH if it is a '
+                          'single directory, else the current directory)')
+    run.add_argument('--manifest', metavar='FILE',
+                     help='write the result of every file as json lines (see editfrontmatter-shard merge)')
+    run.add_argument('-q', '--quiet', action='store_true',
+                     help='only report errors and the summary')
+    run.add_argument('--errors-jsonl', metavar='FILE',
+                     help='write one json error record per failed file')
+    run.add_argument('--traceback', action='store_true',
+                     help='include tracebacks in error output (slower on dirty trees)')
+    run.add_argument('--timings', action='store_true',
+                     help='report time spent per processing stage')
+    run.add_argument('--memory-profile', type=float, nargs='?', const=0.1, default=0.0, metavar='RATE',
+                     help='measure peak / retained memory of a share of the files '
+                          '(default RATE: %(const)s) and report the heaviest')
+    run.add_argument('--memory-top', type=int, default=10, metavar='N',
+                     help='number of heaviest files reported (default: %(default)s)')
+
+    metrics = parser.add_argument_group('metrics')
+    metrics.add_argument('--metrics-json', metavar='FILE',
+                         help='export throughput, latency and error metrics as json')
+    metrics.add_argument('--metrics-prom', metavar='FILE',
+                         help='export metrics as a Prometheus textfile (node_exporter)')
+    metrics.add_argument('--metrics-interval', type=float, metavar='SECONDS',
+                         help='also export the metrics periodically during the run')
+    parser.set_defaults(write=False)
+    return parser
+
+
+def build_task(args):
+    """ Create a :class:`editfrontmatter.batch.BatchTask` from parsed arguments.
+
+    Imports `oyaml` only if variables or operations need parsing.
+    """
+    from .batch import BatchTask
+
+    factory = BatchTask
+    if args.reducer:
+        from .mapreduce import CorpusTask
+        factory = CorpusTask
+
+    template_str = ""
+    if args.template:
+        with open(args.template, "r") as fo:
+            template_str = fo.read()
+
+    variables = {}
+    operations = None
+    if args.var or args.operations:
+        import oyaml as yaml
+        for key, value in args.var:
+            variables[key] = yaml.load(value, Loader=yaml.FullLoader)
+        if args.operations:
+            with open(args.operations, "r") as fo:
+                operations = yaml.load(fo, Loader=yaml.FullLoader) or []
+
+    options = {}
+    if args.rules:
+        from .rules import RuleTask, load_rules
+        root = args.rules_root
+        if root is None and len(args.paths) == 1 and os.path.isdir(args.paths[0]):
+            root = args.paths[0]
+        factory = functools.partial(RuleTask, load_rules(args.rules), root=root)
+    else:
+        options = dict(template_str=template_str, keys_toDelete=args.delete_key, operations=operations)
+
+    return factory(
+        extraVars_dict=variables,
+        **options,
+        filters={name: _load_callable(spec) for name, spec in args.filter},
+        pure_filters=args.pure_filter,
+        yaml_delim=args.yaml_delim,
+        write=args.write,
+        in_place=args.in_place,
+        header_padding=args.header_padding,
+        read_mode=args.read_mode,
+        encoding=args.encoding,
+        drop_cache=args.drop_cache,
+        instrument=args.timings,
+        memory_sample=args.memory_profile,
+        tracebacks=args.traceback,
+        atomic=bool(args.journal),
+        digest=bool(args.journal or args.manifest))
+
+
+def edit_signature(args) -> str:
+    """ Identify the edit of a run for `--journal` and `--manifest`: a hash of the options
+    and of the files (template, operations, rules) that define the output.
+    """
+    import hashlib
+    import json
+
+    signature = hashlib.sha256()
+    options = [args.var, args.filter, args.pure_filter, args.delete_key, args.reducer, args.yaml_delim,
+               args.encoding, args.write, args.in_place, args.header_padding, args.rules_root]
+    signature.update(json.dumps(options, default=str).encode('utf-8'))
+    for path in (args.template, args.operations, args.rules):
+        if path:
+            with open(path, "rb") as fo:
+                signature.update(fo.read())
+        signature.update(b"\0")
+    return signature.hexdigest()[:32]
+
+
+def main(argv=None) -> int:
+    """ Entry point of the `editfrontmatter` console script.
+
+    Returns:
+        * 0 on success
+        * 1 if any file failed
+        * 2 on usage errors
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.rules and (args.template or args.operations or args.delete_key or args.reducer):
+        parser.error("--rules gives the edits: not with --template, --operations, --delete-key "
+                     "or --reducer")
+    if not (args.template or args.operations or args.delete_key or args.rules):
+        parser.error("nothing to do: give --template, --operations, --delete-key and/or --rules")
+    if args.stream and (args.paths or args.watch):
+        parser.error("--stream reads stdin: no PATH and no --watch")
+    if not (args.stream or args.paths):
+        parser.error("give at least one PATH (or --stream)")
+    if (args.match or args.where) and not args.index:
+        parser.error("--match and --where need --index")
+    if args.index and args.stream:
+        parser.error("--index selects files: not with --stream")
+    if args.reducer and (args.stream or args.watch):
+        parser.error("--reducer needs the whole corpus: not with --stream or --watch")
+    if args.rules and args.stream:
+        parser.error("--rules dispatches on paths: not with --stream")
+    if args.resume and not args.journal:
+        parser.error("--resume needs --journal")
+    if args.journal and args.stream:
+        parser.error("--journal records files: not with --stream")
+    if (args.shard or args.manifest) and (args.stream or args.watch):
+        parser.error("--shard and --manifest split and record a run: not with --stream or --watch")
+    if args.shard and args.reducer:
+        parser.error("--reducer needs the whole corpus: not with --shard")
+    if args.shard_balance == 'size' and args.shard and not args.shard_plan:
+        parser.error("--shard-balance size needs --shard-plan (editfrontmatter-shard plan): sizes "
+                     "change while shards edit files")
+    if args.shard_plan and not args.shard:
+        parser.error("--shard-plan needs --shard")
+    shard = None
+    shard_plan = None
+    if args.shard:
+        from .shard import parse_shard, read_plan
+        try:
+            shard = parse_shard(args.shard)
+            if args.shard_plan:
+                shard_plan = read_plan(args.shard_plan)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        if shard_plan is not None and shard_plan[0]['shards'] != shard[1]:
+            parser.error("{p}: a plan of {n} shards".format(p=args.shard_plan, n=shard_plan[0]['shards']))
+
+    from .batch import Batch, walk_files
+
+    try:
+        task = build_task(args)
+        reducer = _load_callable(args.reducer) if args.reducer else None
+    except Exception as e:
+        print("Error: {e}".format(e=e), file=sys.stderr)
+        return 2
+
+    journal = None
+    if args.journal:
+        from .journal import Journal
+        try:
+            journal = Journal(args.journal, resume=args.resume, signature=edit_signature(args))
+        except (OSError, ValueError) as e:
+            print("Error: journal: {e}".format(e=e), file=sys.stderr)
+            return 2
+
+    manifest = None
+    if args.manifest:
+        from .shard import Manifest
+        try:
+            manifest = Manifest(args.manifest, shard=shard, balance=args.shard_balance,
+                                signature=edit_signature(args), root=shard_root(args),
+                                plan=shard_plan[0]['id'] if shard_plan else None)
+        except OSError as e:
+            print("Error: manifest: {e}".format(e=e), file=sys.stderr)
+            return 2
+
+    errors_fo = None
+    if args.errors_jsonl:
+        import json
+        errors_fo = open(args.errors_jsonl, 'w')
+
+    # stdout carries the documents in stream mode
+    status_fo = sys.stderr if args.stream else sys.stdout
+
+    def report_result(result):
+        if result.status == 'error':
+            print("error: {path}: {error}".format(path=result.path, error=result.error),
+                  file=sys.stderr)
+            if result.error.traceback:
+                print(result.error.traceback, file=sys.stderr)
+            if errors_fo is not None:
+                errors_fo.write(json.dumps(result.error.as_dict()) + '\n')
+        elif not args.quiet and result.status in ('changed', 'written'):
+            print("{status}: {path}".format(status=result.status, path=result.path), file=status_fo)
+        if manifest is not None:
+            manifest.record(result)
+
+    metrics = None
+    if args.metrics_json or args.metrics_prom:
+        from . import metrics as metrics_module
+        metrics = metrics_module.BatchMetrics(workers=args.jobs)
+
+        def export_metrics(snapshot):
+            if args.metrics_json:
+                metrics_module.write_json(snapshot, args.metrics_json)
+            if args.metrics_prom:
+                metrics_module.write_prometheus(snapshot, args.metrics_prom)
+
+    if args.stream:
+        from .stream import edit_stream
+
+        def run():
+            return edit_stream(task, sys.stdin.buffer, sys.stdout.buffer, args.stream, jobs=args.jobs,
+                               executor='process' if args.processes else 'thread',
+                               metrics=metrics, on_result=report_result)
+    else:
+        batch_class = Batch
+        batch_options = dict(jobs=args.jobs, executor='process' if args.processes else 'thread',
+                             metrics=metrics, prefetch=args.prefetch, prefetch_mode=args.prefetch_mode,
+                             schedule=args.schedule, chunk_bytes=args.chunk_bytes, journal=journal)
+        if args.reducer:
+            from .mapreduce import CorpusBatch as batch_class
+            batch_options['reducer'] = reducer
+        batch = batch_class(task=task, **batch_options)
+        if args.index:
+            try:
+                index, entries = select_indexed(args, task)
+            except Exception as e:
+                print("Error: index: {e}".format(e=e), file=sys.stderr)
+                return 2
+            if shard is not None:
+                entries = list(shard_selection(args, shard, shard_plan, entries))
+            written = []
+
+            def on_result(result):
+                if result.status == 'written':
+                    written.append(result.path)
+                report_result(result)
+
+            def run():
+                try:
+                    return batch.run(entries, on_result=on_result, memory_top=args.memory_top)
+                finally:
+                    # keep the index current for the next query
+                    index.update(written)
+                    index.close()
+        else:
+            entries = walk_files(args.paths, include=args.include or ('*.md',), exclude=args.exclude)
+            if shard is not None:
+                entries = shard_selection(args, shard, shard_plan, entries)
+            if args.rules:
+                entries = task.select(entries)
+
+            def run():
+                return batch.run(entries, on_result=report_result, memory_top=args.memory_top)
+
+    # SIGTERM / SIGHUP: finish the files in flight, then report (resume with
+    # --journal)
+    stopped = []
+    if not args.stream:
+        import signal
+
+        def graceful_stop(signum, frame):
+            stopped.append(signum)
+            batch.stop()
+
+        for name in ('SIGTERM', 'SIGHUP'):
+            if hasattr(signal, name):
+                signal.signal(getattr(signal, name), graceful_stop)
+    report = None
+    try:
+        try:
+            if metrics is not None and args.metrics_interval:
+                with metrics_module.PeriodicExporter(metrics, args.metrics_interval, export_metrics):
+                    report = run()
+            else:
+                report = run()
+        except ValueError as e:
+            if not args.stream:
+                raise
+            print("Error: bad input: {e}".format(e=e), file=sys.stderr)
+            return 2
+        except KeyboardInterrupt:
+            if not args.stream:
+                batch.stop()
+            print("Interrupted", file=sys.stderr)
+            return 130
+        finally:
+            if metrics is not None:
+                export_metrics(metrics.snapshot())
+            if journal is not None:
+                journal.close()
+            if manifest is not None:
+                # a manifest without summary marks an incomplete shard
+                if report is not None:
+                    manifest.summary(report, stopped=bool(stopped))
+                manifest.close()
+
+        if journal is not None and args.resume:
+            print("resumed: {n} completed files skipped ({r} written before the interruption)".format(
+                n=journal.skipped, r=journal.recovered), file=sys.stderr)
+        print("number of files: {n}".format(n=report.files), file=sys.stderr)
+        for status, count in sorted(report.counts.items()):
+            if count:
+                print("  {status}: {count}".format(status=status, count=count), file=sys.stderr)
+        print("elapsed: {t:.3f}s".format(t=report.elapsed), file=sys.stderr)
+        if args.timings:
+            print(report.timings.format(), file=sys.stderr)
+        if report.memory is not None:
+            print(report.memory.format(), file=sys.stderr)
+        if stopped:
+            print("Stopped{hint}".format(
+                hint=": resume with --resume" if journal is not None else ""), file=sys.stderr)
+            return 128 + stopped[0]
+
+        if args.watch:
+            return watch(args, task, metrics, report_result,
+                         export_metrics if metrics is not None else None)
+        return 1 if report.errors else 0
+    finally:
+        if errors_fo is not None:
+            errors_fo.close()
+
+
+def shard_root(args):
+    """`--shard-root`, or the PATH if it is a single directory"""
+    if args.shard_root is None and len(args.paths) == 1 and os.path.isdir(args.paths[0]):
+        return args.paths[0]
+    return args.shard_root
+
+
+def shard_selection(args, shard, shard_plan, entries):
+    """ `--shard`: keep the entries of this shard (see :mod:`editfrontmatter.shard`)."""
+    from .shard import shard_entries
+
+    return shard_entries(entries, shard[0], shard[1], root=shard_root(args), balance=args.shard_balance,
+                         plan=shard_plan[1] if shard_plan else None)
+
+
+def select_indexed(args, task):
+    """ `--index`: refresh the index of `args.paths` and select the files to edit.
+
+    Returns:
+        (:class:`editfrontmatter.index.FrontMatterIndex`, list of
+        :class:`editfrontmatter.batch.FileEntry`)
+
+    Throws:
+        sqlite3.Error, ValueError
+    """
+    from .index import FrontMatterIndex, parse_match
+
+    match = [parse_match(text) for text in args.match]
+    index = FrontMatterIndex(args.index, yaml_delim=args.yaml_delim, encoding=args.encoding)
+    try:
+        counts = index.refresh(args.paths, include=args.include or ('*.md',), exclude=args.exclude,
+                               jobs=args.jobs, executor='process' if args.processes else 'thread')
+        if not args.quiet:
+            print("index: " + ", ".join("{k}: {v}".format(k=k, v=v) for k, v in counts.items()),
+                  file=sys.stderr)
+        # collected: the index connection is not used while the batch runs
+        entries = list(index.select(match, args.where, roots=args.paths))
+        if args.rules:
+            entries = list(task.select(entries))
+    except Exception:
+        index.close()
+        raise
+    return index, entries
+
+
+def watch(args, task, metrics, on_result, export_metrics=None) -> int:
+    """ `--watch`: edit files of `args.paths` when they are saved, until interrupted.
+
+    Returns:
+        * 0 when interrupted
+        * 2 if inotify is not available
+    """
+    from .watch import Watcher
+
+    try:
+        watcher = Watcher(task, args.paths, include=args.include or ('*.md',), exclude=args.exclude,
+                          debounce=args.debounce, jobs=args.jobs, metrics=metrics)
+    except OSError as e:
+        print("Error: watch mode: {e}".format(e=e), file=sys.stderr)
+        return 2
+
+    def on_burst(report):
+        if export_metrics is not None:
+            export_metrics(metrics.snapshot())
+
+    import signal
+    signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+
+    print("watching for changes (Ctrl-C to stop)", file=sys.stderr)
+    try:
+        watcher.run(on_result=on_result, on_burst=on_burst)
+    except KeyboardInterrupt:
+        watcher.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
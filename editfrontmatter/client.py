@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daemon Client
+==============================
+
+.. module:: editfrontmatter.client
+
+:Synopsis: Thin client of :mod:`editfrontmatter.daemon`. Only the standard
+    library socket and json modules are used, so a call costs the Python
+    start up and a socket round trip; `jinja2`, `oyaml` and template
+    compilation stay in the daemon. Editor plugins can keep a
+    :class:`Client` open and send many requests on one connection.
+
+:Platform: Unix, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+
+:Example:
+
+    ::
+
+        with Client() as client:
+            client.register('example', template_str)
+            answer = client.edit(path='post.md', template='example',
+                                 variables={'hasMath': True}, write=True)
+            print(answer['status'])
+
+    From a shell (`-` edits stdin and prints the result)::
+
+        python -m editfrontmatter.client --template example --var hasMath=true --write post.md
+        cat post.md | python -m editfrontmatter.client --delete-key draft -
+"""
+
+# Imports
+import os
+import sys
+import json
+import socket
+import argparse
+
+
+class Client_Exception(Exception):
+    """The daemon could not be reached or answered an error"""
+
+
+def _socket_path() -> str:
+    # same default as editfrontmatter.daemon.default_socket_path(), without importing it
+    runtime = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime:
+        return os.path.join(runtime, 'editfrontmatter.sock')
+    import tempfile
+    return os.path.join(tempfile.gettempdir(), 'editfrontmatter-{uid}.sock'.format(uid=os.getuid()))
+
+
+class Client(object):
+    """A connection to the daemon"""
+
+    def __init__(self, socket_path=None, timeout=60.0):
+        """
+        Args:
+            socket_path (str): daemon socket (default: the daemon default)
+            timeout (float): seconds to wait for an answer
+
+        Throws:
+            :class:`Client_Exception`
+        """
+        self.socket_path = socket_path or _socket_path()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.connect(self.socket_path)
+        except OSError as e:
+            self._sock.close()
+            raise Client_Exception("no daemon on {p}: {e}".format(p=self.socket_path, e=e)) from e
+        self._file = self._sock.makefile('rb')
+        self._next_id = 0
+
+    def request(self, **request) -> dict:
+        """ Send one request and wait for its answer.
+
+        Returns:
+            answer dict
+
+        Throws:
+            :class:`Client_Exception` (connection lost or timed out)
+        """
+        self._next_id += 1
+        request.setdefault('id', self._next_id)
+        try:
+            self._sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            line = self._file.readline()
+        except OSError as e:
+            raise Client_Exception("connection to the daemon lost: {e}".format(e=e)) from e
+        if not line:
+            raise Client_Exception("the daemon closed the connection")
+        return json.loads(line.decode('utf-8'))
+
+    def edit(self, *, path=None, content=None, template=None, template_str=None, variables=None,
+             keys_toDelete=None, operations=None, write=False, return_content=False) -> dict:
+        """ Edit a file or inline content (see :mod:`editfrontmatter.daemon`).
+
+        Returns:
+            answer dict: `status`, and `content` for inline requests
+        """
+        request = {'op': 'edit', 'write': write, 'return_content': return_content}
+        for key, value in (('path', path), ('content', content), ('template', template),
+                           ('template_str', template_str), ('vars', variables),
+                           ('delete', keys_toDelete), ('operations', operations)):
+            if value is not None:
+                request[key] = value
+        return self.request(**request)
+
+    def register(self, name, template_str) -> None:
+        """ Register a template under `name`.
+
+        Throws:
+            :class:`Client_Exception`
+        """
+        answer = self.request(op='register', name=name, template_str=template_str)
+        if answer['status'] != 'ok':
+            raise Client_Exception(answer['error']['message'])
+
+    def shutdown(self) -> None:
+        """Stop the daemon"""
+        self.request(op='shutdown')
+
+    def close(self) -> None:
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None) -> int:
+    """ `python -m editfrontmatter.client`
+
+    Returns:
+        * 0 on success
+        * 1 if an edit failed
+        * 2 if the daemon is not reachable or the connection is lost
+    """
+    parser = argparse.ArgumentParser(prog='editfrontmatter-client',
+                                     description='Edit front matter through the daemon.')
+    parser.add_argument('paths', nargs='*', metavar='PATH', help="files to edit ('-': stdin to stdout)")
+    parser.add_argument('--socket', metavar='PATH', help='daemon socket')
+    parser.add_argument('--template', metavar='NAME', help='registered template')
+    parser.add_argument('-t', '--template-file', metavar='FILE', help='inline template')
+    parser.add_argument('--var', action='append', default=[], metavar='KEY=VALUE',
+                        help='template variable (VALUE is parsed as json, else kept as a string)')
+    parser.add_argument('--delete-key', action='append', default=None, metavar='KEY')
+    parser.add_argument('-w', '--write', action='store_true', help='write changed files')
+    parser.add_argument('--shutdown', action='store_true', help='stop the daemon')
+    args = parser.parse_args(argv)
+
+    variables = {}
+    for text in args.var:
+        key, _, value = text.partition('=')
+        try:
+            variables[key] = json.loads(value)
+        except ValueError:
+            variables[key] = value
+    template_str = None
+    if args.template_file:
+        with open(args.template_file, "r") as fo:
+            template_str = fo.read()
+
+    try:
+        client = Client(args.socket)
+    except Client_Exception as e:
+        print("Error: {e}".format(e=e), file=sys.stderr)
+        return 2
+
+    with client:
+        try:
+            failed = _edit_paths(client, args, variables, template_str)
+            if args.shutdown:
+                client.shutdown()
+        except Client_Exception as e:
+            print("Error: {e}".format(e=e), file=sys.stderr)
+            return 2
+    return 1 if failed else 0
+
+
+def _edit_paths(client, args, variables, template_str) -> bool:
+    """Send the edits of `main`; `True` if one failed"""
+    failed = False
+    for path in args.paths:
+        options = dict(template=args.template, template_str=template_str,
+                       variables=variables or None, keys_toDelete=args.delete_key)
+        if path == '-':
+            answer = client.edit(content=sys.stdin.read(), **options)
+        else:
+            answer = client.edit(path=os.path.abspath(path), write=args.write, **options)
+        if answer['status'] == 'error':
+            failed = True
+            error = answer['error']
+            print("error: {p}: {s}: {t}: {m}".format(p=path, s=error.get('stage'), t=error.get('exc_type'),
+                                                     m=error.get('message')), file=sys.stderr)
+        elif path == '-':
+            sys.stdout.write(answer['content'])
+        else:
+            print("{s}: {p}".format(s=answer['status'], p=path))
+    return failed
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Edit Daemon
+==============================
+
+.. module:: editfrontmatter.daemon
+
+:Synopsis: A long running local server for tools that edit one file at a
+    time (git hooks, editor plugins). It listens on a Unix domain socket,
+    keeps `jinja2`, `oyaml`, the Jinja2 environment with its registered
+    filters and the compiled templates warm, and answers edit requests.
+    Use :mod:`editfrontmatter.client` to talk to it.
+
+    The protocol is one json object per line in each direction. Requests:
+
+    * `{"op": "edit", ...}`: edit a file (`"path"`) or inline content
+      (`"content"`) with a registered template (`"template": name`) or an
+      inline one (`"template_str"`), template variables (`"vars"`), keys to
+      delete (`"delete"`) and declarative `"operations"`. `"write": true`
+      writes the file back. Answers `{"status": ..., "content": ...}` where
+      `status` is one of :data:`editfrontmatter.batch.STATUSES` and
+      `content` (inline requests, or `"return_content": true`) is the edited
+      document. Failures carry an `"error"` record
+      (:func:`editfrontmatter.errors.ErrorRecord.as_dict`).
+    * `{"op": "register", "name": ..., "template_str": ...}`: compile and
+      register a template.
+    * `{"op": "ping"}`, `{"op": "stats"}`, `{"op": "shutdown"}`
+
+    Any request may carry an `"id"`, echoed in the answer. Filters are
+    Python callables and are therefore registered when the daemon starts.
+
+    The socket is only accessible by its owner (mode 0600): edits run with
+    the permissions of the daemon.
+
+:Platform: Unix, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+
+:Example:
+
+    ::
+
+        python -m editfrontmatter.daemon --filter canPublish=mymod:canPublish \\
+            --template example=template1.j2 &
+        python -m editfrontmatter.client --template example --var hasMath=true --write post.md
+"""
+
+# Imports
+import os
+import sys
+import json
+import time
+import threading
+import argparse
+import socketserver
+from collections import OrderedDict
+
+from .EditFrontMatter import EditFrontMatter, compiled_template
+from .operations import compile_operations
+from .errors import error_record
+
+
+def default_socket_path() -> str:
+    """`$XDG_RUNTIME_DIR/editfrontmatter.sock`, else a per user path in the temporary directory"""
+    runtime = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime:
+        return os.path.join(runtime, 'editfrontmatter.sock')
+    import tempfile
+    return os.path.join(tempfile.gettempdir(), 'editfrontmatter-{uid}.sock'.format(uid=os.getuid()))
+
+
+class EditService(object):
+    """Request handling of the daemon (no sockets: usable in process and in tests)"""
+
+    OPERATIONS_CACHE_SIZE = 256
+
+    def __init__(self, *, filters=None, pure_filters=(), yaml_delim='---', read_mode='text',
+                 encoding=None):
+        """
+        Args:
+            filters (dict): {name: callable} Jinja2 filters
+            pure_filters (list): names of `filters` to memoize
+            yaml_delim (str): front matter delimiter
+            read_mode (str): see :class:`EditFrontMatter`
+            encoding (str): file encoding
+
+        Attributes:
+            self.templates (dict): {name: template source} registered templates
+        """
+        import jinja2
+        self.env = jinja2.Environment(loader=None)
+        proc = EditFrontMatter(jinja2_env=self.env, do_readFile=False)
+        for name, func in (filters or {}).items():
+            proc.add_JinjaFilter(name, func, pure=name in pure_filters)
+        self.yaml_delim = yaml_delim
+        self.read_mode = read_mode
+        self.encoding = encoding
+        self.templates = {}
+        self._operations = OrderedDict()
+        self._lock = threading.Lock()
+        self.counts = {}
+        self.started = time.time()
+
+        # warm up the yaml parser / dumper
+        import oyaml
+        oyaml.dump(oyaml.load("warm: up\n", Loader=oyaml.FullLoader))
+
+    def register(self, name, template_str) -> None:
+        """ Compile and register a template.
+
+        Throws:
+            jinja2.TemplateError
+        """
+        compiled_template(self.env, template_str)
+        with self._lock:
+            self.templates[name] = template_str
+
+    def _compiled_operations(self, specs):
+        key = json.dumps(specs, sort_keys=True)
+        with self._lock:
+            ops = self._operations.get(key)
+            if ops is not None:
+                self._operations.move_to_end(key)
+                return ops
+        ops = compile_operations(specs)
+        with self._lock:
+            self._operations[key] = ops
+            if len(self._operations) > self.OPERATIONS_CACHE_SIZE:
+                self._operations.popitem(last=False)
+        return ops
+
+    def edit(self, request) -> dict:
+        """ Handle an `edit` request (see the module documentation).
+
+        Returns:
+            answer dict
+        """
+        path = request.get('path')
+        content = request.get('content')
+        if (path is None) == (content is None):
+            raise ValueError("edit needs exactly one of 'path' and 'content'")
+
+        template_str = request.get('template_str') or ""
+        name = request.get('template')
+        if name is not None:
+            if name not in self.templates:
+                raise KeyError("unknown template '{n}'".format(n=name))
+            template_str = self.templates[name]
+
+        operations = request.get('operations')
+        proc = EditFrontMatter(
+            file_path=path,
+            jinja2_env=self.env,
+            template_str=template_str,
+            yaml_delim=request.get('yaml_delim', self.yaml_delim),
+            keys_toDelete=list(request.get('delete', ())),
+            operations=self._compiled_operations(operations) if operations else None,
+            lazy_yaml=True,
+            encoding=self.encoding,
+            read_mode=self.read_mode if path is not None else 'text',
+            do_readFile=False)
+
+        stage = 'read'
+        answer = {}
+        try:
+            if content is not None:
+                proc.file_lines = content.splitlines(True)
+            proc.readFile()
+            if not proc.has_source_data():
+                status = 'empty'
+            elif not proc.has_source_yaml():
+                status = 'no-yaml'
+            else:
+                stage = 'run'
+                proc.run(request.get('vars') or {})
+                stage = 'dump'
+                data = proc.dumpFileData()
+                if proc.file_data is not None:
+                    original = bytes(proc.file_data)
+                else:
+                    original = ''.join(proc.file_lines)
+                if data == original:
+                    status = 'unchanged'
+                elif path is not None and request.get('write'):
+                    stage = 'write'
+                    proc.writeFile(data=data)
+                    status = 'written'
+                else:
+                    status = 'changed'
+                if content is not None or request.get('return_content'):
+                    answer['content'] = data.decode(proc._encoding(), 'surrogateescape') \
+                        if isinstance(data, bytes) else data
+            if content is not None and 'content' not in answer:
+                answer['content'] = content
+        except Exception as e:
+            status = 'error'
+            answer['error'] = error_record(path or '<content>', e, stage).as_dict()
+        answer['status'] = status
+        return answer
+
+    def handle(self, request) -> dict:
+        """ Answer one request. Exceptions are reported in the answer.
+
+        Returns:
+            answer dict (`{"status": "error", "error": ...}` on failure)
+        """
+        start = time.perf_counter()
+        op = request.get('op', 'edit')
+        try:
+            if op == 'edit':
+                answer = self.edit(request)
+            elif op == 'register':
+                self.register(request['name'], request['template_str'])
+                answer = {'status': 'ok'}
+            elif op == 'ping':
+                answer = {'status': 'ok', 'pid': os.getpid()}
+            elif op == 'stats':
+                answer = {'status': 'ok', 'requests': dict(self.counts),
+                          'templates': sorted(self.templates),
+                          'uptime': time.time() - self.started}
+            else:
+                raise ValueError("unknown op '{op}'".format(op=op))
+        except Exception as e:
+            answer = {'status': 'error', 'error': error_record(request.get('path', ''), e, op).as_dict()}
+        with self._lock:
+            self.counts[op] = self.counts.get(op, 0) + 1
+        if 'id' in request:
+            answer['id'] = request['id']
+        answer['elapsed'] = time.perf_counter() - start
+        return answer
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """One client connection: a json request per line, a json answer per line"""
+
+    def handle(self):
+        service = self.server.service
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line.decode('utf-8'))
+                if not isinstance(request, dict):
+                    raise ValueError("expected a json object, got {t}".format(t=type(request).__name__))
+            except ValueError as e:
+                answer = {'status': 'error', 'error': {'message': 'bad request: {e}'.format(e=e)}}
+            else:
+                if request.get('op') == 'shutdown':
+                    self._send({'status': 'ok', 'id': request.get('id')})
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                    return
+                answer = service.handle(request)
+            self._send(answer)
+
+    def _send(self, answer):
+        self.wfile.write(json.dumps(answer).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+
+class Daemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server answering :class:`EditService` requests (one thread per connection)"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, service):
+        """
+        Args:
+            socket_path (str): Unix socket path (a stale socket is replaced)
+            service (EditService): request handler
+
+        Throws:
+            OSError (a daemon is already listening)
+        """
+        self.socket_path = socket_path
+        self.service = service
+        if os.path.exists(socket_path):
+            import socket
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(socket_path)
+            except OSError:
+                os.unlink(socket_path)      # stale
+            else:
+                raise OSError("a daemon is already listening on {p}".format(p=socket_path))
+            finally:
+                probe.close()
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, _Handler)
+        finally:
+            os.umask(old_umask)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def main(argv=None) -> int:
+    """ `python -m editfrontmatter.daemon`
+
+    Returns:
+        * 0 after a shutdown request or a signal
+        * 2 on startup errors
+    """
+    from .cli import _parse_filter, _load_callable
+
+    parser = argparse.ArgumentParser(prog='editfrontmatter-daemon',
+                                     description='Serve front matter edits on a Unix socket.')
+    parser.add_argument('--socket', default=default_socket_path(), metavar='PATH',
+                        help='socket path (default: %(default)s)')
+    parser.add_argument('--template', action='append', default=[], metavar='NAME=FILE',
+                        help='register a Jinja2 template; repeatable')
+    parser.add_argument('--filter', action='append', default=[], type=_parse_filter,
+                        metavar='NAME=MODULE:FUNC', help='Jinja2 filter callback; repeatable')
+    parser.add_argument('--pure-filter', action='append', default=[], metavar='NAME',
+                        help='memoize the results of filter NAME; repeatable')
+    parser.add_argument('--yaml-delim', default='---', metavar='DELIM')
+    parser.add_argument('--read-mode', choices=('text', 'bytes', 'mmap'), default='text')
+    parser.add_argument('--encoding', metavar='NAME')
+    args = parser.parse_args(argv)
+
+    try:
+        service = EditService(filters={name: _load_callable(spec) for name, spec in args.filter},
+                              pure_filters=args.pure_filter, yaml_delim=args.yaml_delim,
+                              read_mode=args.read_mode, encoding=args.encoding)
+        for spec in args.template:
+            name, _, path = spec.partition('=')
+            with open(path, "r") as fo:
+                service.register(name, fo.read())
+        server = Daemon(args.socket, service)
+    except Exception as e:
+        print("Error: {e}".format(e=e), file=sys.stderr)
+        return 2
+
+    import signal
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    print("listening on {p}".format(p=args.socket), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
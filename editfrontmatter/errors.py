@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Structured Error Records
+==============================
+
+.. module:: editfrontmatter.errors
+
+:Synopsis: Cheap, picklable error records for batch processing. Instead of
+    formatting a traceback for every failing file (see
+    :class:`editfrontmatter.EditFrontMatter.EditFrontMatter_Exception`), a
+    record keeps the path, the failed stage, the original exception type and
+    message, and the line / column of yaml errors. Tracebacks are only
+    formatted when asked for.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+"""
+
+# Imports
+from .EditFrontMatter import EditFrontMatter_Exception
+
+
+class ErrorRecord(object):
+    """A failed file"""
+    __slots__ = ('path', 'stage', 'exc_type', 'message', 'line', 'column', 'traceback')
+
+    def __init__(self, path, stage, exc_type, message, line=None, column=None, traceback=None):
+        """
+        Attributes:
+            self.path (str): file path
+            self.stage (str): failed stage (`'read'`, `'parse'`, `'run'`, `'write'`, ...)
+            self.exc_type (str): class name of the original exception
+            self.message (str): first line of the original exception message
+            self.line (int): 1-based line in the file (yaml errors), or `None`
+            self.column (int): 1-based column (yaml errors), or `None`
+            self.traceback (str): formatted traceback if requested, or `None`
+        """
+        self.path = path
+        self.stage = stage
+        self.exc_type = exc_type
+        self.message = message
+        self.line = line
+        self.column = column
+        self.traceback = traceback
+
+    def __str__(self):
+        where = ''
+        if self.line is not None:
+            where = ':{line}:{column}'.format(line=self.line, column=self.column)
+        return "{stage}{where}: {exc_type}: {message}".format(
+            stage=self.stage, where=where, exc_type=self.exc_type, message=self.message)
+
+    def __repr__(self):
+        return "ErrorRecord({path!r}, {stage!r}, {exc_type!r})".format(
+            path=self.path, stage=self.stage, exc_type=self.exc_type)
+
+    def as_dict(self) -> dict:
+        """json serializable representation"""
+        return {name: getattr(self, name) for name in self.__slots__
+                if getattr(self, name) is not None}
+
+
+def _mark(exc):
+    """The most precise yaml mark of an exception (`None` for non yaml errors)"""
+    return getattr(exc, 'problem_mark', None) or getattr(exc, 'context_mark', None)
+
+
+def error_record(path, exc, stage='run', with_traceback=False) -> ErrorRecord:
+    """ Build an :class:`ErrorRecord` from an exception without formatting
+    its traceback (unless `with_traceback`).
+
+    Args:
+        path (str): file path
+        exc (Exception): caught exception
+        stage (str): stage used if the exception does not carry one
+        with_traceback (bool): format the traceback into the record
+
+    Returns:
+        :class:`ErrorRecord`
+    """
+    line_offset = 0
+    original = exc
+    if isinstance(exc, EditFrontMatter_Exception):
+        stage = exc.stage or stage
+        line_offset = exc.line_offset
+        if exc.exc is not None:
+            original = exc.exc
+
+    line = column = None
+    mark = _mark(original)
+    if mark is not None:
+        line = line_offset + mark.line + 1
+        column = mark.column + 1
+        message = getattr(original, 'problem', None) or str(original)
+    elif original is exc and isinstance(exc, EditFrontMatter_Exception):
+        message = exc.msg
+    else:
+        message = str(original)
+    message = message.strip().split('\n', 1)[0]
+
+    tb = None
+    if with_traceback:
+        import traceback
+        tb = ''.join(traceback.format_exception(type(original), original, original.__traceback__))
+
+    return ErrorRecord(path, stage, type(original).__name__, message, line, column, tb)
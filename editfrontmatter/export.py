@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Front Matter Export
+==============================
+
+.. module:: editfrontmatter.export
+
+:Synopsis: Extract the front matter of a tree for analytics (tag
+    distributions, stale dates) without rendering or writing anything.
+    Files are read and parsed on the batch engine in extract mode
+    (:func:`editfrontmatter.batch.extract_file`: the `readFile` delimiter
+    scan, only the front matter is decoded and parsed), in parallel, and
+    streamed to a writer as they complete, so memory does not grow with
+    the number of files.
+
+    Formats (:data:`FORMATS`):
+
+    * `jsonl`: one `{"path", "status", "front_matter"}` object per file
+      (plus `"error"` for files that failed).
+    * `columns`: one json object
+      `{"format", "rows", "strings", "files", "columns"}` where `files`
+      holds the `path` and `status` arrays and `columns` maps every top
+      level front matter key to an array of `rows` values (`null` where a
+      file has no such key). `path` holds the paths, `status` and the
+      front matter strings are interned: each distinct string is stored
+      once in `strings` and values refer to it by index, up to
+      :data:`ColumnWriter.MAX_STRINGS` distinct strings (later new strings
+      are stored inline). See :func:`ColumnWriter.encode_value`;
+      :func:`read_columns` decodes the file.
+
+    Columns and paths are spilled to temporary files while the export
+    runs; only the string table, which has a bounded size, is kept in
+    memory.
+
+    Rows are in completion order (walk order with `jobs=1`).
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+
+:Example:
+
+    ::
+
+        with open('frontmatter.jsonl', 'w') as fo:
+            export(walk_files(['content/']), fo, 'jsonl', jobs=4, executor='process')
+
+    From a shell::
+
+        python -m editfrontmatter.export content/ -o frontmatter.json --format columns -j 4
+
+    :func:`read_columns` gives back the rows of the `jsonl` format, also
+    once the string table is full:
+
+    .. testcode::
+
+        import io
+        import os
+        import json
+        import tempfile
+        from editfrontmatter.batch import walk_files
+        from editfrontmatter.export import ColumnWriter, export, read_columns
+
+        top = tempfile.mkdtemp()
+        for name, fmatter in (('a', 'title: a\\ntags: [x, y]\\n'),
+                              ('b', 'title: b\\ndate: 2020-01-02\\nparams: {toc: true, n: 1}\\n'),
+                              ('c', 'tags: [x, z]\\n')):
+            with open(os.path.join(top, name + '.md'), 'w') as fo:
+                fo.write('---\\n' + fmatter + '---\\nbody\\n')
+
+        jsonl = io.StringIO()
+        export(walk_files([top]), jsonl, 'jsonl')
+        rows = [json.loads(line) for line in jsonl.getvalue().splitlines()]
+
+        for max_strings in (ColumnWriter.MAX_STRINGS, 3):
+            default, ColumnWriter.MAX_STRINGS = ColumnWriter.MAX_STRINGS, max_strings
+            try:
+                columns = io.StringIO()
+                export(walk_files([top]), columns, 'columns')
+            finally:
+                ColumnWriter.MAX_STRINGS = default
+            columns.seek(0)
+            files, values = read_columns(columns)
+            decoded = [dict(path=files['path'][n], status=files['status'][n],
+                            front_matter={key: values[key][n] for key in values if values[key][n] is not None})
+                       for n in range(len(rows))]
+            print(decoded == rows, sorted(values))
+
+    .. testoutput::
+
+        True ['date', 'params', 'tags', 'title']
+        True ['date', 'params', 'tags', 'title']
+
+    .. testcleanup::
+
+        import shutil
+        shutil.rmtree(top)
+"""
+
+# Imports
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+from collections import OrderedDict
+
+from .batch import Batch, BatchReport, BatchTask, json_keys, walk_files
+
+FORMATS = ('jsonl', 'columns')
+"""Export formats"""
+
+COLUMNS_FORMAT = 'editfrontmatter-columns/1'
+"""`format` member of `columns` files"""
+
+
+def _json(value) -> str:
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+class JsonlWriter(object):
+    """Writes one json object per extracted file"""
+
+    def __init__(self, fo):
+        """
+        Args:
+            fo (file): text output stream
+        """
+        self.fo = fo
+
+    def write(self, result) -> None:
+        """Write the :class:`editfrontmatter.batch.FileResult` of :func:`editfrontmatter.batch.extract_file`"""
+        # yaml keys may be dates or numbers: json keys are strings
+        record = OrderedDict((('path', result.path), ('status', result.status),
+                              ('front_matter', json_keys(result.output))))
+        if result.error is not None:
+            record['error'] = result.error.as_dict()
+        self.fo.write(_json(record) + '\n')
+
+    def close(self) -> None:
+        self.fo.flush()
+
+
+class ColumnWriter(object):
+    """Writes the `columns` format (see the module documentation)"""
+
+    MAX_OPEN = 64
+    """Column spill files kept open at once"""
+
+    MAX_STRINGS = 1 << 16
+    """Distinct strings interned (bounds the memory of the string table)"""
+
+    def __init__(self, fo, spill_dir=None):
+        """
+        Args:
+            fo (file): text output stream, written by :func:`close`
+            spill_dir (str): directory for the temporary column files
+                (default: the system temporary directory)
+        """
+        self.fo = fo
+        self.rows = 0
+        self._dir = tempfile.mkdtemp(prefix='efm-columns-', dir=spill_dir)
+        self._strings = {}
+        self._strings_fo = open(os.path.join(self._dir, 'strings'), 'w', encoding='utf-8')
+        self._files_fo = open(os.path.join(self._dir, 'files'), 'w', encoding='utf-8')
+        self._columns = OrderedDict()   # {key: [spill file name, rows written]}
+        self._open = OrderedDict()      # {key: file} LRU of open spill files
+
+    def intern(self, text):
+        """Index of `text` in the string table, or `None` if the table is full"""
+        index = self._strings.get(text)
+        if index is None:
+            if len(self._strings) >= self.MAX_STRINGS:
+                return None
+            index = self._strings[text] = len(self._strings)
+            self._strings_fo.write((',' if index else '') + _json(text))
+        return index
+
+    def encode_value(self, value):
+        """ Encode a front matter value:
+
+        * a string: its index in `strings` (a one element array holding
+          the string once the table is full)
+        * `None`: `null`
+        * anything else: a one element array holding the value, with the
+          items of lists and the values of mappings encoded the same way
+          (dates and other yaml types become strings)
+        """
+        if isinstance(value, str):
+            index = self.intern(value)
+            return [value] if index is None else index
+        if value is None:
+            return None
+        if isinstance(value, (list, tuple)):
+            return [[self.encode_value(item) for item in value]]
+        if isinstance(value, dict):
+            return [OrderedDict((str(key), self.encode_value(item)) for key, item in value.items())]
+        if isinstance(value, (bool, int, float)):
+            return [value]
+        return self.encode_value(str(value))
+
+    def _spill(self, key):
+        fo = self._open.get(key)
+        if fo is not None:
+            self._open.move_to_end(key)
+            return fo
+        column = self._columns.get(key)
+        if column is None:
+            column = self._columns[key] = ['c{n}'.format(n=len(self._columns)), 0]
+        if len(self._open) >= self.MAX_OPEN:
+            self._open.popitem(last=False)[1].close()
+        fo = self._open[key] = open(os.path.join(self._dir, column[0]), 'a', encoding='utf-8')
+        return fo
+
+    def _put(self, key, encoded) -> None:
+        fo = self._spill(key)
+        column = self._columns[key]
+        # `null` for the rows without this key
+        missing = self.rows - column[1]
+        fo.write(''.join((',' if column[1] + i else '') + 'null' for i in range(missing)))
+        fo.write((',' if self.rows else '') + _json(encoded))
+        column[1] = self.rows + 1
+
+    def write(self, result) -> None:
+        """Add the :class:`editfrontmatter.batch.FileResult` of :func:`editfrontmatter.batch.extract_file` as a row"""
+        # paths are unique: written as they are, not interned
+        status = _json(self.encode_value(result.status))
+        self._files_fo.write('{s}\t{p}\n'.format(s=status, p=_json(result.path)))
+        fmatter = result.output
+        if isinstance(fmatter, dict):
+            for key, value in fmatter.items():
+                self._put(str(key), self.encode_value(value))
+        self.rows += 1
+
+    def close(self) -> None:
+        """Write the output file and remove the spill files"""
+        try:
+            for fo in self._open.values():
+                fo.close()
+            self._open.clear()
+            self._strings_fo.close()
+            self._files_fo.close()
+
+            fo = self.fo
+            fo.write('{{"format":{f},"rows":{r},"strings":['.format(f=_json(COLUMNS_FORMAT), r=self.rows))
+            with open(os.path.join(self._dir, 'strings'), encoding='utf-8') as spill:
+                shutil.copyfileobj(spill, fo)
+            fo.write('],"files":')
+            self._write_files(fo)
+            fo.write(',"columns":{')
+            for n, (key, (name, written)) in enumerate(self._columns.items()):
+                fo.write((',' if n else '') + _json(key) + ':[')
+                with open(os.path.join(self._dir, name), encoding='utf-8') as spill:
+                    shutil.copyfileobj(spill, fo)
+                fo.write(''.join((',' if written + i else '') + 'null' for i in range(self.rows - written)))
+                fo.write(']')
+            fo.write('}}\n')
+            fo.flush()
+        finally:
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+    def _write_files(self, fo) -> None:
+        """The `files` member: one pass over the spill file per array"""
+        fo.write('{')
+        for n, name in enumerate(('path', 'status')):
+            fo.write((',' if n else '') + '"{name}":['.format(name=name))
+            with open(os.path.join(self._dir, 'files'), encoding='utf-8') as spill:
+                for row, line in enumerate(spill):
+                    fo.write((',' if row else '') + line.rstrip('\n').split('\t')[1 - n])
+            fo.write(']')
+        fo.write('}')
+
+
+def _decode(value, strings):
+    if value is None:
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return strings[value]
+    inner = value[0]
+    if isinstance(inner, list):
+        return [_decode(item, strings) for item in inner]
+    if isinstance(inner, dict):
+        return OrderedDict((key, _decode(item, strings)) for key, item in inner.items())
+    return inner
+
+
+def read_columns(fo) -> tuple:
+    """ Load a `columns` export.
+
+    Args:
+        fo (file): text input stream
+
+    Returns:
+        ({'path': list, 'status': list}, {key: list of decoded values})
+
+    Throws:
+        ValueError
+    """
+    data = json.load(fo, object_pairs_hook=OrderedDict)
+    if data.get('format') != COLUMNS_FORMAT:
+        raise ValueError("not a {f} file".format(f=COLUMNS_FORMAT))
+    strings = data['strings']
+    files = {'path': data['files']['path'],
+             'status': [_decode(value, strings) for value in data['files']['status']]}
+    return files, OrderedDict((key, [_decode(value, strings) for value in values])
+                              for key, values in data['columns'].items())
+
+
+def export(entries, fo, fmt='jsonl', *, yaml_delim='---', encoding=None, jobs=1, executor='thread',
+           spill_dir=None, on_result=None) -> BatchReport:
+    """ Extract the front matter of `entries` and write it to `fo`.
+
+    Args:
+        entries (iterable): :class:`editfrontmatter.batch.FileEntry` objects (or paths)
+        fo (file): text output stream
+        fmt (str): [default: 'jsonl'] one of :data:`FORMATS`
+        yaml_delim (str): front matter delimiter
+        encoding (str): [default: utf-8] file encoding
+        jobs (int): [default: 1] workers
+        executor (str): [default: 'thread'] `'thread'` or `'process'`
+        spill_dir (str): temporary directory of the `columns` writer
+        on_result (callable): called with each
+            :class:`editfrontmatter.batch.FileResult`
+
+    Returns:
+        :class:`editfrontmatter.batch.BatchReport`
+
+    Throws:
+        ValueError
+    """
+    if fmt not in FORMATS:
+        raise ValueError("format must be one of {f}".format(f=', '.join(FORMATS)))
+    task = BatchTask(yaml_delim=yaml_delim, encoding=encoding, read_mode='mmap')
+    batch = Batch(task=task, jobs=jobs, executor=executor, extract=True)
+    writer = JsonlWriter(fo) if fmt == 'jsonl' else ColumnWriter(fo, spill_dir)
+
+    def write(result):
+        writer.write(result)
+        if on_result is not None:
+            on_result(result)
+
+    try:
+        report = batch.run(entries, on_result=write)
+    finally:
+        writer.close()
+    return report
+
+
+def main(argv=None) -> int:
+    """ `python -m editfrontmatter.export`
+
+    Returns:
+        * 0 on success
+        * 1 if files failed to parse (they are exported with their error)
+        * 2 on usage errors
+    """
+    parser = argparse.ArgumentParser(prog='editfrontmatter-export',
+                                     description='Export front matter as jsonl or columns.')
+    parser.add_argument('paths', nargs='+', metavar='PATH', help='files and/or directories')
+    parser.add_argument('-o', '--output', metavar='FILE', help='output file (default: stdout)')
+    parser.add_argument('--format', choices=FORMATS, default='jsonl')
+    parser.add_argument('--include', action='append', metavar='GLOB', help='default: *.md')
+    parser.add_argument('--exclude', action='append', default=[], metavar='GLOB')
+    parser.add_argument('--yaml-delim', default='---', metavar='DELIM')
+    parser.add_argument('--encoding', metavar='NAME')
+    parser.add_argument('-j', '--jobs', type=int, default=1, metavar='N')
+    parser.add_argument('--processes', action='store_true')
+    args = parser.parse_args(argv)
+
+    entries = walk_files(args.paths, include=args.include or ('*.md',), exclude=args.exclude)
+    fo = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        report = export(entries, fo, args.format, yaml_delim=args.yaml_delim, encoding=args.encoding,
+                        jobs=args.jobs, executor='process' if args.processes else 'thread')
+    finally:
+        if args.output:
+            fo.close()
+    print("number of files: {n}".format(n=report.files), file=sys.stderr)
+    for status, count in sorted(report.counts.items()):
+        if count:
+            print("  {status}: {count}".format(status=status, count=count), file=sys.stderr)
+    print("elapsed: {t:.3f}s".format(t=report.elapsed), file=sys.stderr)
+    return 1 if report.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
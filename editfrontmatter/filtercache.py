@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Jinja2 Filter Memoization
+==============================
+
+.. module:: editfrontmatter.filtercache
+
+:Synopsis: Thread safe, bounded LRU caches for *pure* Jinja2 filters (filters
+    whose result only depends on their arguments). Caches are shared between
+    every :class:`editfrontmatter.EditFrontMatter.EditFrontMatter` instance
+    that registers the same callable. See
+    :func:`editfrontmatter.EditFrontMatter.EditFrontMatter.add_JinjaFilter`.
+
+    The registry only holds weak references to the caches: a cache (with
+    its callable and cached results) is released once no Jinja2
+    environment uses it, so creating many environments does not grow
+    memory.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+"""
+
+# Imports
+import weakref
+import threading
+import functools
+from collections import namedtuple, OrderedDict
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize', 'uncacheable'])
+"""Cache statistics (`uncacheable` counts calls with unhashable arguments)"""
+
+# shared caches: {callable: PureFilter}, entries live as long as their
+# PureFilter is registered somewhere
+_caches = weakref.WeakValueDictionary()
+_caches_lock = threading.Lock()
+
+
+class PureFilter(object):
+    """A memoizing wrapper around a pure filter callable"""
+
+    def __init__(self, func, maxsize=128):
+        """
+        Args:
+            func (callable):
+                the filter callback
+            maxsize (int):
+                maximum number of cached results (`None` for unbounded)
+        """
+        functools.update_wrapper(self, func)   # keeps jinja2 `pass_*` markers
+        self.func = func
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._uncacheable = 0
+
+    def __call__(self, *args, **kwargs):
+        # typed key so that `1` and `True` are cached separately
+        key = args + tuple(type(arg) for arg in args)
+        if kwargs:
+            key += (frozenset(kwargs.items()),)
+        try:
+            hash(key)
+        except TypeError:
+            with self._lock:
+                self._uncacheable += 1
+            return self.func(*args, **kwargs)
+
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self._hits += 1
+                return self._data[key]
+
+        # call outside of the lock. concurrent misses may compute twice
+        value = self.func(*args, **kwargs)
+
+        with self._lock:
+            self._misses += 1
+            self._data[key] = value
+            if self.maxsize is not None and len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def cache_info(self) -> CacheInfo:
+        """Return the cache statistics"""
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self.maxsize,
+                             len(self._data), self._uncacheable)
+
+    def cache_clear(self) -> None:
+        """Clear the cache and its statistics"""
+        with self._lock:
+            self._data.clear()
+            self._hits = self._misses = self._uncacheable = 0
+
+
+def pure_filter(func, maxsize=128) -> PureFilter:
+    """ Return the shared memoizing wrapper for `func`, creating it if needed.
+
+    Args:
+        func (callable): the filter callback
+        maxsize (int): cache size (`None` for unbounded)
+
+    Returns:
+        :class:`PureFilter`
+
+    Throws:
+        ValueError (the shared wrapper of `func` has another `maxsize`)
+    """
+    with _caches_lock:
+        cache = func if isinstance(func, PureFilter) else _caches.get(func)
+        if cache is None:
+            cache = _caches[func] = PureFilter(func, maxsize)
+    if cache.maxsize != maxsize:
+        raise ValueError("filter {name} is already memoized with maxsize={size}".
+                         format(name=getattr(cache, '__name__', repr(cache.func)), size=cache.maxsize))
+    return cache
+
+
+def drop_filter_cache(filter_obj) -> bool:
+    """ Clear and forget the shared cache of a registered filter.
+
+    Args:
+        filter_obj (object): a filter as stored in `jinja2.Environment.filters`
+
+    Returns:
+        * `True` if `filter_obj` was a memoized filter
+        * `False` otherwise
+    """
+    if not isinstance(filter_obj, PureFilter):
+        return False
+    with _caches_lock:
+        if _caches.get(filter_obj.func) is filter_obj:
+            del _caches[filter_obj.func]
+    filter_obj.cache_clear()
+    return True
+
+
+def filter_cache_info() -> dict:
+    """ Statistics of every shared filter cache.
+
+    Returns:
+        {filter `__name__`: :class:`CacheInfo`}
+    """
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {getattr(c, '__name__', repr(c.func)): c.cache_info() for c in caches}
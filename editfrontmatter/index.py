@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Front Matter Index
+==============================
+
+.. module:: editfrontmatter.index
+
+:Synopsis: Keep the front matter of a tree in a local SQLite database and
+    query it before editing, so that an edit run only touches the matching
+    files instead of parsing the whole corpus.
+
+    Tables:
+
+    * `files`: one row per file: `path` (absolute), the fingerprint
+      `size`, `mtime_ns` and `inode`, `status` (see
+      :data:`editfrontmatter.batch.STATUSES`, `'extracted'` for files with
+      front matter), `error` and `front_matter` (json, in file order).
+    * `keys`: one row per top level front matter key: `file_id`, `key` and
+      `value` (json, compact with sorted keys).
+
+    :func:`FrontMatterIndex.refresh` only parses files whose fingerprint
+    changed, in parallel on the batch engine
+    (:class:`editfrontmatter.batch.Batch`), and drops files that are gone.
+    :func:`FrontMatterIndex.select` yields
+    :class:`editfrontmatter.batch.FileEntry` objects for
+    :func:`editfrontmatter.batch.Batch.run`.
+
+    Queries are `match` conditions (`key == value`, or `value` contained in
+    the list stored under `key`) and / or a raw SQL `where` clause on
+    `files`; SQLite json functions are available
+    (`json_extract(front_matter, '$.author.name') = ?`). The database is a
+    local file of the caller: `where` is trusted SQL.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+
+:Example:
+
+    ::
+
+        with FrontMatterIndex('.frontmatter.db') as index:
+            index.refresh(['content/'], jobs=4)
+            entries = list(index.select(match=[('draft', True), ('tags', 'python')],
+                                        roots=['content/']))
+        Batch(task=task, jobs=4).run(entries)
+
+    From a shell::
+
+        python -m editfrontmatter.index .frontmatter.db content/ --match draft=true --match tags=python
+        editfrontmatter --index .frontmatter.db --match draft=true -t template.j2 -w content/
+"""
+
+# Imports
+import os
+import sys
+import json
+import sqlite3
+import argparse
+
+from .batch import Batch, BatchTask, FileEntry, json_keys, walk_files
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    front_matter TEXT
+);
+CREATE TABLE IF NOT EXISTS keys (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (file_id, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS keys_key_value ON keys (key, value);
+"""
+
+# json text of an element of a json array, in the form of `json_value()`
+_ELEMENT_JSON = ("CASE j.type WHEN 'true' THEN 'true' WHEN 'false' THEN 'false' "
+                 "WHEN 'null' THEN 'null' WHEN 'object' THEN j.value WHEN 'array' THEN j.value "
+                 "ELSE json_quote(j.value) END")
+
+COMMIT_FILES = 1000
+"""Files written per transaction during a refresh"""
+
+
+def json_value(value) -> str:
+    """ Canonical json text of a front matter value (dates and other yaml
+    types are stored as strings).
+
+    Returns:
+        str
+    """
+    return json.dumps(json_keys(value), sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def parse_match(text) -> tuple:
+    """ Parse a `KEY=VALUE` condition; VALUE is parsed as yaml (`true`, `3`,
+    `[a, b]`) and kept as a string if that fails.
+
+    Returns:
+        (key, value)
+
+    Throws:
+        ValueError
+    """
+    key, sep, value = text.partition('=')
+    if not sep or not key:
+        raise ValueError("expected KEY=VALUE, got '{t}'".format(t=text))
+    import oyaml as yaml
+    try:
+        value = yaml.safe_load(value)
+    except yaml.YAMLError:
+        pass
+    return key, value
+
+
+def _fingerprint(st) -> tuple:
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+def _under(path, roots) -> bool:
+    """`True` if `path` is one of `roots` or inside one of them"""
+    return any(path == root or path.startswith(root.rstrip(os.sep) + os.sep) for root in roots)
+
+
+class FrontMatterIndex(object):
+    """A SQLite database of front matter"""
+
+    def __init__(self, db_path, *, yaml_delim='---', encoding=None):
+        """
+        Args:
+            db_path (str):
+                database file (created if needed)
+            yaml_delim (str):
+                front matter delimiter
+            encoding (str):
+                [default: utf-8] file encoding
+
+        Attributes:
+            self.json1 (bool): the sqlite3 library has the JSON1 functions
+                (needed by `match` conditions, see :func:`query`)
+
+        Throws:
+            sqlite3.Error, ValueError (database of another schema version)
+        """
+        self.db_path = db_path
+        # only the front matter is decoded, bodies are never read into Python strings
+        self.task = BatchTask(yaml_delim=yaml_delim, encoding=encoding, read_mode='mmap')
+        self.db = sqlite3.connect(db_path)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError("{p}: index schema version {v}, expected {e}".format(
+                p=db_path, v=version, e=SCHEMA_VERSION))
+        with self.db:
+            self.db.executescript(_SCHEMA)
+            self.db.execute("PRAGMA user_version = {v}".format(v=SCHEMA_VERSION))
+        try:
+            self.db.execute("SELECT json_type('[]')")
+            self.json1 = True
+        except sqlite3.OperationalError:
+            self.json1 = False
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _stored(self, roots) -> dict:
+        """{path: (id, fingerprint)} of indexed files under `roots`"""
+        stored = {}
+        for file_id, path, size, mtime_ns, inode in self.db.execute(
+                "SELECT id, path, size, mtime_ns, inode FROM files"):
+            if _under(path, roots):
+                stored[path] = (file_id, (size, mtime_ns, inode))
+        return stored
+
+    def _store(self, result, fingerprint) -> str:
+        """ Insert or replace the row of one file and its keys (no commit).
+
+        Returns:
+            the stored status (`'error'` if the front matter can not be
+            stored as json)
+        """
+        fmatter = result.output
+        status = result.status
+        error = str(result.error) if result.error is not None else None
+        front_matter = None
+        if fmatter is not None:
+            try:
+                front_matter = json.dumps(json_keys(fmatter), separators=(',', ':'), ensure_ascii=False,
+                                          default=str)
+            except (TypeError, ValueError, RecursionError) as e:
+                fmatter = None
+                status = 'error'
+                error = "front matter is not json serializable: {e}".format(e=e)
+        values = fingerprint + (status, error, front_matter)
+        # UPDATE then INSERT: upserts (ON CONFLICT) need SQLite 3.24
+        row = self.db.execute("SELECT id FROM files WHERE path = ?", (result.path,)).fetchone()
+        if row is None:
+            file_id = self.db.execute(
+                "INSERT INTO files (size, mtime_ns, inode, status, error, front_matter, path) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", values + (result.path,)).lastrowid
+        else:
+            file_id = row[0]
+            self.db.execute(
+                "UPDATE files SET size = ?, mtime_ns = ?, inode = ?, status = ?, error = ?, "
+                "front_matter = ? WHERE id = ?", values + (file_id,))
+            self.db.execute("DELETE FROM keys WHERE file_id = ?", (file_id,))
+        if isinstance(fmatter, dict):
+            self.db.executemany("INSERT INTO keys (file_id, key, value) VALUES (?, ?, ?)",
+                                ((file_id, str(key), json_value(value)) for key, value in fmatter.items()))
+        return status
+
+    def _index(self, paths, fingerprints, jobs, executor, on_result) -> int:
+        """Parse `paths` and store them, committing every :data:`COMMIT_FILES` files"""
+        batch = Batch(task=self.task, jobs=jobs, executor=executor, extract=True)
+        errors = 0
+        pending = 0
+        try:
+            for result in batch.results(paths):
+                fingerprint = fingerprints[result.path]
+                if self._store(result, fingerprint) == 'error':
+                    errors += 1
+                if on_result is not None:
+                    on_result(result)
+                pending += 1
+                if pending >= COMMIT_FILES:
+                    self.db.commit()
+                    pending = 0
+        finally:
+            self.db.commit()
+        return errors
+
+    def refresh(self, paths, include=('*.md',), exclude=(), *, jobs=1, executor='thread',
+                on_result=None) -> dict:
+        """ Bring the index of `paths` up to date: new and changed files are
+        parsed, unchanged files are skipped and files that are gone (or no
+        longer selected) are removed.
+
+        Args:
+            paths (list): files and / or directories (see :func:`editfrontmatter.batch.walk_files`)
+            include (list): [default: ('*.md',)] file name patterns
+            exclude (list): name / relative path patterns to skip
+            jobs (int): [default: 1] parsing workers
+            executor (str): [default: 'thread'] `'thread'` or `'process'`
+            on_result (callable): called with the
+                :class:`editfrontmatter.batch.FileResult` of each parsed file
+
+        Returns:
+            dict: numbers of `added`, `updated`, `unchanged`, `removed` and
+            `errors` files
+        """
+        roots = [os.path.abspath(path) for path in paths]
+        stored = self._stored(roots)
+        counts = dict(added=0, updated=0, unchanged=0, removed=0, errors=0)
+
+        changed = []
+        fingerprints = {}
+        for entry in walk_files(roots, include=include, exclude=exclude):
+            try:
+                fingerprint = _fingerprint(os.stat(entry.path))
+            except OSError:
+                continue
+            previous = stored.pop(entry.path, None)
+            if previous is not None and previous[1] == fingerprint:
+                counts['unchanged'] += 1
+                continue
+            counts['updated' if previous is not None else 'added'] += 1
+            fingerprints[entry.path] = fingerprint
+            changed.append(FileEntry(entry.path, fingerprint[0]))
+
+        with self.db:
+            self.db.executemany("DELETE FROM files WHERE id = ?", ((file_id,) for file_id, _ in stored.values()))
+        counts['removed'] = len(stored)
+        counts['errors'] = self._index(changed, fingerprints, jobs, executor, on_result)
+        return counts
+
+    def update(self, paths) -> None:
+        """ Re-index files now (e.g. files just written by an edit run);
+        missing files are removed.
+
+        Args:
+            paths (list): file paths
+        """
+        present = []
+        fingerprints = {}
+        with self.db:
+            for path in paths:
+                path = os.path.abspath(path)
+                try:
+                    fingerprints[path] = _fingerprint(os.stat(path))
+                    present.append(path)
+                except OSError:
+                    self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+        self._index(present, fingerprints, 1, 'thread', None)
+
+    def query(self, match=(), where=None, params=(), roots=None):
+        """ Select indexed files.
+
+        Args:
+            match (list): (key, value) conditions, all must hold: the value
+                stored under `key` equals `value` or is a list containing it
+            where (str): additional SQL condition on the `files` table
+            params (tuple): parameters of `where`
+            roots (list): only files under these paths
+
+        Yields:
+            sqlite3 rows `(path, size, status, front_matter)` ordered by path
+
+        Throws:
+            sqlite3.Error (`match` without the JSON1 functions)
+        """
+        if match and not self.json1:
+            raise sqlite3.NotSupportedError(
+                "match conditions need the SQLite JSON1 functions, not available in the "
+                "SQLite {v} library of this Python".format(v=sqlite3.sqlite_version))
+        conditions = []
+        args = []
+        for key, value in match:
+            conditions.append(
+                "EXISTS (SELECT 1 FROM keys k WHERE k.file_id = files.id AND k.key = ? AND "
+                "(k.value = ? OR (json_type(k.value) = 'array' AND EXISTS "
+                "(SELECT 1 FROM json_each(k.value) j WHERE " + _ELEMENT_JSON + " = ?))))")
+            value = json_value(value)
+            args.extend((key, value, value))
+        if where:
+            conditions.append("(" + where + ")")
+            args.extend(params)
+        sql = "SELECT path, size, status, front_matter FROM files"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY path"
+        absroots = [os.path.abspath(root) for root in roots] if roots else None
+        for row in self.db.execute(sql, args):
+            if absroots is None or _under(row[0], absroots):
+                yield row
+
+    def select(self, match=(), where=None, params=(), roots=None):
+        """ :func:`query` as input of :func:`editfrontmatter.batch.Batch.run`.
+
+        Yields:
+            :class:`editfrontmatter.batch.FileEntry`
+        """
+        for path, size, _, _ in self.query(match, where, params, roots):
+            yield FileEntry(path, size)
+
+
+def main(argv=None) -> int:
+    """ `python -m editfrontmatter.index`: refresh an index and list the
+    matching files.
+
+    Returns:
+        * 0 on success
+        * 1 if files failed to parse
+        * 2 on usage errors
+    """
+    parser = argparse.ArgumentParser(prog='editfrontmatter-index',
+                                     description='Index front matter in SQLite and query it.')
+    parser.add_argument('db', metavar='DB', help='index database')
+    parser.add_argument('paths', nargs='+', metavar='PATH', help='files and/or directories')
+    parser.add_argument('--match', action='append', default=[], type=parse_match, metavar='KEY=VALUE',
+                        help='front matter condition (VALUE is parsed as yaml); repeatable')
+    parser.add_argument('--where', metavar='SQL', help="SQL condition on the files table")
+    parser.add_argument('--no-refresh', dest='refresh', action='store_false',
+                        help='query the index as is')
+    parser.add_argument('--json', action='store_true', help='print {"path", "front_matter"} json lines')
+    parser.add_argument('--include', action='append', metavar='GLOB', help='default: *.md')
+    parser.add_argument('--exclude', action='append', default=[], metavar='GLOB')
+    parser.add_argument('--yaml-delim', default='---', metavar='DELIM')
+    parser.add_argument('--encoding', metavar='NAME')
+    parser.add_argument('-j', '--jobs', type=int, default=1, metavar='N')
+    parser.add_argument('--processes', action='store_true')
+    args = parser.parse_args(argv)
+
+    errors = 0
+    try:
+        with FrontMatterIndex(args.db, yaml_delim=args.yaml_delim, encoding=args.encoding) as index:
+            if args.refresh:
+                counts = index.refresh(args.paths, include=args.include or ('*.md',), exclude=args.exclude,
+                                       jobs=args.jobs, executor='process' if args.processes else 'thread')
+                errors = counts['errors']
+                print(", ".join("{k}: {v}".format(k=k, v=v) for k, v in counts.items()), file=sys.stderr)
+            for path, _, status, front_matter in index.query(args.match, args.where, roots=args.paths):
+                if args.json:
+                    print(json.dumps({'path': path, 'status': status,
+                                      'front_matter': json.loads(front_matter) if front_matter else None}))
+                else:
+                    print(path)
+    except (sqlite3.Error, ValueError) as e:
+        print("Error: {e}".format(e=e), file=sys.stderr)
+        return 2
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stage Instrumentation
+==============================
+
+.. module:: editfrontmatter.instrument
+
+:Synopsis: Optional per stage timing of
+    :class:`editfrontmatter.EditFrontMatter.EditFrontMatter`. An observer
+    assigned to :attr:`EditFrontMatter.observer` receives the monotonic
+    duration and the size of the data handled by each stage of
+    :func:`readFile`, :func:`run`, :func:`dumpFileData` and :func:`writeFile`.
+    Without an observer (the default) nothing is timed.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+
+:Example:
+
+    ::
+
+        timings = StageTimings()
+        proc = EditFrontMatter(file_path="example1.md", template_str=template_str,
+                               observer=timings)
+        proc.run(variables)
+        proc.writeFile()
+        print(timings.format())
+"""
+
+# Imports
+import time
+
+STAGES = ('read', 'scan', 'parse', 'render', 'reparse', 'update', 'dump', 'write')
+"""Instrumented stages, in processing order:
+
+    * read: reading the source file (:func:`readFile`)
+    * scan: locating the front matter delimiters (:func:`readFile`)
+    * parse: `yaml.load` of the front matter (:func:`readFile`)
+    * render: rendering the Jinja2 template (:func:`run`)
+    * reparse: `yaml.load` of the rendered template (:func:`run`)
+    * update: merging, operations and key deletion (:func:`run`, size: number of keys)
+    * dump: :func:`dumpFileData`
+    * write: writing the file (:func:`writeFile`)
+"""
+
+clock = time.perf_counter
+"""Monotonic clock used for stage timings"""
+
+
+class StageObserver(object):
+    """Observer interface. Subclass and override :func:`stage`."""
+
+    def stage(self, name, seconds, size) -> None:
+        """ Called when a stage completes.
+
+        Args:
+            name (str): one of :data:`STAGES`
+            seconds (float): duration
+            size (int): amount of data handled (characters for text, bytes otherwise)
+        """
+        pass
+
+
+class StageTimings(StageObserver):
+    """Accumulates count, time and size per stage. Not thread safe: use one
+    object per thread and :func:`merge` them."""
+
+    def __init__(self):
+        """
+        Attributes:
+            self.stages (dict): {stage: [calls, seconds, size]}
+        """
+        self.stages = {}
+
+    def stage(self, name, seconds, size) -> None:
+        entry = self.stages.get(name)
+        if entry is None:
+            self.stages[name] = [1, seconds, size]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += size
+
+    def merge(self, other) -> None:
+        """ Add the totals of another :class:`StageTimings` (or of its :func:`as_dict`)."""
+        stages = other.stages if isinstance(other, StageTimings) else other
+        for name, (calls, seconds, size) in stages.items():
+            entry = self.stages.get(name)
+            if entry is None:
+                self.stages[name] = [calls, seconds, size]
+            else:
+                entry[0] += calls
+                entry[1] += seconds
+                entry[2] += size
+
+    @property
+    def total(self) -> float:
+        """Time spent in all stages (seconds)"""
+        return sum(entry[1] for entry in self.stages.values())
+
+    def as_dict(self) -> dict:
+        """{stage: [calls, seconds, size]} (picklable / json serializable)"""
+        return {name: list(entry) for name, entry in self.stages.items()}
+
+    def format(self) -> str:
+        """A table of the stages in processing order"""
+        total = self.total or 1.0
+        lines = ["{s:<8} {c:>9} {t:>11} {p:>6} {b:>14}".format(
+            s='stage', c='calls', t='seconds', p='%', b='size')]
+        for name in STAGES + tuple(sorted(set(self.stages) - set(STAGES))):
+            if name not in self.stages:
+                continue
+            calls, seconds, size = self.stages[name]
+            lines.append("{s:<8} {c:>9} {t:>11.4f} {p:>6.1f} {b:>14}".format(
+                s=name, c=calls, t=seconds, p=100.0 * seconds / total, b=size))
+        return '\n'.join(lines)
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Checkpoint Journal
+==============================
+
+.. module:: editfrontmatter.journal
+
+:Synopsis: An append-only record of the files a batch run completed, so an
+    interrupted run (crash, signal, reboot) can be resumed without redoing
+    finished work.
+
+    The journal is a json lines file. The first line describes the run
+    (`{"journal": 1, "signature": ...}`); the following lines are:
+
+    * in-flight records, written before files are handed to the workers:
+      `path` and `begin`, the fingerprint (size, mtime, inode) of the file
+      before the edit.
+    * completion records, one per processed file: `path`, `status`,
+      `digest` (of the output document, see
+      :attr:`editfrontmatter.batch.FileResult.digest`) and the fingerprint
+      after processing (`size`, `mtime_ns`, `ino`).
+
+    Records are buffered and flushed in groups (every `group` files or
+    `interval` seconds) followed by one `fdatasync`, which keeps the cost
+    per file low. In-flight records are synced before their files are
+    submitted, completion records may be lost with the last group.
+
+    On resume, a file is skipped if:
+
+    * its last record is a completion (not an error) and its fingerprint
+      still matches, or
+    * its last record is in-flight and the file no longer matches the
+      fingerprint from before the edit: it was written before the
+      interruption (its completion record was lost). Files are replaced
+      atomically with the journal (see
+      :class:`editfrontmatter.EditFrontMatter.EditFrontMatter` `atomic`),
+      so such a file holds the whole edit.
+
+    Edits are therefore not applied twice, which matters for edits that
+    are not idempotent (`append` with `unique: false`, counters). A file
+    changed by someone else while it was in flight is also skipped. A
+    torn last line is ignored. The `signature` identifies the edit:
+    resuming with another edit raises :class:`ValueError`.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+
+:Example:
+
+    ::
+
+        task = BatchTask(template_str=template_str, write=True, atomic=True, digest=True)
+        with Journal('run.journal', resume=True, signature='v1') as journal:
+            Batch(task=task, jobs=4, journal=journal).run(walk_files(['content/']))
+
+    From a shell::
+
+        editfrontmatter -t template.j2 -w --journal run.journal content/
+        editfrontmatter -t template.j2 -w --journal run.journal --resume content/
+
+    Resuming after a torn write, with one file changed since the run:
+
+    .. testcode::
+
+        import os
+        import tempfile
+        from editfrontmatter.batch import Batch, BatchTask, walk_files
+        from editfrontmatter.journal import Journal, read_journal
+
+        top = tempfile.mkdtemp()
+        for name in ('a', 'b', 'c'):
+            with open(os.path.join(top, name + '.md'), 'w') as fo:
+                fo.write('---\\ntitle: {n}\\n---\\nbody\\n'.format(n=name))
+        journal_path = os.path.join(top, 'run.journal')
+        # not idempotent: every run appends another 'x'
+        task = BatchTask(operations=[{'op': 'append', 'path': 'tags', 'value': 'x'}],
+                         write=True, atomic=True, digest=True)
+
+        with Journal(journal_path, signature='v1') as journal:
+            Batch(task=task, journal=journal).run(walk_files([top]))
+        with open(journal_path, 'ab') as fo:
+            fo.write(b'{"path": "')
+        with open(os.path.join(top, 'c.md'), 'w') as fo:
+            fo.write('---\\ntitle: c\\nedited: true\\n---\\nbody\\n')
+
+        with Journal(journal_path, resume=True, signature='v1') as journal:
+            report = Batch(task=task, journal=journal).run(walk_files([top]))
+        print(journal.skipped, report.files)
+        for name in ('a', 'b', 'c'):
+            with open(os.path.join(top, name + '.md')) as fo:
+                print(fo.read().count('- x'), end=' ')
+        print(sorted(record['status'] for record in read_journal(journal_path).values()))
+
+    .. testoutput::
+
+        2 1
+        1 1 1 ['written', 'written', 'written']
+
+    .. testcleanup::
+
+        import shutil
+        shutil.rmtree(top)
+"""
+
+# Imports
+import os
+import json
+import time
+import threading
+
+JOURNAL_VERSION = 1
+
+GROUP_FILES = 256
+"""Records written per flush"""
+
+GROUP_SECONDS = 1.0
+"""Longest time a record stays buffered"""
+
+DONE = frozenset(('written', 'changed', 'unchanged', 'empty', 'no-yaml'))
+"""Statuses of completed files (errors are retried on resume)"""
+
+
+def fingerprint(path):
+    """(size, mtime_ns, inode) of `path`, `None` if it can not be read"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+def read_journal(path, signature=None) -> dict:
+    """ Load the records of a journal.
+
+    Args:
+        path (str): journal file
+        signature (str): expected signature (`None`: not checked)
+
+    Returns:
+        {path: record dict} (the last record of each file)
+
+    Throws:
+        ValueError (not a journal, or another signature), OSError
+    """
+    records = {}
+    with open(path, "rb") as fo:
+        header = fo.readline()
+        try:
+            header = json.loads(header.decode('utf-8'))
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or header.get('journal') != JOURNAL_VERSION:
+            raise ValueError("{p}: not a journal".format(p=path))
+        if signature is not None and header.get('signature') != signature:
+            raise ValueError("{p}: the journal was written by a different edit".format(p=path))
+        for line in fo:
+            if not line.endswith(b"\n"):
+                break       # torn write
+            record = json.loads(line.decode('utf-8'))
+            records[record['path']] = record
+    return records
+
+
+class Journal(object):
+    """Append-only journal of completed files"""
+
+    def __init__(self, path, *, resume=False, signature=None, group=GROUP_FILES, interval=GROUP_SECONDS):
+        """
+        Args:
+            path (str):
+                journal file
+            resume (bool):
+                [default: False] keep the records of an existing journal
+                (see :func:`pending`); otherwise a new journal is started
+            signature (str):
+                identifies the edit (e.g. a hash of the template and options)
+            group (int):
+                [default: :data:`GROUP_FILES`] records per flush
+            interval (float):
+                [default: :data:`GROUP_SECONDS`] seconds between flushes
+
+        Attributes:
+            self.completed (dict): {path: record} loaded on resume
+            self.skipped (int): files skipped by :func:`pending`
+            self.recovered (int): skipped files that were written by the
+                interrupted run after their last completion record
+            self.recorded (int): completion records written by this run
+
+        Throws:
+            ValueError, OSError
+        """
+        self.path = path
+        self.group = max(1, group)
+        self.interval = interval
+        self.completed = {}
+        self.skipped = 0
+        self.recovered = 0
+        self.recorded = 0
+        self._buffer = []
+        self._flushed = time.monotonic()
+        # pending() may run in the prefetch thread (see Batch.results)
+        self._lock = threading.RLock()
+
+        if resume and os.path.exists(path) and os.path.getsize(path):
+            self.completed = read_journal(path, signature)
+            self._fo = open(path, "r+b")
+            # drop a torn last line before appending
+            data_end = self._fo.seek(0, os.SEEK_END)
+            if data_end:
+                self._fo.seek(data_end - 1)
+                if self._fo.read(1) != b"\n":
+                    self._fo.seek(0)
+                    keep = self._fo.read().rfind(b"\n") + 1
+                    self._fo.truncate(keep)
+                    self._fo.seek(keep)
+        else:
+            self._fo = open(path, "wb")
+            self._buffer.append({'journal': JOURNAL_VERSION, 'signature': signature,
+                                 'started': time.time()})
+            self.flush()
+
+    def done(self, path) -> bool:
+        """`True` if `path` was completed by the previous run and has not
+        changed since (see the module documentation)"""
+        record = self.completed.get(path)
+        if record is None:
+            return False
+        current = fingerprint(path)
+        if current is None:
+            return False
+        if 'begin' in record:
+            if current == tuple(record['begin']):
+                return False
+            # complete the record for the next resume
+            self.recovered += 1
+            self._append({'path': path, 'status': 'written', 'digest': None,
+                          'size': current[0], 'mtime_ns': current[1], 'ino': current[2]})
+            return True
+        if record['status'] not in DONE:
+            return False
+        return current == (record['size'], record['mtime_ns'], record.get('ino'))
+
+    def pending(self, entries):
+        """ Skip the entries completed by a previous run and record the
+        others as in flight.
+
+        Entries are read ahead by groups: the in-flight records of a group
+        are synced to disk before its entries are yielded.
+
+        Args:
+            entries (iterable): :class:`editfrontmatter.batch.FileEntry` objects (or paths)
+
+        Yields:
+            entries to process
+        """
+        group = []
+        for entry in entries:
+            path = getattr(entry, 'path', entry)
+            if self.completed and self.done(path):
+                self.skipped += 1
+                continue
+            group.append(entry)
+            if len(group) >= self.group:
+                yield from self._begin(group)
+                group = []
+        yield from self._begin(group)
+
+    def _begin(self, group) -> list:
+        """Write and sync the in-flight records of `group`"""
+        for entry in group:
+            path = getattr(entry, 'path', entry)
+            current = fingerprint(path)
+            if current is not None:
+                self._append({'path': path, 'begin': current})
+        self.flush()
+        return group
+
+    def _append(self, record) -> None:
+        with self._lock:
+            self._buffer.append(record)
+
+    def record(self, result) -> None:
+        """Append the :class:`editfrontmatter.batch.FileResult` of a processed file"""
+        current = fingerprint(result.path) or (None, None, None)
+        with self._lock:
+            self._buffer.append({'path': result.path, 'status': result.status, 'digest': result.digest,
+                                 'size': current[0], 'mtime_ns': current[1], 'ino': current[2]})
+            self.recorded += 1
+            if len(self._buffer) >= self.group or time.monotonic() - self._flushed >= self.interval:
+                self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records and sync them to disk"""
+        with self._lock:
+            if self._buffer:
+                self._fo.write(b"".join(json.dumps(record).encode('utf-8') + b"\n" for record in self._buffer))
+                self._fo.flush()
+                getattr(os, 'fdatasync', os.fsync)(self._fo.fileno())
+                del self._buffer[:]
+            self._flushed = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._fo.closed:
+                self.flush()
+                self._fo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Two Phase Corpus Runs
+==============================
+
+.. module:: editfrontmatter.mapreduce
+
+:Synopsis: Edits that depend on the whole corpus (a `weight` by date within
+    a section, `prev` / `next` links, tag counts) in two phases without
+    parsing any file twice:
+
+    1. map / reduce: the front matter of every file is read and parsed on
+       the batch engine in extract mode
+       (:func:`editfrontmatter.batch.extract_file`) and handed to a user
+       `reducer` as an iterator of `(path, front matter)` pairs. The
+       reducer returns the corpus context. Each parsed front matter is
+       cached with the file fingerprint.
+    2. edit: files with front matter are edited with the task; templates
+       see the context as `corpus` (see `context_name`) and the file
+       being edited as `file_path`. The cached front matter replaces the
+       yaml parse unless the file changed since phase 1.
+
+    Files without front matter, empty files and files that failed to parse
+    are reported from phase 1 and not read again.
+
+    The cache and the context stay in the calling process (one front
+    matter per file in memory). Thread pools share them; process pools
+    inherit them when they are started, which needs the `fork` start
+    method (Linux).
+
+    The reducer receives the objects that phase 2 edits: copy what the
+    context keeps from them if it must not see the edits.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+
+:Example:
+
+    ::
+
+        def weights(items):
+            dates = sorted((str(fmatter.get('date')), path) for path, fmatter in items)
+            return {'weight': {path: n for n, (_, path) in enumerate(dates, 1)}}
+
+        task = CorpusTask(template_str="weight: {{ corpus.weight[file_path] }}\\n", write=True)
+        report = CorpusBatch(task=task, reducer=weights, jobs=4).run(walk_files(['content/']))
+
+    From a shell::
+
+        editfrontmatter --reducer mymod:weights -t weight.j2 -w content/
+"""
+
+# Imports
+import os
+import time
+
+from .batch import Batch, BatchTask, BatchReport, FileEntry, schedule_entries
+
+# {task token: (context, {path: (fingerprint, front matter)})} shared by the
+# threads of this process and inherited by forked workers
+_corpora = {}
+
+
+def _fingerprint(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class CorpusTask(BatchTask):
+    """A :class:`editfrontmatter.batch.BatchTask` whose templates see the
+    corpus context of :class:`CorpusBatch`"""
+
+    def __init__(self, *, context_name='corpus', **options):
+        """
+        Args:
+            context_name (str):
+                [default: 'corpus'] template variable holding the context
+            options:
+                see :class:`editfrontmatter.batch.BatchTask`
+        """
+        super().__init__(**options)
+        self.context_name = context_name
+
+    def _corpus(self):
+        corpus = _corpora.get(self.token)
+        if corpus is None:
+            raise RuntimeError("no corpus context in this process: run the task with CorpusBatch "
+                               "(process pools need the 'fork' start method)")
+        return corpus
+
+    def variables(self, path) -> dict:
+        """Task variables plus the corpus context and `file_path`"""
+        variables = dict(self.extraVars_dict)
+        variables[self.context_name] = self._corpus()[0]
+        variables['file_path'] = path
+        return variables
+
+    def processor(self, file_path=None, do_readFile=True, observer=None):
+        """See :func:`editfrontmatter.batch.BatchTask.processor`; the front
+        matter cached by phase 1 is used if the file did not change"""
+        proc = super().processor(file_path, do_readFile, observer)
+        if file_path is not None and do_readFile:
+            # each file is edited once: free the entry
+            cached = self._corpus()[1].pop(file_path, None)
+            if cached is not None and proc.has_source_yaml() and cached[0] == _fingerprint(file_path):
+                proc.fmatter = cached[1]
+        return proc
+
+
+class CorpusBatch(object):
+    """Runs a :class:`CorpusTask` in two phases (see the module documentation)"""
+
+    def __init__(self, *, task, reducer, **options):
+        """
+        Args:
+            task (CorpusTask):
+                the edit of phase 2
+            reducer (callable):
+                called with an iterator of `(path, front matter)` pairs of
+                all files with front matter; returns the corpus context
+            options:
+                see :class:`editfrontmatter.batch.Batch`
+
+        Attributes:
+            self.context: the context returned by the reducer (after :func:`run`)
+        """
+        if not isinstance(task, CorpusTask):
+            raise ValueError("task must be a CorpusTask")
+        self.task = task
+        self.reducer = reducer
+        self.options = options
+        self.context = None
+        self._batch = None
+        self._stopped = False
+
+    def stop(self) -> None:
+        """Stop submitting files (see :func:`editfrontmatter.batch.Batch.stop`)"""
+        self._stopped = True
+        if self._batch is not None:
+            self._batch.stop()
+
+    def run(self, entries, on_result=None, memory_top=10) -> BatchReport:
+        """ Reduce the corpus, then edit it.
+
+        Args:
+            entries (iterable): :class:`editfrontmatter.batch.FileEntry` objects (or paths)
+            on_result (callable): called with each
+                :class:`editfrontmatter.batch.FileResult` (phase 1 results
+                of files that are not edited, then phase 2 results)
+            memory_top (int): see :func:`editfrontmatter.batch.Batch.run`
+
+        Returns:
+            :class:`editfrontmatter.batch.BatchReport` of both phases
+        """
+        start = time.monotonic()
+        cache = {}
+        edit = []
+        skipped = []
+        options = dict(self.options)
+        # phase 1 reads every file: scheduling and the journal apply to phase 2
+        schedule = options.pop('schedule', 'walk')
+        options.pop('metrics', None)
+        options.pop('journal', None)
+        extract = self._batch = Batch(task=self.task, extract=True, **options)
+
+        def items():
+            for result in extract.results(entries):
+                if result.status != 'extracted':
+                    skipped.append(result)
+                    continue
+                cache[result.path] = (_fingerprint(result.path), result.output)
+                edit.append(FileEntry(result.path, result.size))
+                yield result.path, result.output
+
+        pairs = items()
+        context = self.reducer(pairs)
+        for _ in pairs:
+            pass    # the reducer stopped early: cache the rest
+
+        self.context = context
+        _corpora[self.task.token] = (context, cache)
+        try:
+            report = BatchReport(memory_top)
+            for result in skipped:
+                report.add(result)
+                if on_result is not None:
+                    on_result(result)
+            del skipped[:]
+
+            edit = schedule_entries(edit, schedule)
+            options['metrics'] = self.options.get('metrics')
+            options['journal'] = self.options.get('journal')
+            batch = self._batch = Batch(task=self.task, schedule='walk', **options)
+            if self._stopped:
+                batch.stop()
+            phase2 = batch.run(edit, on_result=on_result, memory_top=memory_top)
+        finally:
+            del _corpora[self.task.token]
+
+        for status, count in phase2.counts.items():
+            report.counts[status] += count
+        report.files += phase2.files
+        report.timings = phase2.timings
+        report.memory = phase2.memory
+        report.elapsed = time.monotonic() - start
+        return report
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Memory Profiling
+==============================
+
+.. module:: editfrontmatter.memprofile
+
+:Synopsis: Opt-in, sampled memory profiling for batch runs. For a sampled
+    file, `tracemalloc` is enabled only while the file is processed and the
+    peak allocation is recorded together with the memory retained by the
+    :class:`editfrontmatter.EditFrontMatter.EditFrontMatter` object
+    (:attr:`file_lines` or :attr:`file_data`, :attr:`fmatter` and the dumped
+    output). The batch
+    report keeps the top-N heaviest files.
+
+    Peaks are exact with one worker or with a process pool (one tracer per
+    process). With a thread pool, allocations of other threads made while a
+    sampled file is traced are included, so peaks are an upper bound.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+"""
+
+# Imports
+import sys
+import zlib
+import heapq
+import threading
+import tracemalloc
+
+_trace_lock = threading.Lock()
+_tracers = 0        # active PeakTracer blocks
+_started = False    # tracemalloc was started by a PeakTracer
+
+
+def deep_sizeof(obj, _seen=None) -> int:
+    """ Approximate memory retained by `obj` and the containers / strings it references.
+
+    Args:
+        obj (object): usually a front matter object or a list of lines
+
+    Returns:
+        bytes
+    """
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deep_sizeof(key, _seen) + deep_sizeof(value, _seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += deep_sizeof(item, _seen)
+    return size
+
+
+def footprint(proc, data=None) -> dict:
+    """ Memory retained by an :class:`EditFrontMatter` object.
+
+    Args:
+        proc (EditFrontMatter): a processed object
+        data (str): output of :func:`EditFrontMatter.dumpFileData`, if any
+
+    Returns:
+        {'file_lines': bytes, 'fmatter': bytes, 'dump': bytes}
+
+    Note:
+        `file_lines` accounts for :attr:`file_data` in `'bytes'` mode (lines
+        are not decoded just to be measured). `fmatter` is only measured if
+        it was parsed (the yaml is not parsed just to be measured).
+    """
+    file_data = getattr(proc, 'file_data', None)
+    fmatter = getattr(proc, '_fmatter', None)
+    return {
+        'file_lines': deep_sizeof(file_data) if file_data is not None else
+        deep_sizeof(getattr(proc, '_file_lines', None) or []),
+        'fmatter': deep_sizeof(fmatter) if isinstance(fmatter, (dict, list)) else 0,
+        'dump': sys.getsizeof(data) if data is not None else 0,
+    }
+
+
+def sampled(path, rate) -> bool:
+    """ Deterministic sampling decision for `path` (same in every process and run).
+
+    Args:
+        path (str): file path
+        rate (float): share of files to sample (0.0 - 1.0)
+    """
+    if rate >= 1.0:
+        return True
+    if rate <= 0.0:
+        return False
+    return zlib.crc32(path.encode('utf-8', 'surrogateescape')) % 10000 < rate * 10000
+
+
+class PeakTracer(object):
+    """ Context manager measuring the peak traced allocation of a block.
+
+    Blocks may overlap (thread pool): tracing is started by the first block
+    and stopped by the last one, the lock is only held to start, measure and
+    stop. The peak is reset when no other block is traced (Python 3.9+;
+    before, an already running `tracemalloc` reports its peak since it was
+    started).
+    """
+
+    def __init__(self):
+        self.peak = 0
+
+    def __enter__(self):
+        global _tracers, _started
+        with _trace_lock:
+            if not _tracers:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _started = True
+                else:
+                    reset_peak = getattr(tracemalloc, 'reset_peak', None)   # Python 3.9+
+                    if reset_peak is not None:
+                        reset_peak()
+            _tracers += 1
+            self._baseline = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, *exc):
+        global _tracers, _started
+        with _trace_lock:
+            self.peak = max(0, tracemalloc.get_traced_memory()[1] - self._baseline)
+            _tracers -= 1
+            if not _tracers and _started:
+                tracemalloc.stop()
+                _started = False
+        return False
+
+
+class MemoryReport(object):
+    """Keeps the `top` heaviest files of a batch"""
+
+    def __init__(self, top=10):
+        """
+        Args:
+            top (int): number of files kept
+        """
+        self.top = top
+        self.sampled = 0
+        self._heap = []
+
+    def add(self, path, memory) -> None:
+        """ Account for the `memory` dict of a sampled file.
+
+        Args:
+            path (str): file path
+            memory (dict): {'peak': bytes, 'file_lines': ..., 'fmatter': ..., 'dump': ...}
+        """
+        self.sampled += 1
+        item = (memory.get('peak', 0), path, memory)
+        if len(self._heap) < self.top:
+            heapq.heappush(self._heap, item)
+        elif item[0] > self._heap[0][0]:
+            heapq.heapreplace(self._heap, item)
+
+    def heaviest(self) -> list:
+        """[(path, memory dict)] by decreasing peak"""
+        return [(path, memory) for _, path, memory in sorted(self._heap, key=lambda i: -i[0])]
+
+    def format(self) -> str:
+        """A table of the heaviest files"""
+        lines = ["sampled files: {n}".format(n=self.sampled),
+                 "{p:>12} {l:>12} {f:>12} {d:>12}  path".format(
+                     p='peak', l='file_lines', f='fmatter', d='dump')]
+        for path, memory in self.heaviest():
+            lines.append("{p:>12} {l:>12} {f:>12} {d:>12}  {path}".format(
+                p=memory.get('peak', 0), l=memory.get('file_lines', 0),
+                f=memory.get('fmatter', 0), d=memory.get('dump', 0), path=path))
+        return '\n'.join(lines)
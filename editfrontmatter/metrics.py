@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Batch Metrics
+==============================
+
+.. module:: editfrontmatter.metrics
+
+:Synopsis: Low contention metrics for :mod:`editfrontmatter.batch` runs.
+    Each worker thread records into its own shard (no locks on the hot
+    path); shards are merged when a snapshot is taken, at the end of the
+    batch or periodically. Snapshots report throughput (files/s, bytes/s),
+    per file latency percentiles, counts per status and per error class and
+    worker utilization, and can be exported as json or as a Prometheus
+    textfile for the node_exporter textfile collector.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+
+:Example:
+
+    ::
+
+        metrics = BatchMetrics(workers=8)
+        report = Batch(task=task, jobs=8, metrics=metrics).run(entries)
+        snapshot = metrics.snapshot()
+        write_json(snapshot, 'metrics.json')
+        write_prometheus(snapshot, '/var/lib/node_exporter/editfrontmatter.prom')
+"""
+
+# Imports
+import os
+import json
+import math
+import time
+import threading
+from array import array
+
+PERCENTILES = (50, 95, 99)
+"""Reported latency percentiles"""
+
+
+class _Shard(object):
+    """Counters owned by a single thread"""
+    __slots__ = ('counts', 'error_classes', 'bytes', 'busy', 'latencies')
+
+    def __init__(self):
+        self.counts = {}
+        self.error_classes = {}
+        self.bytes = 0
+        self.busy = 0.0
+        self.latencies = array('d')
+
+
+def percentile(sorted_values, pct) -> float:
+    """Nearest rank percentile of an already sorted sequence (0.0 if empty)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(math.ceil(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class BatchMetrics(object):
+    """Collects :class:`editfrontmatter.batch.FileResult` statistics"""
+
+    def __init__(self, workers=1):
+        """
+        Args:
+            workers (int): number of workers (used for the utilization)
+        """
+        self.workers = max(1, workers)
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self.started = None
+        self.finished = None
+
+    def start(self) -> None:
+        """Mark the beginning of the batch (the first :func:`record` does it implicitly)"""
+        if self.started is None:
+            self.started = time.monotonic()
+
+    def stop(self) -> None:
+        """Mark the end of the batch"""
+        self.finished = time.monotonic()
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def record(self, result) -> None:
+        """ Account for a file result in the calling thread's shard.
+
+        Args:
+            result (FileResult): a processed file
+        """
+        if self.started is None:
+            self.start()
+        shard = self._shard()
+        shard.counts[result.status] = shard.counts.get(result.status, 0) + 1
+        if result.error_class is not None:
+            shard.error_classes[result.error_class] = shard.error_classes.get(result.error_class, 0) + 1
+        shard.bytes += result.size
+        shard.busy += result.elapsed
+        shard.latencies.append(result.elapsed)
+
+    def snapshot(self) -> dict:
+        """ Merge the shards into a report. Can be called while the batch runs.
+
+        Returns:
+            dict (json serializable)
+        """
+        with self._shards_lock:
+            shards = list(self._shards)
+
+        counts = {}
+        error_classes = {}
+        total_bytes = 0
+        busy = 0.0
+        latencies = array('d')
+        for shard in shards:
+            for key, value in list(shard.counts.items()):
+                counts[key] = counts.get(key, 0) + value
+            for key, value in list(shard.error_classes.items()):
+                error_classes[key] = error_classes.get(key, 0) + value
+            total_bytes += shard.bytes
+            busy += shard.busy
+            latencies.extend(shard.latencies[:])
+        latencies = sorted(latencies)
+
+        end = self.finished if self.finished is not None else time.monotonic()
+        wall = max(end - self.started, 1e-9) if self.started is not None else 0.0
+        files = len(latencies)
+        latency = [('p{p}'.format(p=p), percentile(latencies, p)) for p in PERCENTILES]
+        latency.append(('max', latencies[-1] if latencies else 0.0))
+        latency.append(('mean', sum(latencies) / files if files else 0.0))
+
+        return {
+            'files': files,
+            'bytes': total_bytes,
+            'wall_seconds': wall,
+            'files_per_second': files / wall if wall else 0.0,
+            'bytes_per_second': total_bytes / wall if wall else 0.0,
+            'latency_seconds': dict(latency),
+            'status': counts,
+            'skipped': counts.get('empty', 0) + counts.get('no-yaml', 0),
+            'unchanged': counts.get('unchanged', 0),
+            'errors': counts.get('error', 0),
+            'error_classes': error_classes,
+            'workers': self.workers,
+            'worker_utilization': min(1.0, busy / (wall * self.workers)) if wall else 0.0,
+        }
+
+
+def _atomic_write(path, text) -> None:
+    """Write via a temporary file and rename so readers never see partial files"""
+    tmp = "{path}.{pid}.tmp".format(path=path, pid=os.getpid())
+    with open(tmp, 'w') as fo:
+        fo.write(text)
+    os.replace(tmp, path)
+
+
+def write_json(snapshot, path) -> None:
+    """Export a :func:`BatchMetrics.snapshot` as json"""
+    _atomic_write(path, json.dumps(snapshot, indent=2, sort_keys=True) + '\n')
+
+
+def _label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text(snapshot, prefix='editfrontmatter') -> str:
+    """ Format a :func:`BatchMetrics.snapshot` in the Prometheus text exposition format.
+
+    Args:
+        snapshot (dict): metrics snapshot
+        prefix (str): metric name prefix
+    """
+    lines = []
+
+    def metric(name, kind, help_text, samples, suffixed=()):
+        """`suffixed`: (suffix, value) samples such as the `_sum` and `_count` of a summary"""
+        full = '{p}_{n}'.format(p=prefix, n=name)
+        lines.append('# HELP {f} {h}'.format(f=full, h=help_text))
+        lines.append('# TYPE {f} {k}'.format(f=full, k=kind))
+        for labels, value in samples:
+            label_text = ','.join('{k}="{v}"'.format(k=k, v=_label(v)) for k, v in labels)
+            lines.append('{f}{{{l}}} {v}'.format(f=full, l=label_text, v=value) if label_text
+                         else '{f} {v}'.format(f=full, v=value))
+        for suffix, value in suffixed:
+            lines.append('{f}_{s} {v}'.format(f=full, s=suffix, v=value))
+
+    latency = snapshot['latency_seconds']
+    metric('files_total', 'counter', 'Files processed by the batch.', [((), snapshot['files'])])
+    metric('bytes_total', 'counter', 'Bytes of source files processed by the batch.', [((), snapshot['bytes'])])
+    metric('wall_seconds', 'gauge', 'Batch wall time.', [((), snapshot['wall_seconds'])])
+    metric('files_per_second', 'gauge', 'Batch throughput in files.', [((), snapshot['files_per_second'])])
+    metric('bytes_per_second', 'gauge', 'Batch throughput in bytes.', [((), snapshot['bytes_per_second'])])
+    metric('file_latency_seconds', 'summary', 'Per file processing latency.',
+           [((('quantile', '0.' + k[1:]),), v) for k, v in sorted(latency.items()) if k.startswith('p')],
+           [('sum', latency.get('mean', 0.0) * snapshot['files']), ('count', snapshot['files'])])
+    metric('files', 'gauge', 'Files per result status.',
+           [((('status', k),), v) for k, v in sorted(snapshot['status'].items())])
+    metric('errors', 'gauge', 'Failed files per error class.',
+           [((('class', k),), v) for k, v in sorted(snapshot['error_classes'].items())])
+    metric('worker_utilization_ratio', 'gauge', 'Share of worker time spent processing files.',
+           [((), snapshot['worker_utilization'])])
+    metric('last_run_timestamp_seconds', 'gauge', 'Time of the export.', [((), time.time())])
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(snapshot, path, prefix='editfrontmatter') -> None:
+    """Export a :func:`BatchMetrics.snapshot` as a node_exporter textfile (`*.prom`)"""
+    _atomic_write(path, prometheus_text(snapshot, prefix))
+
+
+class PeriodicExporter(object):
+    """Calls `export(snapshot)` every `interval` seconds in a daemon thread"""
+
+    def __init__(self, metrics, interval, export):
+        """
+        Args:
+            metrics (BatchMetrics): metrics to snapshot
+            interval (float): seconds between exports
+            export (callable): called with each snapshot
+        """
+        self.metrics = metrics
+        self.interval = interval
+        self.export = export
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='metrics-exporter', daemon=True)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.export(self.metrics.snapshot())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Front Matter Operations
+==============================
+
+.. module:: editfrontmatter.operations
+
+:Synopsis: Declarative, template free editing of front matter. A list of
+    operations (set, delete, rename, append, merge) is compiled once into
+    path accessors and then applied directly to
+    :attr:`editfrontmatter.EditFrontMatter.EditFrontMatter.fmatter`.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+
+:Example:
+
+    Operations are plain dictionaries (i.e. loaded from yaml or json)::
+
+        ops = compile_operations([
+            {'op': 'set', 'path': 'params.author', 'value': 'Karl'},
+            {'op': 'delete', 'path': 'deleteme'},
+            {'op': 'rename', 'path': 'catagories', 'to': 'categories'},
+            {'op': 'append', 'path': 'tags', 'value': 'python', 'unique': True},
+            {'op': 'merge', 'path': 'params', 'value': {'toc': True}},
+        ])
+        ops.apply(proc.fmatter)
+
+    A `path` is either a dot separated string (``"params.author"``) or a
+    list of keys (``["params", "a.key.with.dots"]``). Integer components
+    index into lists.
+
+    Paths that can not be applied raise :class:`Operation_Exception`:
+
+    .. testcode::
+
+        from editfrontmatter.operations import compile_operations, Operation_Exception
+
+        fmatter = {'title': 'x', 'tags': ['a'], 'params': None}
+        compile_operations([
+            {'op': 'set', 'path': 'params.author', 'value': 'Karl'},
+            {'op': 'delete', 'path': 'title.sub'},
+            {'op': 'set', 'path': 'tags.0', 'value': 'b'},
+            {'op': 'append', 'path': 'tags', 'value': 'b', 'unique': True},
+            {'op': 'merge', 'path': 'params', 'value': {'toc': True}},
+        ]).apply(fmatter)
+        print(fmatter)
+
+        for spec in ({'op': 'set', 'path': 'tags.3', 'value': 'c'},
+                     {'op': 'set', 'path': 'tags.3.name', 'value': 'c'},
+                     {'op': 'set', 'path': 'title.sub', 'value': 'c'},
+                     {'op': 'delete', 'path': ''}):
+            try:
+                compile_operations([spec]).apply(fmatter)
+            except Operation_Exception as e:
+                print(e)
+
+    .. testoutput::
+
+        {'title': 'x', 'tags': ['b'], 'params': {'author': 'Karl', 'toc': True}}
+        path 'tags.3': list index 3 out of range
+        path 'tags.3.name': list index 3 out of range
+        path 'title.sub': cannot descend into str
+        delete: empty path
+"""
+
+# Imports
+import copy
+
+_IMMUTABLE = (str, bytes, int, float, bool, type(None))
+
+# a missing key or list item (values may be `None`)
+_MISSING = object()
+
+
+class Operation_Exception(Exception):
+    """Raised for an invalid operation specification"""
+    pass
+
+
+class _Value(object):
+    """ An operation argument. Containers are copied on each use so edits of
+    one file never leak into the next. Scalars are returned as is.
+    """
+    __slots__ = ('value', 'mutable')
+
+    def __init__(self, value):
+        self.value = value
+        self.mutable = not isinstance(value, _IMMUTABLE)
+
+    def __call__(self):
+        return copy.deepcopy(self.value) if self.mutable else self.value
+
+
+class Path(object):
+    """A precompiled front matter path accessor"""
+    __slots__ = ('keys', 'text')
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str, list, tuple):
+                dot separated string or sequence of keys
+        """
+        if isinstance(path, str):
+            keys = path.split('.') if path else []
+        else:
+            keys = list(path)
+        self.keys = tuple(keys)
+        self.text = '.'.join(str(k) for k in self.keys)
+
+    def _key(self, node, key):
+        """Resolve `key` against a container (list index or mapping key)"""
+        if isinstance(node, list):
+            try:
+                return int(key)
+            except (TypeError, ValueError):
+                raise Operation_Exception("path '{p}': list index expected, got '{k}'".
+                                          format(p=self.text, k=key))
+        if isinstance(node, dict):
+            # yaml keys like `2019:` are loaded as integers
+            if key not in node and isinstance(key, str) and key.lstrip('-').isdigit() \
+                    and int(key) in node:
+                return int(key)
+            return key
+        raise Operation_Exception("path '{p}': cannot descend into {t}".
+                                  format(p=self.text, t=type(node).__name__))
+
+    def _step(self, node, key, create):
+        """Descend one level. Returns `_MISSING` if the key is missing."""
+        key = self._key(node, key)
+        if isinstance(node, list):
+            if -len(node) <= key < len(node):
+                return node[key]
+            if create:
+                raise Operation_Exception("path '{p}': list index {k} out of range".
+                                          format(p=self.text, k=key))
+            return _MISSING
+        if key not in node:
+            if not create:
+                return _MISSING
+            node[key] = type(node)()
+        elif create and node[key] is None:
+            # `params:` without a value: filled like a missing key
+            node[key] = type(node)()
+        return node[key]
+
+    def parent(self, root, create=False):
+        """ Find the container holding the last path component.
+
+        Args:
+            root (dict): front matter object
+            create (bool): create missing (or `null`) intermediate
+                mappings (for operations that store a value: the last
+                component must then be a key, or the index of an existing
+                list item)
+
+        Returns:
+            * (container, key) tuple
+            * (None, key) if an intermediate element does not exist (or,
+              without `create`, is not a container)
+
+        Throws:
+            :class:`Operation_Exception` (empty path, bad list index; with
+            `create`: path through a scalar, out of range list index)
+        """
+        if not self.keys:
+            raise Operation_Exception("empty path")
+        node = root
+        for key in self.keys[:-1]:
+            node = self._step(node, key, create)
+            if node is _MISSING or not (create or isinstance(node, (dict, list))):
+                return None, self.keys[-1]
+        key = self._key(node, self.keys[-1])
+        if create and isinstance(node, list) and not -len(node) <= key < len(node):
+            raise Operation_Exception("path '{p}': list index {k} out of range".format(p=self.text, k=key))
+        return node, key
+
+    def get(self, root, default=None):
+        """Return the value at the path or `default`"""
+        if not self.keys:
+            return root
+        node, key = self.parent(root)
+        if node is None:
+            return default
+        if isinstance(node, list):
+            return node[key] if isinstance(key, int) and -len(node) <= key < len(node) else default
+        return node.get(key, default)
+
+
+class Operation(object):
+    """Base class for compiled operations"""
+    __slots__ = ('path',)
+    name = None
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def apply(self, fmatter) -> None:
+        raise NotImplementedError
+
+
+class SetOp(Operation):
+    """Set the value at `path`, creating intermediate mappings"""
+    __slots__ = ('value',)
+    name = 'set'
+
+    def __init__(self, path, value):
+        Operation.__init__(self, path)
+        if not self.path.keys:
+            raise Operation_Exception("set: empty path")
+        self.value = _Value(value)
+
+    def apply(self, fmatter) -> None:
+        node, key = self.path.parent(fmatter, create=True)
+        node[key] = self.value()
+
+
+class DeleteOp(Operation):
+    """Delete the key (or list item) at `path` if present"""
+    __slots__ = ()
+    name = 'delete'
+
+    def apply(self, fmatter) -> None:
+        node, key = self.path.parent(fmatter)
+        if node is None:
+            return
+        if isinstance(node, list):
+            if isinstance(key, int) and -len(node) <= key < len(node):
+                del node[key]
+        elif key in node:
+            del node[key]
+
+
+class RenameOp(Operation):
+    """Rename the key at `path` to `to`, preserving its position. An existing
+    `to` key is replaced (its value is discarded)."""
+    __slots__ = ('to',)
+    name = 'rename'
+
+    def __init__(self, path, to):
+        Operation.__init__(self, path)
+        if not self.path.keys:
+            raise Operation_Exception("rename: empty path")
+        self.to = to
+
+    def apply(self, fmatter) -> None:
+        node, key = self.path.parent(fmatter)
+        if not isinstance(node, dict) or key not in node or key == self.to:
+            return
+        # rebuild the mapping to keep the key order (oyaml)
+        items = [(self.to if k == key else k, v) for k, v in node.items() if k != self.to]
+        node.clear()
+        node.update(items)
+
+
+class AppendOp(Operation):
+    """Append `value` to the list at `path`, creating the list if needed"""
+    __slots__ = ('value', 'unique', 'extend')
+    name = 'append'
+
+    def __init__(self, path, value, unique=False, extend=False):
+        Operation.__init__(self, path)
+        if not self.path.keys:
+            raise Operation_Exception("append: empty path")
+        self.value = _Value(value)
+        self.unique = unique
+        self.extend = extend
+
+    def apply(self, fmatter) -> None:
+        node, key = self.path.parent(fmatter, create=True)
+        current = node[key] if (isinstance(node, list) or key in node) else None
+        if current is None:
+            current = node[key] = []
+        elif not isinstance(current, list):
+            # promote a scalar (i.e. `tags: python`) to a list
+            current = node[key] = [current]
+
+        values = self.value() if self.extend else [self.value()]
+        for value in values:
+            if self.unique and value in current:
+                continue
+            current.append(value)
+
+
+class MergeOp(Operation):
+    """Deep merge the mapping `value` into the mapping at `path`"""
+    __slots__ = ('value', 'lists')
+    name = 'merge'
+
+    def __init__(self, path, value, lists='replace'):
+        Operation.__init__(self, path)
+        if not isinstance(value, dict):
+            raise Operation_Exception("merge: value must be a mapping")
+        if lists not in ('replace', 'append'):
+            raise Operation_Exception("merge: lists must be 'replace' or 'append'")
+        self.value = _Value(value)
+        self.lists = lists
+
+    def _merge(self, dst, src) -> None:
+        for key, value in src.items():
+            current = dst.get(key)
+            if isinstance(current, dict) and isinstance(value, dict):
+                self._merge(current, value)
+            elif self.lists == 'append' and isinstance(current, list) and isinstance(value, list):
+                current.extend(value)
+            else:
+                dst[key] = value
+
+    def apply(self, fmatter) -> None:
+        if not self.path.keys:
+            target = fmatter
+        else:
+            node, key = self.path.parent(fmatter, create=True)
+            target = node[key] if (isinstance(node, list) or key in node) else None
+            if not isinstance(target, dict):
+                target = node[key] = type(fmatter)()
+        self._merge(target, self.value())
+
+
+_OPERATIONS = {
+    'set': (SetOp, ('value',), ()),
+    'delete': (DeleteOp, (), ()),
+    'rename': (RenameOp, ('to',), ()),
+    'append': (AppendOp, ('value',), ('unique', 'extend')),
+    'merge': (MergeOp, ('value',), ('lists',)),
+}
+
+
+class Operations(tuple):
+    """An immutable, compiled list of operations"""
+
+    def apply(self, fmatter) -> None:
+        """ Apply every operation, in order, to `fmatter` (in place).
+
+        Args:
+            fmatter (dict): front matter object
+        """
+        for op in self:
+            op.apply(fmatter)
+
+
+def compile_operation(spec) -> Operation:
+    """ Compile a single operation specification.
+
+    Args:
+        spec (dict, Operation):
+            a mapping with an `op` and a `path` key plus the arguments of the
+            operation. Compiled operations are returned as is.
+
+    Throws:
+        :class:`Operation_Exception`
+    """
+    if isinstance(spec, Operation):
+        return spec
+    if not isinstance(spec, dict) or 'op' not in spec:
+        raise Operation_Exception("invalid operation: {spec!r}".format(spec=spec))
+
+    name = spec['op']
+    if name not in _OPERATIONS:
+        raise Operation_Exception("unknown operation '{name}'".format(name=name))
+    cls, required, optional = _OPERATIONS[name]
+
+    kwargs = {}
+    for arg in required:
+        if arg not in spec:
+            raise Operation_Exception("{name}: missing '{arg}'".format(name=name, arg=arg))
+        kwargs[arg] = spec[arg]
+    for arg in optional:
+        if arg in spec:
+            kwargs[arg] = spec[arg]
+    unknown = set(spec) - set(required) - set(optional) - {'op', 'path'}
+    if unknown:
+        raise Operation_Exception("{name}: unexpected {args}".
+                                  format(name=name, args=', '.join(sorted(unknown))))
+    # an empty merge path is the whole front matter
+    path = spec.get('path', '')
+    if not path and name != 'merge':
+        raise Operation_Exception("{name}: empty path".format(name=name))
+
+    return cls(path, **kwargs)
+
+
+def compile_operations(specs) -> Operations:
+    """ Compile a list of operation specifications.
+
+    Args:
+        specs (list): operation mappings (see :func:`compile_operation`)
+
+    Returns:
+        :class:`Operations` (already compiled input is returned as is)
+    """
+    if isinstance(specs, Operations):
+        return specs
+    return Operations(compile_operation(spec) for spec in specs or ())
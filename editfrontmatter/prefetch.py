@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Read-ahead
+==============================
+
+.. module:: editfrontmatter.prefetch
+
+:Synopsis: Page cache hints for :mod:`editfrontmatter.batch` runs on network
+    (NFS) and spinning disk storage, where per file latency is dominated by
+    synchronous open / read round trips.
+
+    :func:`prefetched` runs a read-ahead thread a bounded number of files
+    ahead of the workers. It opens each upcoming file and either issues
+    `posix_fadvise(POSIX_FADV_WILLNEED)` (asynchronous read-ahead by the
+    kernel) or reads the start of the file, so workers find the metadata and
+    the front matter cached. :func:`drop_cache` issues
+    `POSIX_FADV_DONTNEED` once a file is done so a huge batch does not evict
+    the rest of the page cache.
+
+    Without `os.posix_fadvise` (macOS, Windows) `'advise'` falls back to
+    `'read'` and :func:`drop_cache` does nothing.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+
+:Example:
+
+    ::
+
+        for path in prefetched((e.path for e in walk_files(['content/'])), depth=32):
+            ...
+"""
+
+# Imports
+import os
+import queue
+import threading
+
+MODES = ('advise', 'read')
+"""Read-ahead modes of :func:`prefetched`"""
+
+HEADER_BYTES = 16384
+"""Bytes read ahead per file in `'read'` mode (front matter and first pages)"""
+
+_DONE = object()
+
+
+class _Failure(object):
+    """An exception raised by the path iterator, re-raised by the consumer"""
+    __slots__ = ('exc',)
+
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def can_advise() -> bool:
+    """`True` if `posix_fadvise` is available"""
+    return hasattr(os, 'posix_fadvise')
+
+
+def warm(path, mode='advise', header_bytes=HEADER_BYTES) -> None:
+    """ Bring the start of `path` into the page cache. Errors are ignored
+    (they are reported when the file is processed).
+
+    Args:
+        path (str): file path
+        mode (str): one of :data:`MODES`
+        header_bytes (int): bytes read in `'read'` mode
+    """
+    try:
+        if mode == 'advise' and can_advise():
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        else:
+            with open(path, 'rb') as fo:
+                fo.read(header_bytes)
+    except OSError:
+        pass
+
+
+def drop_cache(path, written=False) -> None:
+    """ Tell the kernel the pages of `path` are no longer needed.
+
+    Args:
+        path (str): file path
+        written (bool): the file was just written. Dirty pages can not be
+            dropped, so they are flushed (`fdatasync`) first.
+    """
+    if not can_advise():
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            if written:
+                os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def prefetched(paths, depth=16, mode='advise', header_bytes=HEADER_BYTES):
+    """ Yield `paths` unchanged while a read-ahead thread warms the next
+    `depth` files. Items may also be objects with a `path` attribute
+    (:class:`editfrontmatter.batch.FileEntry`).
+
+    The read-ahead thread also consumes `paths`, so a slow directory walk
+    overlaps with processing. Exceptions raised by `paths` are re-raised by
+    the generator. Closing the generator stops the thread.
+
+    Args:
+        paths (iterable): file paths
+        depth (int): maximum number of files warmed ahead of the consumer
+        mode (str): one of :data:`MODES`
+        header_bytes (int): bytes read per file in `'read'` mode
+
+    Yields:
+        the items of `paths`
+    """
+    if mode not in MODES:
+        raise ValueError("mode must be one of {m}".format(m=', '.join(MODES)))
+    ahead = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(item):
+        # never block forever if the consumer went away
+        while not stop.is_set():
+            try:
+                ahead.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def feed():
+        try:
+            for path in paths:
+                if stop.is_set():
+                    return
+                warm(getattr(path, 'path', path), mode, header_bytes)
+                put(path)
+        except BaseException as e:
+            put(_Failure(e))
+        finally:
+            put(_DONE)
+
+    thread = threading.Thread(target=feed, name='prefetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = ahead.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Rule Based Dispatch
+==============================
+
+.. module:: editfrontmatter.rules
+
+:Synopsis: Apply different edits to different parts of a tree in a single
+    walk. A rules table maps conditions to edits:
+
+    * conditions: `glob` patterns and / or a `regex` matched against the
+      path relative to the rules root (`/` separated, `*` also matches
+      `/`), and front matter predicates: `match` (`{key: value}`, the
+      value equals or is contained in the list under `key`) and / or
+      `where` (a callable taking the front matter).
+    * edit: a Jinja2 template (`template_str`), its `variables`,
+      `keys_toDelete` and declarative `operations`, applied like
+      :func:`editfrontmatter.EditFrontMatter.EditFrontMatter.run`.
+
+    Every matching rule is applied, in table order, to the same parsed
+    front matter: a file is parsed and dumped once whatever the number of
+    rules. Front matter predicates see the edits of the rules before them.
+    A rule with `stop` ends the dispatch for the files it matched.
+
+    :class:`RuleTask` is a :class:`editfrontmatter.batch.BatchTask`, so the
+    rules run on the batch engine (threads or processes; `where` callables
+    must then be module level functions). :func:`RuleTask.select` drops the
+    files no rule can match before they are read.
+
+    Rules files are yaml lists::
+
+        - name: blog
+          glob: blog/**
+          template: blog.j2         # relative to the rules file
+          vars: {section: blog}
+          delete: [draft_notes]
+        - glob: ['*.draft.md']
+          match: {draft: true}
+          operations:
+            - {op: set, path: params.hidden, value: true}
+          stop: true
+        - regex: '^docs/(api|guide)/'
+          template_str: "section: docs\\n"
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+
+:Example:
+
+    ::
+
+        task = RuleTask(load_rules('rules.yaml'), root='content', write=True)
+        Batch(task=task, jobs=4).run(task.select(walk_files(['content'])))
+
+    From a shell::
+
+        editfrontmatter --rules rules.yaml -w content/
+"""
+
+# Imports
+import os
+import re
+import fnmatch
+
+from .EditFrontMatter import EditFrontMatter
+from .batch import BatchTask
+from .operations import compile_operations
+
+
+def _contains(fmatter, key, value) -> bool:
+    """`fmatter[key]` equals `value` or is a list containing it"""
+    if not isinstance(fmatter, dict) or key not in fmatter:
+        return False
+    current = fmatter[key]
+    if current == value:
+        return True
+    return isinstance(current, list) and value in current
+
+
+class Rule(object):
+    """One entry of a rules table"""
+
+    def __init__(self, *, name=None, glob=None, regex=None, match=None, where=None, template_str="",
+                 variables=None, keys_toDelete=(), operations=None, stop=False):
+        """
+        Args:
+            name (str): label used in error messages
+            glob (str, list): path patterns (any of them)
+            regex (str): path regular expression (`re.search`)
+            match (dict): {key: value} front matter conditions (all of them)
+            where (callable): front matter predicate
+            template_str (str): Jinja2 template
+            variables (dict): template variables
+            keys_toDelete (list): keys to delete
+            operations (list): declarative edits, see :mod:`editfrontmatter.operations`
+            stop (bool): [default: False] do not apply the following rules
+                to matched files
+
+        Throws:
+            ValueError, re.error,
+            :class:`editfrontmatter.operations.Operation_Exception`
+        """
+        if isinstance(glob, str):
+            glob = [glob]
+        self.name = name
+        self.glob = list(glob or ())
+        self.regex = regex
+        self.match = dict(match or {})
+        self.where = where
+        self.template_str = template_str
+        self.variables = dict(variables or {})
+        self.keys_toDelete = list(keys_toDelete)
+        self.operations = compile_operations(operations) if operations else None
+        self.stop = stop
+
+        patterns = ['(?:{p})'.format(p=fnmatch.translate(p)) for p in self.glob]
+        self._glob_re = re.compile('|'.join(patterns)) if patterns else None
+        self._regex = re.compile(regex) if regex else None
+
+    def __repr__(self):
+        return "Rule({n!r})".format(n=self.name)
+
+    def matches_path(self, rel_path) -> bool:
+        """`True` if the path conditions hold for `rel_path` (`/` separated)"""
+        if self._glob_re is not None and not self._glob_re.match(rel_path):
+            return False
+        if self._regex is not None and not self._regex.search(rel_path):
+            return False
+        return True
+
+    def matches_fmatter(self, fmatter) -> bool:
+        """`True` if the front matter conditions hold"""
+        for key, value in self.match.items():
+            if not _contains(fmatter, key, value):
+                return False
+        return self.where is None or bool(self.where(fmatter))
+
+
+def load_rules(path) -> list:
+    """ Load a rules file (see the module documentation).
+
+    Keys of each entry: `name`, `glob`, `regex`, `match`, `template` (a
+    file, relative to the rules file) or `template_str`, `vars`, `delete`,
+    `operations` and `stop`.
+
+    Returns:
+        list of :class:`Rule`
+
+    Throws:
+        ValueError, OSError
+    """
+    import oyaml as yaml
+    with open(path, "r") as fo:
+        entries = yaml.load(fo, Loader=yaml.FullLoader) or []
+    if not isinstance(entries, list):
+        raise ValueError("{p}: expected a list of rules".format(p=path))
+    known = {'name', 'glob', 'regex', 'match', 'template', 'template_str', 'vars', 'delete',
+             'operations', 'stop'}
+    rules = []
+    for n, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict) or set(entry) - known:
+            raise ValueError("{p}: rule {n}: expected a mapping of {k}".format(
+                p=path, n=n, k=', '.join(sorted(known))))
+        template_str = entry.get('template_str') or ""
+        if entry.get('template'):
+            with open(os.path.join(os.path.dirname(path), entry['template']), "r") as fo:
+                template_str = fo.read()
+        rules.append(Rule(name=entry.get('name') or "rule {n}".format(n=n), glob=entry.get('glob'),
+                          regex=entry.get('regex'), match=entry.get('match'),
+                          template_str=template_str, variables=entry.get('vars'),
+                          keys_toDelete=entry.get('delete') or (), operations=entry.get('operations'),
+                          stop=bool(entry.get('stop'))))
+    return rules
+
+
+class RuleEditor(EditFrontMatter):
+    """:class:`editfrontmatter.EditFrontMatter.EditFrontMatter` applying a
+    list of rules in :func:`run`
+
+    Attributes:
+        self.rules (list): :class:`Rule` objects whose path conditions hold
+        self.applied (list): names of the rules applied by the last :func:`run`
+    """
+
+    rules = ()
+    applied = ()
+
+    def run(self, extraVars_dict={}, *args, **kwargs) -> None:
+        """Apply every rule whose front matter conditions hold, in order (see
+        :func:`editfrontmatter.EditFrontMatter.EditFrontMatter.run`)"""
+        self.applied = []
+        for rule in self.rules:
+            if not rule.matches_fmatter(self.fmatter):
+                continue
+            self.template_str = rule.template_str
+            self.keys_toDelete = rule.keys_toDelete
+            self.operations = rule.operations
+            variables = dict(extraVars_dict, **rule.variables) if rule.variables else extraVars_dict
+            super().run(variables)
+            self.applied.append(rule.name)
+            if rule.stop:
+                break
+
+
+class RuleTask(BatchTask):
+    """A :class:`editfrontmatter.batch.BatchTask` dispatching files to rules"""
+
+    processor_class = RuleEditor
+
+    def __init__(self, rules, *, root=None, **options):
+        """
+        Args:
+            rules (list): :class:`Rule` objects, in order
+            root (str): [default: the current directory] directory path
+                conditions are relative to
+            options: read / write options of
+                :class:`editfrontmatter.batch.BatchTask` (`extraVars_dict`
+                are passed to every rule)
+
+        Throws:
+            ValueError (the options contain an edit)
+        """
+        if options.get('template_str') or options.get('keys_toDelete') or options.get('operations'):
+            raise ValueError("the edits of a RuleTask are given by its rules")
+        super().__init__(**options)
+        self.rules = list(rules)
+        self.root = os.path.abspath(root or os.curdir)
+
+    def _relative(self, path) -> str:
+        return os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, '/')
+
+    def rules_for(self, path) -> list:
+        """ Rules whose path conditions hold for `path`.
+
+        Returns:
+            list of :class:`Rule`
+        """
+        rel_path = self._relative(path)
+        return [rule for rule in self.rules if rule.matches_path(rel_path)]
+
+    def select(self, entries):
+        """ Drop the entries no rule can match (they are not read).
+
+        Args:
+            entries (iterable): :class:`editfrontmatter.batch.FileEntry` objects (or paths)
+
+        Yields:
+            the remaining entries
+        """
+        for entry in entries:
+            if self.rules_for(getattr(entry, 'path', entry)):
+                yield entry
+
+    def environment(self):
+        """The Jinja2 environment if a rule has a template"""
+        if not any(rule.template_str for rule in self.rules):
+            return None
+        return self._environment()
+
+    def processor(self, file_path=None, do_readFile=True, observer=None) -> RuleEditor:
+        """See :func:`editfrontmatter.batch.BatchTask.processor`"""
+        proc = super().processor(file_path, do_readFile, observer)
+        if file_path is not None:
+            proc.rules = self.rules_for(file_path)
+        return proc
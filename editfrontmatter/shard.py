@@ -0,0 +1,651 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Sharded Runs
+==============================
+
+.. module:: editfrontmatter.shard
+
+:Synopsis: Split a corpus across machines (or processes) without
+    coordination. Every shard walks the same tree and keeps its own part of
+    it:
+
+    * `hash` balance: a file belongs to shard `1 + h % N` where `h` is a
+      stable hash (sha256) of its path relative to the shard root, with
+      `/` separators. Shards are disjoint, cover the tree, balance the
+      number of files and do not depend on the machine, the walk order or
+      the python hash seed. Files keep their shard when others are added.
+    * `size` balance: files are assigned largest first to the shard with
+      the least bytes so far (ties broken by the relative path, then the
+      shard number). Sizes change as shards edit files, so the assignment
+      is computed once, before the run, by one walk: a shard plan
+      (:func:`make_plan`, :func:`write_plan`, `editfrontmatter-shard
+      plan`) that every shard reads. Files added after the plan was made
+      are assigned by hash.
+
+    A plan can also be made for `hash` balance: :func:`merge_manifests`
+    then reports the files of the plan that no shard processed.
+
+    Each shard writes a result manifest (:class:`Manifest`, json lines: a
+    header, one record per file, a summary). :func:`merge_manifests`
+    combines the manifests of a run into one report and checks that the
+    shards are complete, disjoint and ran the same edit;
+    :func:`merge_metrics` combines their metrics snapshots (see
+    :mod:`editfrontmatter.metrics`).
+
+    `editfrontmatter-shard run` plans N shards of one tree, runs them as
+    local processes and merges their output, which is also the way to test a sharded
+    setup on a single machine.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+
+:Example:
+
+    ::
+
+        entries = shard_entries(walk_files(['content/']), 2, 4, root='content/')
+        with Manifest('shard-2.jsonl', shard=(2, 4)) as manifest:
+            report = Batch(task=task, jobs=4).run(entries, on_result=manifest.record)
+            manifest.summary(report)
+
+    From a shell, on node `i` of 4::
+
+        editfrontmatter-shard plan -n 4 --balance size -o plan.jsonl content/     # once
+        editfrontmatter -t template.j2 -w --shard i/4 --shard-balance size --shard-plan plan.jsonl \\
+            --manifest shard-i.jsonl --metrics-json metrics-i.json content/
+        editfrontmatter-shard merge shard-*.jsonl --plan plan.jsonl --metrics metrics-*.json -o report.json
+
+    Or 4 local processes::
+
+        editfrontmatter-shard run -n 4 --dir shards/ -- -t template.j2 -w content/
+
+    Shards are disjoint and cover the tree in both balances, also when
+    each shard grows the files it edits before the next one walks:
+
+    .. testcode::
+
+        import os
+        import tempfile
+        from editfrontmatter.batch import walk_files
+        from editfrontmatter.shard import make_plan, read_plan, shard_entries, write_plan
+
+        top = tempfile.mkdtemp()
+        for n in range(20):
+            with open(os.path.join(top, 'doc{n:02}.md'.format(n=n)), 'w') as fo:
+                fo.write('---\\ntitle: {n}\\n---\\n'.format(n=n) + 'x' * 100 * n)
+        paths = set(entry.path for entry in walk_files([top]))
+
+        for balance in ('hash', 'size'):
+            plan_path = os.path.join(top, balance + '.plan')
+            write_plan(plan_path, make_plan(walk_files([top]), 3, root=top, balance=balance), 3, balance)
+            header, assignments = read_plan(plan_path)
+            shards = []
+            for index in (1, 2, 3):
+                entries = shard_entries(walk_files([top]), index, 3, root=top, balance=balance,
+                                        plan=assignments)
+                shards.append(set(entry.path for entry in entries))
+                for path in shards[-1]:
+                    with open(path, 'a') as fo:
+                        fo.write('y' * 5000)
+            print(balance, sum(len(shard) for shard in shards) == len(paths), set.union(*shards) == paths)
+
+        try:
+            list(shard_entries(walk_files([top]), 1, 3, root=top, balance='size'))
+        except ValueError as e:
+            print(e)
+
+    .. testoutput::
+
+        hash True True
+        size True True
+        size balance needs a shard plan made before the run
+
+    .. testcleanup::
+
+        import shutil
+        shutil.rmtree(top)
+"""
+
+# Imports
+import os
+import sys
+import json
+import heapq
+import argparse
+
+MANIFEST_VERSION = 1
+
+PLAN_VERSION = 1
+
+BALANCES = ('hash', 'size')
+"""Shard assignment policies (see the module documentation)"""
+
+
+def parse_shard(text) -> tuple:
+    """ Parse a `i/N` shard specification (`1 <= i <= N`).
+
+    Returns:
+        (i, N)
+
+    Throws:
+        ValueError
+    """
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError("shard must be i/N, e.g. 1/4: {t!r}".format(t=text)) from None
+    if not 1 <= index <= count:
+        raise ValueError("shard must be i/N with 1 <= i <= N: {t!r}".format(t=text))
+    return index, count
+
+
+def relative_path(path, root) -> str:
+    """`path` relative to `root`, `/` separated (the sharding key)"""
+    return os.path.relpath(os.path.abspath(path), root).replace(os.sep, '/')
+
+
+def shard_of(rel_path, count) -> int:
+    """Shard number (1 to `count`) of a relative path in `hash` balance"""
+    import hashlib
+    digest = hashlib.sha256(rel_path.encode('utf-8', 'surrogateescape')).digest()
+    return 1 + int.from_bytes(digest[:8], 'big') % count
+
+
+def _size_assignment(keyed, count) -> list:
+    """Shard of each `(size, rel_path)` pair, largest first to the least
+    loaded shard"""
+    order = sorted(range(len(keyed)), key=lambda n: (-keyed[n][0], keyed[n][1]))
+    loads = [(0, shard) for shard in range(1, count + 1)]
+    shards = [0] * len(keyed)
+    for n in order:
+        load, shard = heapq.heappop(loads)
+        shards[n] = shard
+        heapq.heappush(loads, (load + keyed[n][0], shard))
+    return shards
+
+
+def make_plan(entries, count, *, root=None, balance='size') -> list:
+    """ Assign every file of a walk to a shard.
+
+    Args:
+        entries (iterable): :class:`editfrontmatter.batch.FileEntry` objects (or paths)
+        count (int): number of shards
+        root (str): [default: the current directory] directory paths are
+            relative to
+        balance (str): [default: 'size'] one of :data:`BALANCES`
+
+    Returns:
+        list of `(relative path, shard)` in walk order
+
+    Throws:
+        ValueError
+    """
+    if balance not in BALANCES:
+        raise ValueError("balance must be one of {b}".format(b=', '.join(BALANCES)))
+    root = os.path.abspath(root or os.curdir)
+    keyed = [(getattr(entry, 'size', 0), relative_path(getattr(entry, 'path', entry), root))
+             for entry in entries]
+    if balance == 'hash':
+        return [(rel_path, shard_of(rel_path, count)) for _, rel_path in keyed]
+    return list(zip((rel_path for _, rel_path in keyed), _size_assignment(keyed, count)))
+
+
+def write_plan(path, plan, count, balance='size') -> str:
+    """ Write a plan of :func:`make_plan` (json lines: a header, then one
+    `[relative path, shard]` array per file).
+
+    Returns:
+        the plan id (a hash of the assignments), recorded in the manifests
+    """
+    import hashlib
+    lines = [json.dumps(item, ensure_ascii=False) + '\n' for item in plan]
+    digest = hashlib.sha256()
+    for line in lines:
+        digest.update(line.encode('utf-8', 'surrogateescape'))
+    plan_id = digest.hexdigest()[:32]
+    with open(path, 'w', encoding='utf-8') as fo:
+        fo.write(json.dumps({'plan': PLAN_VERSION, 'id': plan_id, 'shards': count, 'balance': balance,
+                             'files': len(lines)}) + '\n')
+        fo.writelines(lines)
+    return plan_id
+
+
+def read_plan(path) -> tuple:
+    """ Load a plan written by :func:`write_plan`.
+
+    Returns:
+        (header dict, {relative path: shard})
+
+    Throws:
+        ValueError, OSError
+    """
+    with open(path, encoding='utf-8') as fo:
+        try:
+            header = json.loads(fo.readline())
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or header.get('plan') != PLAN_VERSION:
+            raise ValueError("{p}: not a shard plan".format(p=path))
+        assignments = dict(json.loads(line) for line in fo)
+    if len(assignments) != header['files']:
+        raise ValueError("{p}: truncated shard plan".format(p=path))
+    return header, assignments
+
+
+def shard_entries(entries, index, count, *, root=None, balance='hash', plan=None):
+    """ Keep the entries of shard `index` of `count`.
+
+    Args:
+        entries (iterable): :class:`editfrontmatter.batch.FileEntry` objects (or paths)
+        index (int): shard number, 1 to `count`
+        count (int): number of shards
+        root (str): [default: the current directory] directory paths are
+            relative to
+        balance (str): [default: 'hash'] one of :data:`BALANCES`. `size`
+            needs a `plan`.
+        plan (dict): {relative path: shard} assignments of
+            :func:`read_plan`. Files missing from the plan (added since)
+            are assigned by hash.
+
+    Yields:
+        the entries of the shard, in walk order
+
+    Throws:
+        ValueError
+    """
+    if balance not in BALANCES:
+        raise ValueError("balance must be one of {b}".format(b=', '.join(BALANCES)))
+    if balance == 'size' and plan is None:
+        # sizes read by each shard change as other shards edit files
+        raise ValueError("size balance needs a shard plan made before the run")
+    if not 1 <= index <= count:
+        raise ValueError("shard must be between 1 and {n}".format(n=count))
+    root = os.path.abspath(root or os.curdir)
+    plan = plan or {}
+
+    for entry in entries:
+        rel_path = relative_path(getattr(entry, 'path', entry), root)
+        shard = plan.get(rel_path)
+        if shard is None:
+            shard = shard_of(rel_path, count)
+        if shard == index:
+            yield entry
+
+
+class Manifest(object):
+    """Json lines record of the results of one shard"""
+
+    def __init__(self, path, *, shard=None, balance='hash', signature=None, root=None, plan=None):
+        """
+        Args:
+            path (str): manifest file
+            shard (tuple): (i, N) or `None` for an unsharded run
+            balance (str): [default: 'hash'] shard assignment policy
+            signature (str): identifies the edit (shards of one run must
+                share it)
+            root (str): [default: the current directory] shard root:
+                records also hold the path relative to it (`key`), which
+                does not depend on where the tree is mounted
+            plan (str): id of the shard plan (see :func:`write_plan`)
+
+        Throws:
+            OSError
+        """
+        self.path = path
+        self.root = os.path.abspath(root or os.curdir)
+        self._fo = open(path, 'w', encoding='utf-8')
+        self._write({'manifest': MANIFEST_VERSION, 'shard': list(shard) if shard else None,
+                     'balance': balance, 'signature': signature, 'plan': plan})
+
+    def _write(self, record) -> None:
+        self._fo.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def record(self, result) -> None:
+        """Add the :class:`editfrontmatter.batch.FileResult` of a processed file"""
+        record = {'path': result.path, 'key': relative_path(result.path, self.root),
+                  'status': result.status, 'size': result.size, 'elapsed': result.elapsed}
+        if result.digest is not None:
+            record['digest'] = result.digest
+        if result.error is not None:
+            record['error'] = result.error.as_dict()
+        self._write(record)
+
+    def summary(self, report, **extra) -> None:
+        """ Close the manifest with the totals of a run.
+
+        Args:
+            report (BatchReport): the report of the shard
+            extra: additional summary members (e.g. `stopped`)
+        """
+        summary = {'files': report.files, 'status': dict(report.counts), 'elapsed': report.elapsed}
+        summary.update(extra)
+        self._write({'summary': summary})
+
+    def close(self) -> None:
+        self._fo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _ratio(values) -> float:
+    """Largest value over the mean (1.0: perfectly balanced)"""
+    mean = sum(values) / len(values) if values else 0
+    return max(values) / mean if mean else 1.0
+
+
+def merge_manifests(paths, plan=None) -> dict:
+    """ Combine the manifests of the shards of a run.
+
+    Args:
+        paths (list): manifest files
+        plan (str): shard plan file of the run (see :func:`write_plan`):
+            the files of the plan that no shard processed are reported
+
+    Returns:
+        dict (json serializable): `shards`, `files`, `bytes`, `status`,
+        `elapsed` (slowest shard), `per_shard` (files, bytes, elapsed per
+        shard), `imbalance` (largest over mean of files, bytes and
+        elapsed), `errors` (error records), `missing` (shard numbers
+        without a manifest), `incomplete` (shards that did not finish or
+        were stopped), `duplicates` (paths processed by more than one
+        shard) and, with a `plan`, `uncovered` (paths of the plan no shard
+        processed)
+
+    Throws:
+        ValueError (not manifests, shards of different runs), OSError
+    """
+    run = count = None
+    seen = set()
+    duplicates = []
+    errors = []
+    status = {}
+    per_shard = {}
+    incomplete = []
+    for path in paths:
+        with open(path, encoding='utf-8') as fo:
+            try:
+                header = json.loads(fo.readline())
+            except ValueError:
+                header = None
+            if not isinstance(header, dict) or header.get('manifest') != MANIFEST_VERSION:
+                raise ValueError("{p}: not a manifest".format(p=path))
+            index, shards = header['shard'] or (1, 1)
+            if run is None:
+                count = shards
+                run = (shards, header['signature'], header['balance'], header.get('plan'))
+            elif (shards, header['signature'], header['balance'], header.get('plan')) != run:
+                raise ValueError("{p}: shard {i}/{n} of a different run".format(p=path, i=index, n=shards))
+            if index in per_shard:
+                raise ValueError("{p}: shard {i}/{n} given twice".format(p=path, i=index, n=shards))
+            shard = per_shard[index] = {'files': 0, 'bytes': 0, 'elapsed': None}
+
+            for line in fo:
+                if not line.endswith('\n'):
+                    break       # torn write of an interrupted shard
+                record = json.loads(line)
+                if 'summary' in record:
+                    if not record['summary'].get('stopped'):
+                        shard['elapsed'] = record['summary']['elapsed']
+                    continue
+                shard['files'] += 1
+                shard['bytes'] += record['size']
+                status[record['status']] = status.get(record['status'], 0) + 1
+                if 'error' in record:
+                    errors.append(record['error'])
+                key = record.get('key', record['path'])
+                if key in seen:
+                    duplicates.append(key)
+                seen.add(key)
+            if shard['elapsed'] is None:
+                incomplete.append(index)
+
+    uncovered = []
+    if plan is not None:
+        header, assignments = read_plan(plan)
+        if run is not None and header['id'] != run[3]:
+            raise ValueError("{p}: the shards did not run with this plan".format(p=plan))
+        uncovered = [key for key in assignments if key not in seen]
+
+    shards = [per_shard[i] for i in sorted(per_shard)]
+    return {
+        'shards': count or 0,
+        'balance': run and run[2],
+        'signature': run and run[1],
+        'plan': run and run[3],
+        'files': sum(s['files'] for s in shards),
+        'bytes': sum(s['bytes'] for s in shards),
+        'status': status,
+        'elapsed': max((s['elapsed'] or 0.0 for s in shards), default=0.0),
+        'per_shard': {str(i): per_shard[i] for i in sorted(per_shard)},
+        'imbalance': {name: _ratio([s[name] or 0 for s in shards]) for name in ('files', 'bytes', 'elapsed')},
+        'errors': errors,
+        'missing': [i for i in range(1, (count or 0) + 1) if i not in per_shard],
+        'incomplete': incomplete,
+        'duplicates': duplicates,
+        'uncovered': uncovered,
+    }
+
+
+def merge_metrics(snapshots) -> dict:
+    """ Combine the :func:`editfrontmatter.metrics.BatchMetrics.snapshot` of
+    shards that ran concurrently.
+
+    Counts, bytes and workers are summed; `wall_seconds` is the slowest
+    shard and throughput is computed over it. Latency `max` and `mean` are
+    exact; the percentiles are the largest of the shards (an upper bound:
+    snapshots do not keep the distributions).
+
+    Args:
+        snapshots (list): metrics snapshots (dicts)
+
+    Returns:
+        dict, in the snapshot format
+    """
+    def total(name):
+        return sum(s[name] for s in snapshots)
+
+    def summed(name):
+        merged = {}
+        for snapshot in snapshots:
+            for key, value in snapshot[name].items():
+                merged[key] = merged.get(key, 0) + value
+        return merged
+
+    files = total('files')
+    wall = max((s['wall_seconds'] for s in snapshots), default=0.0)
+    workers = total('workers')
+    busy = sum(s['worker_utilization'] * s['wall_seconds'] * s['workers'] for s in snapshots)
+    latency = {}
+    for snapshot in snapshots:
+        for key, value in snapshot['latency_seconds'].items():
+            latency[key] = max(latency.get(key, 0.0), value)
+    latency['mean'] = (sum(s['latency_seconds']['mean'] * s['files'] for s in snapshots) / files
+                       if files else 0.0)
+    return {
+        'files': files,
+        'bytes': total('bytes'),
+        'wall_seconds': wall,
+        'files_per_second': files / wall if wall else 0.0,
+        'bytes_per_second': total('bytes') / wall if wall else 0.0,
+        'latency_seconds': latency,
+        'status': summed('status'),
+        'skipped': total('skipped'),
+        'unchanged': total('unchanged'),
+        'errors': total('errors'),
+        'error_classes': summed('error_classes'),
+        'workers': workers,
+        'worker_utilization': min(1.0, busy / (wall * workers)) if wall and workers else 0.0,
+        'shards': len(snapshots),
+    }
+
+
+def merge(manifests, metrics=(), output=None, metrics_json=None, metrics_prom=None, plan=None) -> int:
+    """ `merge` command: write the merged report and print a summary.
+
+    Returns:
+        * 0 if the shards completed without error
+        * 1 if files failed, shards are missing, incomplete or overlap, or
+          files of the plan were not processed
+    """
+    report = merge_manifests(manifests, plan)
+    if metrics:
+        from . import metrics as metrics_module
+        snapshots = []
+        for path in metrics:
+            with open(path, encoding='utf-8') as fo:
+                snapshots.append(json.load(fo))
+        report['metrics'] = merge_metrics(snapshots)
+        if metrics_json:
+            metrics_module.write_json(report['metrics'], metrics_json)
+        if metrics_prom:
+            metrics_module.write_prometheus(report['metrics'], metrics_prom)
+
+    text = json.dumps(report, indent=2, sort_keys=True) + '\n'
+    if output:
+        with open(output, 'w', encoding='utf-8') as fo:
+            fo.write(text)
+    else:
+        sys.stdout.write(text)
+
+    print("shards: {n} ({b} balance)".format(n=report['shards'], b=report['balance']), file=sys.stderr)
+    print("number of files: {n}".format(n=report['files']), file=sys.stderr)
+    for status, count in sorted(report['status'].items()):
+        print("  {status}: {count}".format(status=status, count=count), file=sys.stderr)
+    print("elapsed: {t:.3f}s (slowest shard)".format(t=report['elapsed']), file=sys.stderr)
+    print("imbalance (max / mean): files {files:.2f}, bytes {bytes:.2f}, elapsed {elapsed:.2f}".format(
+        **report['imbalance']), file=sys.stderr)
+    for name in ('missing', 'incomplete'):
+        if report[name]:
+            print("{name} shards: {s}".format(name=name, s=', '.join(map(str, report[name]))), file=sys.stderr)
+    if report['duplicates']:
+        print("files in more than one shard: {n}".format(n=len(report['duplicates'])), file=sys.stderr)
+    if report['uncovered']:
+        print("files of the plan in no shard: {n}".format(n=len(report['uncovered'])), file=sys.stderr)
+    failed = any(report[name] for name in ('errors', 'missing', 'incomplete', 'duplicates', 'uncovered'))
+    return 1 if failed else 0
+
+
+def plan(count, paths, output, *, include=('*.md',), exclude=(), root=None, balance='size') -> int:
+    """ `plan` command: walk `paths` once and write the shard plan.
+
+    Returns:
+        0
+    """
+    from .batch import walk_files
+
+    if root is None and len(paths) == 1 and os.path.isdir(paths[0]):
+        root = paths[0]
+    assignments = make_plan(walk_files(paths, include=include, exclude=exclude), count, root=root,
+                            balance=balance)
+    write_plan(output, assignments, count, balance)
+    print("shard plan: {f} files in {n} shards ({b} balance)".format(
+        f=len(assignments), n=count, b=balance), file=sys.stderr)
+    return 0
+
+
+def run_local(count, directory, cli_args, balance='hash') -> int:
+    """ `run` command: plan `count` shards of `editfrontmatter cli_args`, run
+    them as local processes, then merge their manifests and metrics into
+    `directory`/report.json.
+
+    Returns:
+        the exit status of :func:`merge`, or the first failing shard status
+        if a shard could not run
+    """
+    import subprocess
+    from .cli import build_parser
+
+    args = build_parser().parse_args(cli_args)
+    os.makedirs(directory, exist_ok=True)
+    plan_path = os.path.join(directory, 'plan.jsonl')
+    plan(count, args.paths, plan_path, include=args.include or ('*.md',), exclude=args.exclude,
+         root=args.shard_root, balance=balance)
+    manifests = []
+    metrics = []
+    procs = []
+    for index in range(1, count + 1):
+        manifests.append(os.path.join(directory, 'shard-{i}.jsonl'.format(i=index)))
+        metrics.append(os.path.join(directory, 'metrics-{i}.json'.format(i=index)))
+        command = [sys.executable, '-m', 'editfrontmatter.cli'] + list(cli_args) + [
+            '--shard', '{i}/{n}'.format(i=index, n=count), '--shard-balance', balance,
+            '--shard-plan', plan_path, '--manifest', manifests[-1], '--metrics-json', metrics[-1],
+            '--quiet']
+        procs.append(subprocess.Popen(command, stdout=subprocess.DEVNULL))
+    statuses = [proc.wait() for proc in procs]
+    for index, status in enumerate(statuses, 1):
+        print("shard {i}/{n}: exit status {s}".format(i=index, n=count, s=status), file=sys.stderr)
+    if any(status not in (0, 1) for status in statuses):
+        return next(status for status in statuses if status not in (0, 1))
+    return merge(manifests, metrics, output=os.path.join(directory, 'report.json'), plan=plan_path)
+
+
+def main(argv=None) -> int:
+    """ Entry point of the `editfrontmatter-shard` console script.
+
+    Returns:
+        see :func:`merge` and :func:`run_local`; 2 on usage errors
+    """
+    parser = argparse.ArgumentParser(prog='editfrontmatter-shard',
+                                     description='Plan, merge or run sharded editfrontmatter runs.')
+    commands = parser.add_subparsers(dest='command')
+    plan_parser = commands.add_parser('plan', help='assign the files of a tree to shards, before the run')
+    plan_parser.add_argument('paths', nargs='+', metavar='PATH', help='files and/or directories')
+    plan_parser.add_argument('-n', '--shards', type=int, required=True, metavar='N')
+    plan_parser.add_argument('-o', '--output', required=True, metavar='FILE', help='plan file')
+    plan_parser.add_argument('--balance', choices=BALANCES, default='size')
+    plan_parser.add_argument('--root', metavar='DIR',
+                             help='shard root (default: the PATH if it is a single directory, '
+                                  'else the current directory)')
+    plan_parser.add_argument('--include', action='append', metavar='GLOB', help='default: *.md')
+    plan_parser.add_argument('--exclude', action='append', default=[], metavar='GLOB')
+    merge_parser = commands.add_parser('merge', help='combine shard manifests and metrics into one report')
+    merge_parser.add_argument('manifests', nargs='+', metavar='MANIFEST',
+                              help='--manifest files of the shards')
+    merge_parser.add_argument('--metrics', nargs='+', default=[], metavar='FILE',
+                              help='--metrics-json files of the shards')
+    merge_parser.add_argument('--plan', metavar='FILE',
+                              help='shard plan of the run: report the files no shard processed')
+    merge_parser.add_argument('-o', '--output', metavar='FILE', help='report file (default: stdout)')
+    merge_parser.add_argument('--metrics-json', metavar='FILE', help='write the merged metrics as json')
+    merge_parser.add_argument('--metrics-prom', metavar='FILE',
+                              help='write the merged metrics as a Prometheus textfile')
+    run_parser = commands.add_parser('run', help='plan N shards, run them as local processes, then merge')
+    run_parser.add_argument('-n', '--shards', type=int, required=True, metavar='N')
+    run_parser.add_argument('--dir', default='.', metavar='DIR',
+                            help='plan, manifests, metrics and report.json (default: %(default)s)')
+    run_parser.add_argument('--balance', choices=BALANCES, default='hash')
+    run_parser.add_argument('cli_args', nargs=argparse.REMAINDER, metavar='-- ARGS',
+                            help='editfrontmatter arguments (edit and PATHs)')
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        parser.error("give a command: plan, merge or run")
+    try:
+        if args.command == 'plan':
+            if args.shards < 1:
+                plan_parser.error("give N >= 1")
+            return plan(args.shards, args.paths, args.output, include=args.include or ('*.md',),
+                        exclude=args.exclude, root=args.root, balance=args.balance)
+        if args.command == 'merge':
+            return merge(args.manifests, args.metrics, args.output, args.metrics_json, args.metrics_prom,
+                         args.plan)
+        cli_args = args.cli_args[1:] if args.cli_args[:1] == ['--'] else args.cli_args
+        if args.shards < 1 or not cli_args:
+            run_parser.error("give N >= 1 and the editfrontmatter arguments after --")
+        return run_local(args.shards, args.dir, cli_args, args.balance)
+    except (OSError, ValueError) as e:
+        print("Error: {e}".format(e=e), file=sys.stderr)
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stream Filter
+==============================
+
+.. module:: editfrontmatter.stream
+
+:Synopsis: Edit front matter of documents flowing through a pipe, before
+    anything touches the disk. Documents are read from a binary stream
+    (stdin), edited with :func:`editfrontmatter.batch.process_document`
+    (one reusable object per worker, not one per document) and written in
+    input order to another stream (stdout).
+
+    Record formats (:data:`FORMATS`):
+
+    * `nul`: documents separated by NUL bytes (`\\0`), e.g. `find -print0`
+      style producers. Output records are NUL terminated.
+    * `length`: each document is preceded by its size in bytes as ASCII
+      digits and a newline (`b"42\\n"` + 42 bytes).
+    * `jsonl`: one json object per line, `{"path": ..., "content": ...}`.
+      Output lines are `{"path", "content", "status"}` plus `"error"` for
+      failed documents.
+
+    Documents without a path are named `<stdin>:N` (record number) in
+    results and error reports. `nul` and `length` documents are edited as
+    bytes: bodies are passed through untouched. At most `window` documents
+    are buffered; with several workers documents are edited in parallel
+    and still emitted in order.
+
+:Platform: Unix, Windows, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+
+:Example:
+
+    ::
+
+        generate-posts | editfrontmatter --stream jsonl --operations ops.yaml -j 4 > edited.jsonl
+"""
+
+# Imports
+import json
+import time
+from collections import deque
+
+from .batch import BatchReport, process_document
+from ._lazy import LazyModule
+
+futures = LazyModule('concurrent.futures')
+
+FORMATS = ('nul', 'length', 'jsonl')
+"""Supported record formats"""
+
+READ_SIZE = 65536
+
+
+def read_records(fo, fmt):
+    """ Read documents from the binary stream `fo`.
+
+    Args:
+        fo (file): binary input stream
+        fmt (str): one of :data:`FORMATS`
+
+    Yields:
+        (path, document): `path` is `None` unless given by a `jsonl` record
+
+    Throws:
+        ValueError on malformed input
+    """
+    if fmt == 'nul':
+        pending = b""
+        while True:
+            chunk = fo.read(READ_SIZE)
+            if not chunk:
+                break
+            records = (pending + chunk).split(b"\0")
+            pending = records.pop()
+            for record in records:
+                yield None, record
+        if pending:
+            yield None, pending
+    elif fmt == 'length':
+        number = 0
+        while True:
+            header = fo.readline()
+            if not header:
+                break
+            number += 1
+            try:
+                size = int(header)
+            except ValueError:
+                raise ValueError("record {n}: bad length header {h!r}".format(n=number, h=header[:40])) from None
+            record = fo.read(size)
+            if len(record) != size:
+                raise ValueError("record {n}: truncated ({r} of {s} bytes)".format(
+                    n=number, r=len(record), s=size))
+            yield None, record
+    elif fmt == 'jsonl':
+        for number, line in enumerate(fo, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line.decode('utf-8'))
+                yield record.get('path'), record['content']
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                raise ValueError("line {n}: expected {{\"path\", \"content\"}}: {e}".format(n=number, e=e)) from None
+    else:
+        raise ValueError("format must be one of {f}".format(f=', '.join(FORMATS)))
+
+
+def write_record(fo, fmt, result) -> None:
+    """ Write the edited document of a :class:`editfrontmatter.batch.FileResult` to the binary stream `fo`.
+
+    Args:
+        fo (file): binary output stream
+        fmt (str): one of :data:`FORMATS`
+        result (FileResult): result of :func:`editfrontmatter.batch.process_document`
+    """
+    output = result.output
+    if fmt == 'nul':
+        fo.write(output)
+        fo.write(b"\0")
+    elif fmt == 'length':
+        fo.write(b"%d\n" % len(output))
+        fo.write(output)
+    else:
+        record = {'path': result.path, 'content': output, 'status': result.status}
+        if result.error is not None:
+            record['error'] = result.error.as_dict()
+        fo.write(json.dumps(record).encode('utf-8') + b"\n")
+
+
+def edit_stream(task, infile, outfile, fmt='nul', *, jobs=1, executor='thread', window=None,
+                metrics=None, on_result=None) -> BatchReport:
+    """ Edit every document of `infile` and write them, in order, to `outfile`.
+
+    Args:
+        task (BatchTask): edit to apply
+        infile (file): binary input stream
+        outfile (file): binary output stream
+        fmt (str): one of :data:`FORMATS`
+        jobs (int): [default: 1] workers (`1` edits inline)
+        executor (str): [default: 'thread'] `'thread'` or `'process'`
+        window (int): [default: `jobs * 4`] maximum documents in flight
+        metrics (BatchMetrics): [default: `None`] see :mod:`editfrontmatter.metrics`
+        on_result (callable): called with each result, in order
+
+    Returns:
+        :class:`editfrontmatter.batch.BatchReport`
+
+    Throws:
+        ValueError on malformed input (documents before it are written)
+    """
+    report = BatchReport()
+    start = time.monotonic()
+
+    def emit(result):
+        write_record(outfile, fmt, result)
+        report.add(result)
+        if metrics is not None:
+            metrics.record(result)
+        if on_result is not None:
+            on_result(result)
+
+    if metrics is not None:
+        metrics.start()
+    try:
+        records = ((path if path is not None else "<stdin>:{n}".format(n=number), document)
+                   for number, (path, document) in enumerate(read_records(infile, fmt), 1))
+        if jobs <= 1:
+            for path, document in records:
+                emit(process_document(document, task, path))
+            return report
+
+        window = window or jobs * 4
+        pool_class = futures.ProcessPoolExecutor if executor == 'process' else futures.ThreadPoolExecutor
+        with pool_class(max_workers=jobs) as pool:
+            pending = deque()
+            try:
+                for path, document in records:
+                    if len(pending) >= window:
+                        emit(pending.popleft().result())
+                    pending.append(pool.submit(process_document, document, task, path))
+            finally:
+                # documents read before an input error are still written
+                while pending:
+                    emit(pending.popleft().result())
+        return report
+    finally:
+        outfile.flush()
+        if metrics is not None:
+            metrics.stop()
+        report.elapsed = time.monotonic() - start
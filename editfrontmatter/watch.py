@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Watch Mode
+==============================
+
+.. module:: editfrontmatter.watch
+
+:Synopsis: Re-apply a :class:`editfrontmatter.batch.BatchTask` to files as
+    soon as they are saved, using Linux inotify (through `ctypes`, no extra
+    dependency).
+
+    * Directories are watched recursively; new directories are picked up.
+    * Events are debounced per file: a file is processed once it has been
+      quiet for `debounce` seconds, so editors saving continuously trigger
+      a single edit.
+    * The watcher ignores its own writes: the size, mtime and inode of each
+      file it writes are remembered and the matching event is dropped,
+      which avoids feedback loops with
+      :func:`editfrontmatter.EditFrontMatter.EditFrontMatter.writeFile`.
+    * Ready files go through the batch engine (:class:`editfrontmatter.batch.Batch`),
+      inline or on threads, so the task environment and its compiled
+      templates stay warm between bursts.
+
+:Platform: Linux, |python_version|
+
+:License: `MIT <https://karlredman.github.io/EditFrontMatter/LICENSE>`_
+
+:Module Author: `Karl N. Redman <https://karlredman.github.io>`_
+
+:Example:
+
+    ::
+
+        task = BatchTask(template_str=template_str, keys_toDelete=['deleteme'], write=True)
+        watcher = Watcher(task, ['content/'], debounce=0.3)
+        watcher.run(on_result=print)    # until watcher.stop() / KeyboardInterrupt
+"""
+
+# Imports
+import os
+import time
+import select
+import struct
+import threading
+
+from .batch import Batch, walk_files, _compile_globs
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+"""Events subscribed for every watched directory"""
+
+_EVENT = struct.Struct('iIII')
+
+
+class Inotify(object):
+    """Minimal inotify binding: add watches and read events"""
+
+    def __init__(self):
+        """
+        Throws:
+            OSError (not Linux or inotify unavailable)
+        """
+        import ctypes
+        import ctypes.util
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            self._add_watch = libc.inotify_add_watch
+            self._rm_watch = libc.inotify_rm_watch
+            init = libc.inotify_init1
+        except (OSError, AttributeError) as e:
+            raise OSError("inotify is not available on this platform") from e
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._ctypes = ctypes
+        self.fd = init(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def add_watch(self, path, mask=WATCH_MASK) -> int:
+        """ Watch `path`.
+
+        Returns:
+            watch descriptor
+
+        Throws:
+            OSError
+        """
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = self._ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def rm_watch(self, wd) -> None:
+        """Stop watching `wd` (a watch that is already gone is ignored)"""
+        self._rm_watch(self.fd, wd)
+
+    def read(self, timeout=None) -> list:
+        """ Wait up to `timeout` seconds for events.
+
+        Returns:
+            [(wd, mask, cookie, name)]
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        events = []
+        pos = 0
+        while pos + _EVENT.size <= len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, pos)
+            pos += _EVENT.size
+            name = os.fsdecode(data[pos:pos + length].rstrip(b'\0'))
+            pos += length
+            events.append((wd, mask, cookie, name))
+        return events
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def _fingerprint(path):
+    """(size, mtime_ns, inode) of `path` (`None` if it is gone)"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+class Watcher(object):
+    """Applies a :class:`editfrontmatter.batch.BatchTask` to files when they change"""
+
+    def __init__(self, task, paths, *, include=('*.md',), exclude=(), debounce=0.3, jobs=1,
+                 metrics=None):
+        """
+        Args:
+            task (BatchTask):
+                the edit to apply
+            paths (list):
+                files and/or directories to watch (directories recursively)
+            include (list):
+                [default: ('*.md',)] file name patterns, see
+                :func:`editfrontmatter.batch.walk_files`
+            exclude (list):
+                name / relative path patterns to skip
+            debounce (float):
+                [default: 0.3] seconds a file must be quiet before it is processed
+            jobs (int):
+                [default: 1] worker threads per burst
+            metrics (BatchMetrics):
+                [default: `None`] see :mod:`editfrontmatter.metrics`
+
+        Throws:
+            OSError
+        """
+        self.task = task
+        self.paths = list(paths)
+        self.include = include
+        self.exclude = exclude
+        self.debounce = debounce
+        # threads only: a process pool would lose the warm state between bursts
+        self.batch = Batch(task=task, jobs=jobs, executor='thread', metrics=metrics)
+
+        self._include_re = _compile_globs(include)
+        self._exclude_re = _compile_globs(exclude)
+        self._stop = threading.Event()
+        self._dirs = {}         # {wd: (directory, top)}, top is None for explicit files only
+        self._explicit = set()  # file paths given explicitly
+        self._pending = {}      # {path: deadline}
+        self._written = {}      # {path: fingerprint after our write}
+        self._inotify = Inotify()
+        for path in self.paths:
+            if os.path.isdir(path):
+                self._watch_tree(path, path)
+            else:
+                directory = os.path.dirname(path) or '.'
+                self._explicit.add(os.path.join(directory, os.path.basename(path)))
+                self._watch(directory, None)
+
+    def _excluded(self, name, path, top) -> bool:
+        if self._exclude_re is None:
+            return False
+        rel = os.path.relpath(path, top).replace(os.sep, '/')
+        return any(self._exclude_re.match(text) for text in (name, rel, path))
+
+    def _watch(self, directory, top) -> None:
+        try:
+            wd = self._inotify.add_watch(directory)
+        except OSError:
+            return      # vanished or unreadable
+        if top is not None or wd not in self._dirs:
+            self._dirs[wd] = (directory, top)
+
+    def _still_watched(self, wd, path) -> bool:
+        """`True` if `path` is still the directory of watch `wd` (watching
+        a watched inode again returns its `wd`)"""
+        try:
+            current = self._inotify.add_watch(path)
+        except OSError:
+            return False
+        if current != wd and current not in self._dirs:
+            self._inotify.rm_watch(current)     # another directory now at this path
+        return current == wd
+
+    def _moved(self, wd) -> None:
+        """ `IN_MOVE_SELF`: a directory moved within the tree was watched
+        again under its new path (`IN_MOVED_TO`); otherwise it left the
+        tree: forget it and its subdirectories.
+        """
+        directory = self._dirs[wd][0]
+        prefix = os.path.join(directory, '')
+        for stale, (path, _) in list(self._dirs.items()):
+            if (path == directory or path.startswith(prefix)) and not self._still_watched(stale, path):
+                self._inotify.rm_watch(stale)
+                del self._dirs[stale]
+
+    def _watch_tree(self, directory, top) -> None:
+        """Watch `directory` and its subdirectories"""
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            self._watch(current, top)
+            try:
+                entries = list(os.scandir(current))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False) and not self._excluded(entry.name, entry.path, top):
+                    stack.append(entry.path)
+
+    def _wanted(self, directory, name, top) -> bool:
+        """`True` if file `name` in `directory` is processed"""
+        path = os.path.join(directory, name)
+        if path in self._explicit:
+            return True
+        if top is None or self._excluded(name, path, top):
+            return False
+        return self._include_re is None or bool(self._include_re.match(name))
+
+    def _touch(self, path, now) -> None:
+        self._pending[path] = now + self.debounce
+
+    def _handle(self, events, now) -> None:
+        for wd, mask, cookie, name in events:
+            if mask & IN_Q_OVERFLOW:
+                # events were lost: rescan everything
+                for entry in walk_files(self.paths, include=self.include, exclude=self.exclude):
+                    self._touch(entry.path, now)
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            if mask & IN_MOVE_SELF:
+                if wd in self._dirs:
+                    self._moved(wd)
+                continue
+            if wd not in self._dirs or not name:
+                continue
+            directory, top = self._dirs[wd]
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if top is not None and mask & (IN_CREATE | IN_MOVED_TO) and \
+                        not self._excluded(name, path, top):
+                    self._watch_tree(path, top)
+                    # files created before the watch was in place
+                    for entry in walk_files([path], include=self.include, exclude=self.exclude):
+                        self._touch(entry.path, now)
+                continue
+            if mask & (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO) and self._wanted(directory, name, top):
+                self._touch(path, now)
+
+    def _ready(self, now) -> list:
+        """Paths quiet since their deadline, minus our own writes"""
+        ready = [path for path, deadline in self._pending.items() if deadline <= now]
+        paths = []
+        for path in ready:
+            del self._pending[path]
+            written = self._written.pop(path, None)
+            if written is not None and written == _fingerprint(path):
+                continue    # the event of our own write
+            paths.append(path)
+        return paths
+
+    def stop(self) -> None:
+        """Stop watching (from another thread or a callback)"""
+        self._stop.set()
+
+    def run(self, on_result=None, on_burst=None) -> None:
+        """ Watch and process changed files until :func:`stop` is called.
+
+        Args:
+            on_result (callable): called with each
+                :class:`editfrontmatter.batch.FileResult`
+            on_burst (callable): called with the
+                :class:`editfrontmatter.batch.BatchReport` of each burst
+        """
+        def record(result):
+            if result.status == 'written':
+                self._written[result.path] = _fingerprint(result.path)
+            if on_result is not None:
+                on_result(result)
+
+        try:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                timeout = 0.5
+                if self._pending:
+                    timeout = max(0.0, min(timeout, min(self._pending.values()) - now))
+                self._handle(self._inotify.read(timeout), time.monotonic())
+                paths = self._ready(time.monotonic())
+                if paths:
+                    report = self.batch.run(sorted(paths), on_result=record)
+                    if on_burst is not None:
+                        on_burst(report)
+        finally:
+            self._inotify.close()
@@ -20,6 +20,16 @@ setuptools.setup(
     packages=setuptools.find_packages(
         exclude=[]
     ),
+    entry_points={
+        "console_scripts": [
+            "editfrontmatter = editfrontmatter.cli:main",
+            "editfrontmatter-daemon = editfrontmatter.daemon:main",
+            "editfrontmatter-client = editfrontmatter.client:main",
+            "editfrontmatter-index = editfrontmatter.index:main",
+            "editfrontmatter-export = editfrontmatter.export:main",
+            "editfrontmatter-shard = editfrontmatter.shard:main"
+        ]
+    },
     install_requires=[
         "jinja2",
         "oyaml"